@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hackeps25.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importar después de get_asgi_application() (necesita Django configurado)
+from hackeps25.pose_push import WS_PATH, pose_websocket  # noqa: E402
+from hackeps25.pose_api import ROUTES as POSE_ROUTES, pose_asgi  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Las poses en vivo van por WebSocket directo y la API de poses sin middleware;
+    # el resto lo atiende Django
+    if scope["type"] == "websocket" and scope["path"] == WS_PATH:
+        return await pose_websocket(scope, receive, send)
+    if scope["type"] == "http" and scope["path"] in POSE_ROUTES:
+        return await pose_asgi(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,220 @@
+"""
+Build de los modelos 3D para el navegador y su entrega con caché larga.
+
+Cada personaje de static/models/caracter/<nombre>/ trae un GLB por animación (idle,
+walk(ing), waving) que repite la misma malla y esqueleto. build() los junta en un solo
+GLB con varios clips (idle, walking, waving), cuantiza los atributos de vértice, reduce
+las texturas (ver glb.py) y escribe el resultado en static/build/ con el hash del
+contenido en el nombre, junto a sus variantes .gz (y .br si está instalado brotli) y un
+manifest.json:
+
+    python manage.py build_assets [--meshopt]
+
+La vista serve_asset sirve esos ficheros con Cache-Control immutable: un nombre con hash
+nunca cambia de contenido, así que el navegador no vuelve a preguntar. Con --meshopt se
+pasa además gltf-transform (si está en el PATH) para comprimir geometría y animaciones
+con EXT_meshopt_compression.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+
+from .glb import Glb
+
+# Nombre de fichero -> nombre de clip en el GLB combinado (el de elvis se llama walk.glb)
+CLIP_NAMES = {"idle": "idle", "walk": "walking", "walking": "walking", "waving": "waving"}
+BASE_CLIP = "idle"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+
+def _config():
+    return getattr(settings, "ASSETS", {})
+
+
+def build_dir():
+    return str(_config().get("BUILD_DIR", os.path.join(settings.BASE_DIR, "static", "build")))
+
+
+def source_dir():
+    return str(_config().get("SOURCE_DIR", os.path.join(settings.BASE_DIR, "static", "models")))
+
+
+# --- Build ---
+
+def optimize(glb, max_texture):
+    """Cuantiza y reduce texturas en el sitio. Devuelve (bytes de vértices, bytes de texturas) ahorrados."""
+    saved_vertices = glb.quantize()
+    saved_textures = glb.resize_images(max_texture) if max_texture else 0
+    glb.compact()
+    return saved_vertices, saved_textures
+
+
+def merge_character(folder, log=print):
+    """GLB con la malla de idle.glb y las animaciones de todos los .glb de la carpeta."""
+    files = {os.path.splitext(f)[0]: os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".glb")}
+    base_name = BASE_CLIP if BASE_CLIP in files else sorted(files)[0]
+    base = Glb.load(files[base_name])
+    base.rename_animations(CLIP_NAMES.get(base_name, base_name))
+    clips = [CLIP_NAMES.get(base_name, base_name)]
+    for stem, path in sorted(files.items()):
+        if stem == base_name: continue
+        clip = CLIP_NAMES.get(stem, stem)
+        if not base.merge_animations(Glb.load(path), clip):
+            log(f"  {os.path.basename(path)}: ningún nodo coincide con {base_name}.glb, se omite")
+            continue
+        clips.append(clip)
+    return base, clips, sum(os.path.getsize(p) for p in files.values())
+
+
+def _meshopt(data, log=print):
+    """Pasa el GLB por `gltf-transform meshopt`. Si no está instalado devuelve los mismos bytes."""
+    tool = shutil.which("gltf-transform")
+    if tool is None:
+        log("  gltf-transform no está en el PATH (npm i -g @gltf-transform/cli): sin meshopt")
+        return data, False
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = os.path.join(tmp, "in.glb"), os.path.join(tmp, "out.glb")
+        with open(src, "wb") as f:
+            f.write(data)
+        result = subprocess.run([tool, "meshopt", src, dst], capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.isfile(dst):
+            log(f"  gltf-transform falló: {result.stderr.strip()[:200]}")
+            return data, False
+        with open(dst, "rb") as f:
+            return f.read(), True
+
+
+def _write_hashed(out_dir, logical, data):
+    """Escribe data como <nombre>.<hash>.<ext> (+ .gz / .br). Devuelve la entrada del manifest."""
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(logical)
+    name = f"{stem}.{digest}{ext}"
+    path = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    entry = {"file": name, "hash": digest, "bytes": len(data)}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        with open(path + ".gz", "wb") as f:
+            f.write(gz)
+        entry["gzip"] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            with open(path + ".br", "wb") as f:
+                f.write(br)
+            entry["br"] = len(br)
+    return entry
+
+
+def build(source=None, out_dir=None, max_texture=1024, meshopt=False, log=print):
+    """Genera los modelos optimizados y el manifest. Devuelve el manifest."""
+    source = source or source_dir()
+    out_dir = out_dir or build_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+
+    jobs = []
+    characters = os.path.join(source, "caracter")
+    if os.path.isdir(characters):
+        for name in sorted(os.listdir(characters)):
+            folder = os.path.join(characters, name)
+            if os.path.isdir(folder) and any(f.endswith(".glb") for f in os.listdir(folder)):
+                jobs.append((f"models/caracter/{name}.glb", folder))
+    rooms = os.path.join(source, "room")
+    if os.path.isdir(rooms):
+        for f in sorted(os.listdir(rooms)):
+            if f.endswith(".glb"): jobs.append((f"models/room/{f}", os.path.join(rooms, f)))
+
+    for logical, src in jobs:
+        log(logical)
+        if os.path.isdir(src):
+            glb, clips, source_bytes = merge_character(src, log)
+        else:
+            glb, clips, source_bytes = Glb.load(src), None, os.path.getsize(src)
+        saved_vertices, saved_textures = optimize(glb, max_texture)
+        data, used_meshopt = _meshopt(glb.to_bytes(), log) if meshopt else (glb.to_bytes(), False)
+        entry = _write_hashed(out_dir, logical, data)
+        entry["source_bytes"] = source_bytes
+        entry["meshopt"] = used_meshopt
+        if clips: entry["clips"] = clips
+        files[logical] = entry
+        log(f"  {source_bytes / 1e6:.2f} MB -> {len(data) / 1e6:.2f} MB"
+            f" (gzip {entry.get('gzip', len(data)) / 1e6:.2f} MB"
+            + (f", br {entry['br'] / 1e6:.2f} MB" if "br" in entry else "") + ")"
+            f"  vértices -{saved_vertices / 1e3:.0f} kB, texturas -{saved_textures / 1e3:.0f} kB"
+            + (f"  clips: {', '.join(clips)}" if clips else ""))
+
+    manifest = {"version": 1, "files": files}
+    tmp = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+# --- Lectura del manifest y entrega ---
+
+_manifest = {"mtime": None, "data": {"files": {}}, "served": set()}
+
+
+def manifest():
+    """Manifest del último build (se relee solo si el fichero cambia)."""
+    path = os.path.join(build_dir(), "manifest.json")
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        _manifest.update(mtime=None, data={"files": {}}, served=set())
+        return _manifest["data"]
+    if mtime != _manifest["mtime"]:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        _manifest.update(mtime=mtime, data=data, served={e["file"] for e in data.get("files", {}).values()})
+    return _manifest["data"]
+
+
+def entry(logical):
+    """Entrada del manifest de 'models/caracter/elvis.glb', o None si no se ha hecho el build."""
+    return manifest()["files"].get(logical)
+
+
+def asset_url(logical):
+    e = entry(logical)
+    return f"/assets/{e['file']}" if e else None
+
+
+def _choose_encoding(accept_encoding, path):
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in accepted and os.path.isfile(path + suffix): return encoding, path + suffix
+    return None, path
+
+
+def asset_response(name, accept_encoding="", if_none_match=""):
+    """
+    (status, headers, ruta del fichero o None) para /assets/<name>. Solo se sirven los
+    ficheros del manifest (el nombre viene de la URL), con la variante comprimida que
+    acepte el cliente.
+    """
+    manifest()
+    if name not in _manifest["served"]: return 404, {}, None
+    encoding, path = _choose_encoding(accept_encoding, os.path.join(build_dir(), name))
+    digest = name.rsplit(".", 2)[-2]
+    etag = f'"{digest}-{encoding or "identity"}"'
+    headers = {"Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding", "ETag": etag,
+               "Content-Type": "model/gltf-binary" if name.endswith(".glb") else "application/octet-stream"}
+    if encoding: headers["Content-Encoding"] = encoding
+    if etag in [t.strip() for t in if_none_match.split(",")]: return 304, headers, None
+    return 200, headers, path
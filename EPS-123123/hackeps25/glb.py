@@ -0,0 +1,335 @@
+"""
+Lectura/escritura de GLB (glTF 2.0 binario) para el build de assets (ver assets.py).
+
+Solo lo que necesita el build de personajes y escenarios, con la librería estándar:
+    merge_animations  copia las animaciones de otro GLB con el mismo esqueleto
+                      (los nodos se emparejan por nombre) como clips con nombre
+    quantize          atributos de vértice en enteros normalizados: TEXCOORD en
+                      uint16, WEIGHTS en uint8 y NORMAL en int8 (KHR_mesh_quantization)
+    resize_images     texturas reducidas a un lado máximo y recomprimidas
+                      (JPEG si no usan transparencia); necesita Pillow u OpenCV
+    compact           reescribe el buffer binario solo con lo que se usa
+"""
+import io
+import json
+import struct
+
+MAGIC = b"glTF"
+_CHUNK_JSON = 0x4E4F534A
+_CHUNK_BIN = 0x004E4942
+
+# componentType -> (formato struct, bytes)
+_COMPONENTS = {5120: ("b", 1), 5121: ("B", 1), 5122: ("h", 2), 5123: ("H", 2), 5125: ("I", 4), 5126: ("f", 4)}
+_TYPES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+BYTE, UNSIGNED_BYTE, UNSIGNED_SHORT, FLOAT = 5120, 5121, 5123, 5126
+ARRAY_BUFFER = 34962
+
+QUANTIZATION_EXT = "KHR_mesh_quantization"
+
+
+def _pad4(n):
+    return (n + 3) & ~3
+
+
+class Glb:
+    def __init__(self, gltf, binary=b""):
+        self.gltf = gltf
+        self.bin = bytearray(binary)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, length = struct.unpack_from("<4sII", data, 0)
+        if magic != MAGIC or version != 2: raise ValueError("No es un GLB 2.0")
+        pos = 12
+        gltf, binary = None, b""
+        while pos < length:
+            chunk_len, chunk_type = struct.unpack_from("<II", data, pos)
+            chunk = data[pos + 8:pos + 8 + chunk_len]
+            if chunk_type == _CHUNK_JSON: gltf = json.loads(chunk)
+            elif chunk_type == _CHUNK_BIN and not binary: binary = chunk
+            pos += 8 + chunk_len
+        if gltf is None: raise ValueError("GLB sin JSON")
+        return cls(gltf, binary)
+
+    def to_bytes(self):
+        self.gltf["buffers"] = [{"byteLength": len(self.bin)}] if self.bin else []
+        js = json.dumps(self.gltf, separators=(",", ":")).encode("utf-8")
+        js += b" " * (_pad4(len(js)) - len(js))
+        binary = bytes(self.bin) + b"\0" * (_pad4(len(self.bin)) - len(self.bin))
+        total = 12 + 8 + len(js) + (8 + len(binary) if binary else 0)
+        parts = [struct.pack("<4sII", MAGIC, 2, total), struct.pack("<II", len(js), _CHUNK_JSON), js]
+        if binary: parts += [struct.pack("<II", len(binary), _CHUNK_BIN), binary]
+        return b"".join(parts)
+
+    # --- Acceso a datos ---
+
+    def view_bytes(self, index):
+        view = self.gltf["bufferViews"][index]
+        start = view.get("byteOffset", 0)
+        return bytes(self.bin[start:start + view["byteLength"]])
+
+    def read_accessor(self, index):
+        """Lista de tuplas (una por elemento) con los valores tal cual (sin desnormalizar)."""
+        acc = self.gltf["accessors"][index]
+        fmt, size = _COMPONENTS[acc["componentType"]]
+        n = _TYPES[acc["type"]]
+        if "bufferView" not in acc or "sparse" in acc:
+            raise ValueError(f"Accessor {index} sin bufferView o sparse: no soportado")
+        view = self.gltf["bufferViews"][acc["bufferView"]]
+        start = view.get("byteOffset", 0) + acc.get("byteOffset", 0)
+        stride = view.get("byteStride") or size * n
+        st = struct.Struct("<" + fmt * n)
+        return [st.unpack_from(self.bin, start + i * stride) for i in range(acc["count"])]
+
+    def add_view(self, data, byte_stride=None, target=None):
+        pad = _pad4(len(self.bin)) - len(self.bin)
+        self.bin += b"\0" * pad
+        view = {"buffer": 0, "byteOffset": len(self.bin), "byteLength": len(data)}
+        if byte_stride: view["byteStride"] = byte_stride
+        if target: view["target"] = target
+        self.bin += data
+        self.gltf.setdefault("bufferViews", []).append(view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def add_accessor(self, values, component_type, type_, normalized=False, byte_stride=None, target=None,
+                     with_bounds=False):
+        fmt, size = _COMPONENTS[component_type]
+        n = _TYPES[type_]
+        elem = size * n
+        stride = byte_stride or elem
+        st = struct.Struct("<" + fmt * n)
+        buf = bytearray(stride * len(values))
+        for i, v in enumerate(values):
+            st.pack_into(buf, i * stride, *v)
+        acc = {"bufferView": self.add_view(bytes(buf), byte_stride if byte_stride else None, target),
+               "componentType": component_type, "count": len(values), "type": type_}
+        if normalized: acc["normalized"] = True
+        if with_bounds and values:
+            acc["min"] = [min(v[k] for v in values) for k in range(n)]
+            acc["max"] = [max(v[k] for v in values) for k in range(n)]
+        self.gltf.setdefault("accessors", []).append(acc)
+        return len(self.gltf["accessors"]) - 1
+
+    def _use_extension(self, name, required=False):
+        used = self.gltf.setdefault("extensionsUsed", [])
+        if name not in used: used.append(name)
+        if required:
+            req = self.gltf.setdefault("extensionsRequired", [])
+            if name not in req: req.append(name)
+
+    # --- Transformaciones ---
+
+    def rename_animations(self, name):
+        anims = self.gltf.get("animations", [])
+        for i, anim in enumerate(anims):
+            anim["name"] = name if len(anims) == 1 else f"{name}_{i}"
+
+    def merge_animations(self, other, name):
+        """
+        Añade las animaciones de `other` (mismo esqueleto) con el nombre de clip `name`.
+        Devuelve el nº de canales copiados; los que apuntan a nodos que aquí no existen se descartan.
+        """
+        by_name = {n.get("name"): i for i, n in enumerate(self.gltf.get("nodes", []))}
+        other_nodes = other.gltf.get("nodes", [])
+        copied = {}  # accessor de other -> accessor aquí (los tiempos se comparten entre samplers)
+
+        def copy_accessor(index):
+            if index not in copied:
+                acc = other.gltf["accessors"][index]
+                values = other.read_accessor(index)
+                copied[index] = self.add_accessor(values, acc["componentType"], acc["type"],
+                                                  normalized=acc.get("normalized", False),
+                                                  with_bounds="min" in acc)
+            return copied[index]
+
+        channels_copied = 0
+        anims = other.gltf.get("animations", [])
+        for k, anim in enumerate(anims):
+            samplers, channels, sampler_map = [], [], {}
+            for ch in anim["channels"]:
+                target = ch["target"]
+                node_name = other_nodes[target["node"]].get("name") if "node" in target else None
+                if node_name not in by_name: continue
+                s = ch["sampler"]
+                if s not in sampler_map:
+                    src = anim["samplers"][s]
+                    samplers.append({"input": copy_accessor(src["input"]), "output": copy_accessor(src["output"]),
+                                     "interpolation": src.get("interpolation", "LINEAR")})
+                    sampler_map[s] = len(samplers) - 1
+                channels.append({"sampler": sampler_map[s], "target": {"node": by_name[node_name], "path": target["path"]}})
+            if channels:
+                self.gltf.setdefault("animations", []).append(
+                    {"name": name if len(anims) == 1 else f"{name}_{k}", "channels": channels, "samplers": samplers})
+                channels_copied += len(channels)
+        return channels_copied
+
+    def quantize(self):
+        """Atributos float -> enteros normalizados. Devuelve bytes de vértices ahorrados (aprox.)."""
+        gltf = self.gltf
+        accessors = gltf.get("accessors", [])
+        done = {}
+        saved = 0
+        # Accessors usados también como morph targets o por más de un atributo distinto: no se tocan
+        in_targets = set()
+        for mesh in gltf.get("meshes", []):
+            for prim in mesh.get("primitives", []):
+                for target in prim.get("targets", []):
+                    in_targets.update(target.values())
+
+        for mesh in gltf.get("meshes", []):
+            for prim in mesh.get("primitives", []):
+                attrs = prim.get("attributes", {})
+                for attr, index in list(attrs.items()):
+                    if index in done:
+                        attrs[attr] = done[index]
+                        continue
+                    acc = accessors[index]
+                    if acc["componentType"] != FLOAT or index in in_targets or "sparse" in acc: continue
+                    new = None
+                    if attr.startswith("TEXCOORD_"):
+                        values = self.read_accessor(index)
+                        if all(0.0 <= c <= 1.0 for v in values for c in v):
+                            new = self.add_accessor([tuple(round(c * 65535) for c in v) for v in values],
+                                                    UNSIGNED_SHORT, acc["type"], normalized=True, target=ARRAY_BUFFER)
+                    elif attr.startswith("WEIGHTS_"):
+                        new = self.add_accessor([_weights_u8(v) for v in self.read_accessor(index)],
+                                                UNSIGNED_BYTE, acc["type"], normalized=True, target=ARRAY_BUFFER)
+                    elif attr == "NORMAL":
+                        # vec3 de int8 con stride 4 (los atributos van alineados a 4 bytes)
+                        values = [tuple(max(-127, min(127, round(c * 127))) for c in v) for v in self.read_accessor(index)]
+                        new = self.add_accessor(values, BYTE, "VEC3", normalized=True, byte_stride=4, target=ARRAY_BUFFER)
+                        self._use_extension(QUANTIZATION_EXT, required=True)
+                    if new is None: continue
+                    saved += acc["count"] * _TYPES[acc["type"]] * 4 - self.gltf["bufferViews"][accessors[new]["bufferView"]]["byteLength"]
+                    done[index] = new
+                    attrs[attr] = new
+        return saved
+
+    def resize_images(self, max_size=1024, jpeg_quality=85):
+        """Reduce y recomprime las imágenes embebidas. Devuelve bytes ahorrados (0 sin Pillow ni OpenCV)."""
+        saved = 0
+        for image in self.gltf.get("images", []):
+            if "bufferView" not in image: continue
+            data = self.view_bytes(image["bufferView"])
+            out = _recompress(data, max_size, jpeg_quality)
+            if out is None: continue
+            new_data, mime = out
+            if len(new_data) >= len(data): continue  # No compensa
+            saved += len(data) - len(new_data)
+            image["bufferView"] = self.add_view(new_data)
+            image["mimeType"] = mime
+        return saved
+
+    def compact(self):
+        """Buffer nuevo con solo los bufferViews referenciados (tras quantize/resize quedan huecos)."""
+        gltf = self.gltf
+        views = gltf.get("bufferViews", [])
+        # Accessors huérfanos (los que quantize o merge han dejado de usar)
+        referenced = _referenced_accessors(gltf)
+        keep_acc = [i for i in range(len(gltf.get("accessors", []))) if i in referenced]
+        acc_map = {old: new for new, old in enumerate(keep_acc)}
+        accessors = [gltf["accessors"][i] for i in keep_acc]
+        used = sorted({a["bufferView"] for a in accessors if "bufferView" in a}
+                      | {i["bufferView"] for i in gltf.get("images", []) if "bufferView" in i})
+
+        new_bin = bytearray()
+        view_map = {}
+        new_views = []
+        for old in used:
+            view = dict(views[old])
+            data = self.view_bytes(old)
+            new_bin += b"\0" * (_pad4(len(new_bin)) - len(new_bin))
+            view["byteOffset"] = len(new_bin)
+            view["buffer"] = 0
+            new_bin += data
+            view_map[old] = len(new_views)
+            new_views.append(view)
+        for acc in accessors:
+            if "bufferView" in acc: acc["bufferView"] = view_map[acc["bufferView"]]
+        for image in gltf.get("images", []):
+            if "bufferView" in image: image["bufferView"] = view_map[image["bufferView"]]
+        gltf["accessors"] = accessors
+        gltf["bufferViews"] = new_views
+        _remap_accessors(gltf, acc_map)
+        self.bin = new_bin
+
+
+def _weights_u8(v):
+    """Pesos en uint8 que siguen sumando exactamente 255."""
+    q = [max(0, round(c * 255)) for c in v]
+    diff = 255 - sum(q)
+    if diff and any(q):
+        i = q.index(max(q))
+        q[i] = max(0, q[i] + diff)
+    return tuple(q)
+
+
+def _accessor_refs(gltf):
+    """(dict, clave) de cada sitio del JSON que apunta a un accessor."""
+    for mesh in gltf.get("meshes", []):
+        for prim in mesh.get("primitives", []):
+            attrs = prim.get("attributes", {})
+            for k in attrs: yield attrs, k
+            if "indices" in prim: yield prim, "indices"
+            for target in prim.get("targets", []):
+                for k in target: yield target, k
+    for skin in gltf.get("skins", []):
+        if "inverseBindMatrices" in skin: yield skin, "inverseBindMatrices"
+    for anim in gltf.get("animations", []):
+        for sampler in anim.get("samplers", []):
+            yield sampler, "input"
+            yield sampler, "output"
+
+
+def _referenced_accessors(gltf):
+    return {holder[key] for holder, key in _accessor_refs(gltf)}
+
+
+def _remap_accessors(gltf, acc_map):
+    for holder, key in list(_accessor_refs(gltf)):
+        holder[key] = acc_map[holder[key]]
+
+
+def _recompress(data, max_size, quality):
+    """(bytes, mimeType) de la imagen reducida, o None si no hay con qué hacerlo."""
+    try:
+        from PIL import Image  # type: ignore
+    except ImportError:
+        Image = None
+    if Image is not None:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        alpha = img.mode in ("RGBA", "LA", "P") and img.convert("RGBA").getextrema()[3][0] < 255
+        if max(img.size) > max_size:
+            scale = max_size / max(img.size)
+            img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+        out = io.BytesIO()
+        if alpha:
+            img.convert("RGBA").save(out, "PNG", optimize=True)
+            return out.getvalue(), "image/png"
+        img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue(), "image/jpeg"
+
+    try:
+        import cv2  # type: ignore
+        import numpy as np  # type: ignore
+    except ImportError:
+        return None
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None: return None
+    h, w = img.shape[:2]
+    if max(h, w) > max_size:
+        scale = max_size / max(h, w)
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    alpha = img.ndim == 3 and img.shape[2] == 4 and int(img[:, :, 3].min()) < 255
+    if alpha:
+        ok, buf = cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+        return (buf.tobytes(), "image/png") if ok else None
+    if img.ndim == 3 and img.shape[2] == 4: img = img[:, :, :3]
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_PROGRESSIVE, 1])
+    return (buf.tobytes(), "image/jpeg") if ok else None
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from hackeps25 import assets
+
+
+class Command(BaseCommand):
+    help = "Combina y optimiza los GLB de personajes y escenarios en static/build/ (ver hackeps25/assets.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-texture", type=int, default=1024, help="Lado máximo de las texturas (0 = no tocarlas)")
+        parser.add_argument("--meshopt", action="store_true", help="Comprimir además con gltf-transform meshopt")
+        parser.add_argument("--source", default=None, help="Carpeta de modelos (por defecto static/models)")
+        parser.add_argument("--out", default=None, help="Carpeta de salida (por defecto static/build)")
+
+    def handle(self, *args, **options):
+        manifest = assets.build(options["source"], options["out"], options["max_texture"], options["meshopt"],
+                                log=self.stdout.write)
+        files = manifest["files"].values()
+        before = sum(e["source_bytes"] for e in files)
+        after = sum(e["bytes"] for e in files)
+        wire = sum(e.get("br", e.get("gzip", e["bytes"])) for e in files)
+        if not before:
+            self.stdout.write(self.style.WARNING("No hay modelos que procesar"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(manifest['files'])} modelos: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB "
+            f"({wire / 1e6:.1f} MB comprimido, {1 - wire / before:.0%} menos)"))
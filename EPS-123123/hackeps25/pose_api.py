@@ -0,0 +1,377 @@
+"""
+API de poses de alta frecuencia sin pasar por el middleware de Django.
+
+El tracker y el navegador consultan estas rutas decenas de veces por segundo; no
+necesitan sesión, CSRF, usuario ni base de datos, así que asgi.py / wsgi.py las
+atienden directamente con pose_asgi / pose_wsgi y solo lo demás llega a Django.
+Las vistas de views.py usan los mismos handlers (misma respuesta por cualquier camino).
+
+    POST /api/update-pose/       pose completa del tracker (JSON, binario o lote)
+    POST /api/update-coords/     posición + estado
+    GET  /api/get-pose/          últimas coords del canal
+    GET  /api/get-full-pose/     última pose completa del canal
+    GET  /metrics                contadores y tiempos por handler (texto de Prometheus, metrics.py)
+    GET/POST /debug/profile/     perfilador por muestreo: POST start|stop|reset, GET las pilas
+                                 (solo con settings.METRICS["PROFILER"])
+
+El canal sale de la cabecera X-Pose-Channel o de ?channel= (nunca de la sesión).
+Las lecturas llevan ETag con el número de secuencia del store: con If-None-Match
+igual se responde 304 sin cuerpo.
+"""
+import json
+import time
+import asyncio
+import logging
+import functools
+from collections import namedtuple
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from posecommon import pose_codec
+from posecommon.metrics import REGISTRY, PROFILER, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .pose_push import hub
+from .pose_store import get_store, channel_key, clean_channel, PoseTooLarge
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 256 * 1024  # Una pose ocupa pocos KB; más que esto no es del tracker
+
+# Valores por defecto mientras el store no tenga nada
+DEFAULT_POSE_DATA = {
+    "extremities": {
+        "nose": {"x": 0.5, "y": 0.5},
+        "left_wrist": {"x": 0.5, "y": 0.5},
+        "right_wrist": {"x": 0.5, "y": 0.5}
+    }
+}
+DEFAULT_COORDS_DATA = {
+    "position": {"x": 0, "y": 0},
+    "state": "normal"  # Por defecto
+}
+
+ApiRequest = namedtuple("ApiRequest", "method body content_type channel accept if_none_match")
+
+_JSON = "application/json"
+_binary_cache = {}  # key -> (seq, trama binaria): se codifica una vez por pose, no por cliente
+_delta_bases = {}  # key -> última pose completa (base de las tramas delta del tracker)
+
+
+def _json(status, data):
+    return status, {"Content-Type": _JSON}, json.dumps(data).encode("utf-8")
+
+
+def _instrumented(name):
+    """Cuenta las peticiones de un handler por código de respuesta y mide su duración."""
+    def wrap(handler):
+        seconds = REGISTRY.histogram("pose_api_request_seconds", "Duración de los handlers de la API de poses",
+                                     handler=name)
+        by_status = {}
+
+        @functools.wraps(handler)
+        def timed(req):
+            t0 = time.perf_counter()
+            response = handler(req)
+            seconds.observe(time.perf_counter() - t0)
+            status = response[0]
+            counter = by_status.get(status)
+            if counter is None:
+                counter = by_status[status] = REGISTRY.counter(
+                    "pose_api_requests_total", "Peticiones a la API de poses", handler=name, status=str(status))
+            counter.inc()
+            return response
+        return timed
+    return wrap
+
+
+_errors = REGISTRY.counter("pose_api_errors_total", "Poses rechazadas por no poder decodificarlas", handler="update_pose")
+_last_error_log = [0.0]
+
+
+def _log_error(msg, *args):
+    # Como mucho un aviso cada 5 segundos (el contador de /metrics lleva la cuenta)
+    _errors.inc()
+    now = time.time()
+    if now - _last_error_log[0] > 5.0:
+        _last_error_log[0] = now
+        logger.warning(msg, *args)
+
+
+def _clean_state(value):
+    return value if value in pose_codec.STATE_INDEX else "normal"
+
+
+def _sync_state(channel, state):
+    """
+    Copia el "state" que calcula el tracker a las coords del canal (lo que lee el
+    navegador), conservando la posición. Solo escribe y publica cuando cambia.
+    """
+    key = channel_key("coords", channel)
+    store = get_store()
+    _, coords = store.get(key, None)
+    if coords is None: coords = dict(DEFAULT_COORDS_DATA)
+    if coords.get("state") == state: return  # Contra el store: otro worker o el TTL pueden haberlo cambiado
+    coords["state"] = state
+    seq = store.set(key, coords)
+    hub.publish(key, coords, seq)
+
+
+def _rebuild(key, frames):
+    """
+    Aplica en orden las tramas binarias (keyframes y deltas) y devuelve la última pose
+    completa. Si la base no es la que tiene este proceso (la recibió otro worker) se
+    toma la del store, que guarda el seq del tracker.
+    """
+    base = _delta_bases.get(key)
+    for frame in frames:
+        info = frame.get("delta")
+        if info is not None and (base is None or base.get("seq") != info["base"]):
+            _, base = get_store().get(key, None)
+        base = pose_codec.apply_delta(base, frame)
+    if len(_delta_bases) > 4096: _delta_bases.clear()
+    _delta_bases[key] = base
+    return base
+
+
+@_instrumented("update_pose")
+def update_pose(req):
+    """
+    Espera { "extremities": { ... }, "timestamp": ... }, la trama binaria de pose_codec
+    (keyframe o delta) o un micro-lote { "frames": [ {...}, {...} ] } (nos quedamos con
+    el más reciente). Si una delta no encuentra su base se responde 409 con
+    "need_keyframe" y el tracker manda un keyframe.
+    Si la pose trae "state" (gestures.py en el tracker) también actualiza el de las coords.
+    """
+    if req.method != "POST": return _json(405, {"error": "POST only"})
+    key = channel_key("pose", req.channel)
+    try:
+        if pose_codec.is_binary(req.content_type):
+            frames = pose_codec.decode_any(req.body)
+            data = _rebuild(key, frames) if frames else {"frames": []}
+        else:
+            data = json.loads(req.body)
+
+        if "frames" in data:
+            frames = [f for f in data["frames"] if isinstance(f, dict)]
+            if not frames:
+                return _json(200, {"status": "ok", "received": 0, "accepts_batch": True, "accepts_delta": True})
+            data = max(frames, key=lambda f: f.get("timestamp") or 0)
+
+        pose_data = None
+        if "extremities" in data:
+            pose_data = data
+        # Soporte retroactivo para scripts viejos que solo mandan x, y
+        elif "x" in data and "y" in data:
+            pose_data = {"extremities": {"nose": {"x": data["x"], "y": data["y"]}}}
+
+        if pose_data is not None:
+            seq = get_store().set(key, pose_data)
+            hub.publish(key, pose_data, seq)
+            if "state" in pose_data: _sync_state(req.channel, _clean_state(pose_data["state"]))
+
+        # accepts_batch / accepts_delta: le dicen al tracker qué puede mandar
+        return _json(200, {"status": "ok", "received": len(req.body), "accepts_batch": True, "accepts_delta": True})
+    except pose_codec.NeedKeyframe as e:
+        _delta_bases.pop(key, None)
+        return _json(409, {"status": "error", "need_keyframe": True, "message": str(e)})
+    except PoseTooLarge as e:
+        _log_error("Pose rechazada en update_pose: %s", e)
+        return _json(413, {"status": "error", "message": str(e)})
+    except Exception as e:
+        _log_error("Error en update_pose: %s", e)
+        return _json(400, {"status": "error", "message": str(e)})
+
+
+@_instrumented("update_coords")
+def update_coords(req):
+    if req.method != "POST": return _json(200, {"status": "bad request"})
+    try:
+        data = json.loads(req.body)
+        coords = {
+            "position": {"x": data.get("x", 0), "y": data.get("y", 0)},
+            "state": _clean_state(data.get("state", "normal")),
+        }
+        key = channel_key("coords", req.channel)
+        seq = get_store().set(key, coords)
+        hub.publish(key, coords, seq)
+        return _json(200, {"status": "ok"})
+    except Exception as e:
+        return _json(200, {"status": "error", "message": str(e)})
+
+
+def _encoded(key, seq, raw, default):
+    cached = _binary_cache.get(key)
+    if cached is not None and cached[0] == seq: return cached[1]
+    data = json.loads(raw) if raw is not None else default
+    blob = pose_codec.encode(data, seq=seq)
+    if len(_binary_cache) > 4096: _binary_cache.clear()  # Canales que ya no existen
+    _binary_cache[key] = (seq, blob)
+    return blob
+
+
+def _get(topic, default, req):
+    if req.method not in ("GET", "HEAD"): return _json(405, {"error": "GET only"})
+    key = channel_key(topic, req.channel)
+    seq, raw = get_store().get_raw(key)
+    binary = pose_codec.accepts_binary(req.accept)
+    etag = f'"{seq:x}{"b" if binary else "j"}"'
+    headers = {"ETag": etag, "Vary": "Accept, X-Pose-Channel", "Cache-Control": "no-cache"}
+
+    if req.if_none_match and (etag in req.if_none_match or req.if_none_match.strip() == "*"):
+        return 304, headers, b""
+    if binary:
+        headers["Content-Type"] = pose_codec.CONTENT_TYPE
+        return 200, headers, _encoded(key, seq, raw, default)
+    headers["Content-Type"] = _JSON
+    # El store ya guarda el JSON serializado: se devuelve tal cual
+    return 200, headers, bytes(raw) if raw is not None else json.dumps(default).encode("utf-8")
+
+
+@_instrumented("get_pose")
+def get_pose(req):
+    """Coords para el navegador (Three.js); binario si acepta application/x-pose-v1."""
+    return _get("coords", DEFAULT_COORDS_DATA, req)
+
+
+@_instrumented("get_full_pose")
+def get_full_pose(req):
+    """Pose completa (extremidades) del canal."""
+    return _get("pose", DEFAULT_POSE_DATA, req)
+
+
+def _server_gauges():
+    store = get_store()
+    return [
+        ("pose_ws_clients", "gauge", "Clientes WebSocket conectados a este proceso", {}, hub.subscribers),
+        ("pose_binary_cache_entries", "gauge", "Canales con la trama binaria ya codificada", {}, len(_binary_cache)),
+        ("pose_delta_bases", "gauge", "Canales con base para tramas delta", {}, len(_delta_bases)),
+        ("pose_store_info", "gauge", "Backend del store de poses", {"backend": type(store).__name__}, 1),
+        ("profiler_running", "gauge", "Perfilador por muestreo activo", {}, PROFILER.running),
+    ]
+
+
+REGISTRY.add_collector(_server_gauges)
+
+
+def metrics(req):
+    """Texto de Prometheus con las métricas de este proceso (cada worker tiene las suyas)."""
+    if req.method not in ("GET", "HEAD"): return _json(405, {"error": "GET only"})
+    return 200, {"Content-Type": METRICS_CONTENT_TYPE, "Cache-Control": "no-cache"}, REGISTRY.render().encode("utf-8")
+
+
+def profile(req):
+    """POST start|stop|reset enciende/apaga el perfilador; GET devuelve las pilas (formato collapsed)."""
+    if not getattr(settings, "METRICS", {}).get("PROFILER"): return _json(404, {"error": "profiler disabled"})
+    if req.method == "POST":
+        action = req.body.decode("utf-8", "replace").strip() or "toggle"
+        if action == "start": PROFILER.start()
+        elif action == "stop": PROFILER.stop()
+        elif action == "reset": PROFILER.reset()
+        elif action == "toggle": PROFILER.toggle()
+        else: return _json(400, {"error": "start, stop, reset o toggle"})
+        return _json(200, PROFILER.status())
+    if req.method not in ("GET", "HEAD"): return _json(405, {"error": "GET/POST only"})
+    return 200, {"Content-Type": "text/plain; charset=utf-8", "Cache-Control": "no-cache"}, \
+        PROFILER.collapsed().encode("utf-8")
+
+
+ROUTES = {
+    "/api/update-pose/": update_pose,
+    "/api/update-coords/": update_coords,
+    "/api/get-pose/": get_pose,
+    "/api/get-full-pose/": get_full_pose,
+    "/metrics": metrics,
+    "/debug/profile/": profile,
+}
+
+
+def _param(query, name):
+    values = parse_qs(query).get(name)
+    return values[0] if values else None
+
+
+_DISCONNECTED = object()
+
+
+async def _read_body(receive):
+    """Cuerpo de la petición; None si pasa de MAX_BODY y _DISCONNECTED si el cliente se fue."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect": return _DISCONNECTED
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY: return None
+        chunks.append(chunk)
+        if not message.get("more_body"): return b"".join(chunks)
+
+
+async def pose_asgi(scope, receive, send):
+    """Aplicación ASGI para las rutas de ROUTES (asgi.py decide qué llega aquí)."""
+    handler = ROUTES[scope["path"]]
+    headers = dict(scope["headers"])
+    method = scope["method"]
+    body = b""
+    if method == "POST":
+        body = await _read_body(receive)
+        if body is _DISCONNECTED: return  # Nadie a quien responder
+        if body is None:
+            status, out_headers, out = _json(413, {"status": "error", "message": "body too large"})
+            return await _send(send, status, out_headers, out)
+
+    query = scope.get("query_string", b"").decode("latin-1")
+    req = ApiRequest(
+        method, body,
+        headers.get(b"content-type", b"").decode("latin-1"),
+        clean_channel(headers.get(b"x-pose-channel", b"").decode("latin-1") or _param(query, "channel")),
+        headers.get(b"accept", b"").decode("latin-1"),
+        headers.get(b"if-none-match", b"").decode("latin-1"),
+    )
+    if getattr(get_store(), "blocking", False):
+        # Backend de red (redis): fuera del bucle de eventos
+        status, out_headers, out = await asyncio.to_thread(handler, req)
+    else:
+        status, out_headers, out = handler(req)
+    await _send(send, status, out_headers, b"" if method == "HEAD" else out)
+
+
+async def _send(send, status, headers, body):
+    raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+    raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large"}
+
+
+def pose_wsgi(environ, start_response):
+    """Lo mismo para WSGI (runserver / gunicorn sin ASGI)."""
+    handler = ROUTES[environ["PATH_INFO"]]
+    method = environ["REQUEST_METHOD"]
+    body = b""
+    if method == "POST":
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length > MAX_BODY:
+            status, headers, out = _json(413, {"status": "error", "message": "body too large"})
+            start_response(f"{status} {_REASONS[status]}", list(headers.items()))
+            return [out]
+        body = environ["wsgi.input"].read(length) if length else b""
+
+    req = ApiRequest(
+        method, body,
+        environ.get("CONTENT_TYPE", ""),
+        clean_channel(environ.get("HTTP_X_POSE_CHANNEL") or _param(environ.get("QUERY_STRING", ""), "channel")),
+        environ.get("HTTP_ACCEPT", ""),
+        environ.get("HTTP_IF_NONE_MATCH", ""),
+    )
+    status, headers, out = handler(req)
+    if method == "HEAD": out = b""
+    headers = list(headers.items()) + [("Content-Length", str(len(out)))]
+    start_response(f"{status} {_REASONS.get(status, '')}", headers)
+    return [out]
@@ -0,0 +1,230 @@
+"""
+Canal push de poses por WebSocket (ASGI puro, sin pasar por el middleware de Django).
+
+Las vistas update_pose / update_coords llaman a hub.publish(...) y cada navegador
+suscrito en /ws/pose/ recibe la última pose en cuanto llega, con un máximo de
+envíos por segundo por cliente (si llegan más rápido se manda solo la más nueva).
+
+Parámetros de la URL:
+    topic   "coords" (lo mismo que /api/get-pose/, por defecto) o "pose" (extremidades completas)
+    channel jugador/cabina cuya pose se quiere (por defecto "default")
+    fps     envíos máximos por segundo para este cliente (1..MAX_FPS)
+    format  "json" (por defecto) o "binary" (application/x-pose-v1, ver pose_codec)
+    delta   "1" con format=binary: tramas delta respecto a lo que ya tiene este cliente
+            y un keyframe cada pose_codec.KEYFRAME_INTERVAL (reconstruir con DeltaDecoder).
+            Cada cliente lleva su propio DeltaEncoder
+
+Con varios workers (store "mmap" o "redis") la pose puede llegar a otro proceso:
+cada worker vigila el número de secuencia del store y reenvía lo que sea nuevo.
+"""
+import json
+import asyncio
+import threading
+from urllib.parse import parse_qs
+
+from posecommon import pose_codec
+from .pose_store import get_store, LocalPoseStore, channel_key, clean_channel
+
+WS_PATH = "/ws/pose/"
+DEFAULT_FPS = 30.0
+MAX_FPS = 60.0
+STORE_POLL_INTERVAL = 0.01  # Segundos entre consultas del seq del store compartido
+
+
+class _Message:
+    """Última pose de un topic, serializada una sola vez para todos los clientes."""
+
+    __slots__ = ("seq", "data", "_text", "_binary")
+
+    def __init__(self, seq, data, text=None):
+        self.seq = seq
+        self.data = data
+        self._text = text
+        self._binary = None
+
+    def text(self):
+        if self._text is None:
+            self._text = json.dumps(self.data)
+        return self._text
+
+    def binary(self):
+        if self._binary is None:
+            self._binary = pose_codec.encode(self.data, seq=self.seq)
+        return self._binary
+
+
+class _Client:
+    __slots__ = ("topic", "min_interval", "binary", "delta", "event", "closed")
+
+    def __init__(self, topic, min_interval, binary, delta=False):
+        self.topic = topic
+        self.min_interval = min_interval
+        self.binary = binary
+        self.delta = pose_codec.DeltaEncoder() if delta else None
+        self.event = asyncio.Event()
+        self.closed = False
+
+
+class PoseHub:
+    """
+    Guarda la última pose de cada topic con suscriptores y despierta a sus clientes.
+    Un topic es una clave del store (channel_key): cada canal tiene los suyos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}  # topic -> _Message (solo topics con clientes en este proceso)
+        self._clients = set()
+        self._topics = {}  # topic -> nº de clientes
+        self._loop = None
+        self._watcher = None
+
+    def attach_loop(self, loop):
+        self._loop = loop
+        store = get_store()
+        if not isinstance(store, LocalPoseStore) and (self._watcher is None or self._watcher.done()):
+            self._watcher = loop.create_task(self._watch_store(store))
+
+    def publish(self, topic, data, seq, text=None):
+        """
+        Se puede llamar desde cualquier hilo (las vistas síncronas de Django).
+        seq es el número de secuencia del store: si ya tenemos uno igual o más nuevo se ignora.
+        """
+        # Nadie mira este canal en este proceso: no hace falta guardar ni serializar nada
+        if topic not in self._topics: return
+        with self._lock:
+            current = self._latest.get(topic)
+            if current is not None and current.seq >= seq: return
+            self._latest[topic] = _Message(seq, data, text)
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake, topic)
+            except RuntimeError:
+                self._loop = None  # El bucle ya no existe
+
+    def latest(self, topic):
+        return self._latest.get(topic)
+
+    async def _watch_store(self, store):
+        """Trae al hub las poses que escribieron otros workers en el store compartido."""
+        while self._clients:
+            topics = list(self._topics)
+            try:
+                fresh = await asyncio.to_thread(self._poll_store, store, topics)
+            except Exception:
+                fresh = []
+            for topic, seq, raw in fresh:
+                self.publish(topic, json.loads(raw), seq, raw.decode("utf-8"))
+            await asyncio.sleep(STORE_POLL_INTERVAL)
+
+    def _poll_store(self, store, topics):
+        fresh = []
+        for topic in topics:
+            current = self._latest.get(topic)
+            if store.seq(topic) > (current.seq if current else 0):
+                seq, raw = store.get_raw(topic)
+                if raw is not None: fresh.append((topic, seq, bytes(raw)))
+        return fresh
+
+    def _wake(self, topic):
+        for client in self._clients:
+            if client.topic == topic:
+                client.event.set()
+
+    def subscribe(self, topic, fps, binary, delta=False):
+        client = _Client(topic, 1.0 / fps, binary, delta)
+        with self._lock:
+            self._clients.add(client)
+            self._topics[topic] = self._topics.get(topic, 0) + 1
+        if topic not in self._latest:
+            # Primer suscriptor: partimos del último valor del store
+            try:
+                seq, raw = get_store().get_raw(topic)
+            except Exception:
+                raw = None
+            if raw is not None:
+                self.publish(topic, json.loads(raw), seq, bytes(raw).decode("utf-8"))
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            if client not in self._clients: return
+            self._clients.discard(client)
+            left = self._topics.get(client.topic, 1) - 1
+            if left > 0:
+                self._topics[client.topic] = left
+            else:
+                # Canal sin clientes: soltamos su última pose
+                self._topics.pop(client.topic, None)
+                self._latest.pop(client.topic, None)
+
+    @property
+    def subscribers(self):
+        return len(self._clients)
+
+
+hub = PoseHub()
+
+
+def _param(params, name, default):
+    values = params.get(name)
+    return values[0] if values else default
+
+
+async def pose_websocket(scope, receive, send):
+    """Aplicación ASGI para /ws/pose/."""
+    message = await receive()
+    if message["type"] != "websocket.connect": return
+
+    params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    topic = channel_key(_param(params, "topic", "coords"), clean_channel(_param(params, "channel", None)))
+    try:
+        fps = min(max(float(_param(params, "fps", DEFAULT_FPS)), 1.0), MAX_FPS)
+    except ValueError:
+        fps = DEFAULT_FPS
+    binary = _param(params, "format", "json") == "binary"
+    delta = binary and _param(params, "delta", "0") == "1"
+
+    loop = asyncio.get_running_loop()
+    await send({"type": "websocket.accept"})
+    client = hub.subscribe(topic, fps, binary, delta)
+    hub.attach_loop(loop)
+
+    async def reader():
+        # Solo nos interesa enterarnos de la desconexión
+        while True:
+            msg = await receive()
+            if msg["type"] == "websocket.disconnect":
+                client.closed = True
+                client.event.set()
+                return
+
+    reader_task = asyncio.create_task(reader())
+    last_seq = -1
+    last_send = 0.0
+    try:
+        while not client.closed:
+            client.event.clear()
+            msg = hub.latest(topic)
+            if msg is not None and msg.seq != last_seq:
+                wait = client.min_interval - (loop.time() - last_send)
+                if wait > 0:
+                    # Límite de envíos: esperamos y volvemos a leer la más nueva
+                    await asyncio.sleep(wait)
+                    continue
+                if client.delta is not None:
+                    await send({"type": "websocket.send", "bytes": client.delta.encode(msg.data, msg.seq)})
+                elif client.binary:
+                    await send({"type": "websocket.send", "bytes": msg.binary()})
+                else:
+                    await send({"type": "websocket.send", "text": msg.text()})
+                last_seq = msg.seq
+                last_send = loop.time()
+                continue
+            await client.event.wait()
+    except (OSError, RuntimeError):
+        pass  # El cliente se fue a mitad de envío
+    finally:
+        hub.unsubscribe(client)
+        reader_task.cancel()
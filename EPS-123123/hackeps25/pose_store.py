@@ -0,0 +1,460 @@
+"""
+Almacén de poses compartido entre workers.
+
+Antes la pose vivía en variables globales del módulo views.py, así que con varios
+workers (gunicorn/uvicorn --workers N) cada uno veía una pose distinta. Ahora todas
+las vistas leen y escriben aquí, con tres backends:
+
+    local   dict en memoria del proceso (un solo worker, por defecto)
+    mmap    fichero mapeado en memoria con seqlock: varios workers en la misma máquina
+    redis   cualquier servidor compatible con Redis (redis://localhost:6379/0)
+
+Todos ofrecen escritura atómica del último valor, número de secuencia monótono por
+clave, un histórico corto opcional y caducidad de las claves inactivas. Cada jugador o
+cabina escribe en su propio canal (channel_key("coords", "cabina1")), sin lock global.
+Se configura con POSE_STORE en settings.py.
+"""
+import os
+import json
+import time
+import mmap
+import struct
+import zlib
+import re
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl  # Bloqueo entre procesos (no existe en Windows)
+except ImportError:
+    fcntl = None
+
+try:
+    import redis  # type: ignore
+except Exception:
+    redis = None  # Solo hace falta con el backend "redis"
+
+
+DEFAULT_CHANNEL = "default"
+# Hueco por pose del backend mmap: una pose estéreo/multivista (15 articulaciones con
+# velocidad + extremities_3d) ronda los 5 KB en JSON
+MMAP_MAX_BYTES = 16384
+_CHANNEL_RE = re.compile(r"^[A-Za-z0-9_.-]{1,48}$")
+_LOCK_STRIPES = 64
+
+
+class PoseTooLarge(ValueError):
+    """La pose serializada no cabe en el hueco del store (la API responde 413)."""
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _next_seq(prev):
+    """
+    Secuencia monótona por clave basada en microsegundos: sigue creciendo aunque la
+    clave caduque y se vuelva a crear (los clientes nunca ven un seq hacia atrás).
+    """
+    return max(prev + 1, time.time_ns() // 1000)
+
+
+def clean_channel(value):
+    """Id de canal (jugador/cabina) válido, o DEFAULT_CHANNEL si no lo es."""
+    if value and _CHANNEL_RE.match(value): return value
+    return DEFAULT_CHANNEL
+
+
+def channel_key(topic, channel):
+    """Clave del store para un topic ("pose"/"coords") de un canal."""
+    return f"{topic}:{channel}"
+
+
+class PoseStore:
+    """
+    Interfaz común. Los valores se guardan ya serializados en JSON (bytes).
+    Las claves que no se escriben en `ttl` segundos caducan (0 = nunca).
+    """
+
+    ttl = 0
+    blocking = False  # True si cada operación va por red (no llamar desde un bucle asyncio)
+
+    def set_raw(self, key, raw):
+        """Guarda los bytes de la pose y devuelve el nuevo número de secuencia."""
+        raise NotImplementedError
+
+    def get_raw(self, key):
+        """Devuelve (seq, bytes) o (0, None) si la clave no existe o caducó."""
+        raise NotImplementedError
+
+    def seq(self, key):
+        return self.get_raw(key)[0]
+
+    def history(self, key, n=None):
+        """Últimas escrituras [(seq, timestamp, data), ...] de la más vieja a la más nueva."""
+        return []
+
+    def set(self, key, data):
+        return self.set_raw(key, _dumps(data))
+
+    def get(self, key, default=None):
+        seq, raw = self.get_raw(key)
+        if raw is None: return seq, default
+        return seq, json.loads(raw)
+
+
+class LocalPoseStore(PoseStore):
+    """
+    Backend en memoria: válido solo con un worker.
+    Lecturas sin bloqueo (un dict.get) y escrituras con un lock por franja de claves,
+    así canales distintos no compiten por un lock global.
+    """
+
+    def __init__(self, history=0, ttl=0):
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._values = {}  # key -> (seq, raw, last_write)
+        self._history_len = history
+        self._history = {}
+        self.ttl = ttl
+        self._last_sweep = time.time()
+
+    def set_raw(self, key, raw):
+        now = time.time()
+        with self._locks[hash(key) % _LOCK_STRIPES]:
+            prev = self._values.get(key)
+            seq = _next_seq(prev[0] if prev else 0)
+            self._values[key] = (seq, raw, now)
+            if self._history_len:
+                hist = self._history.get(key)
+                if hist is None or (self.ttl and prev and now - prev[2] > self.ttl):
+                    # Canal nuevo o caducado: no arrastramos el histórico de la sesión anterior
+                    hist = self._history[key] = deque(maxlen=self._history_len)
+                hist.append((seq, now, raw))
+        if self.ttl and now - self._last_sweep > self.ttl / 4:
+            self._sweep(now)
+        return seq
+
+    def _sweep(self, now):
+        """Borra los canales inactivos (como mucho cada ttl/4 segundos)."""
+        self._last_sweep = now
+        for key, (_, _, last_write) in list(self._values.items()):
+            if now - last_write > self.ttl:
+                self._values.pop(key, None)
+                self._history.pop(key, None)
+
+    def get_raw(self, key):
+        item = self._values.get(key)
+        if item is None: return 0, None
+        seq, raw, last_write = item
+        if self.ttl and time.time() - last_write > self.ttl: return 0, None
+        return seq, raw
+
+    def history(self, key, n=None):
+        if self.get_raw(key)[1] is None: return []
+        items = list(self._history.get(key, ()))
+        if n is not None: items = items[-n:]
+        return [(seq, ts, json.loads(raw)) for seq, ts, raw in items]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class MmapPoseStore(PoseStore):
+    """
+    Tabla hash de tamaño fijo en un fichero mapeado en memoria.
+
+    Cada slot tiene un contador seqlock: el escritor lo deja impar mientras escribe y
+    par al terminar, así los lectores (sin bloqueo) reintentan si pillan una escritura
+    a medias y nunca ven una pose rota. Si el contador sigue impar más de READ_TIMEOUT
+    (el escritor murió a mitad) el slot se da por vacío hasta que otro escritor lo
+    repara al coger su lock (lockf se suelta al morir el proceso).
+    Los escritores bloquean solo su slot (lockf sobre su rango de bytes); dar de alta
+    una clave nueva bloquea además la cabecera del fichero. Los slots de claves
+    caducadas se reutilizan al dar de alta claves nuevas.
+
+    Slot:  Q seqlock | Q seq | d última escritura | 64s clave | H nº entradas | H cabeza | ring
+    Entrada: Q seq | d timestamp | I longitud | datos (max_bytes)
+    """
+
+    MAGIC = b"PSTORE02"
+    _FILE_HEADER = struct.Struct("<8sIII")  # magic, slots, max_bytes, history
+    _SLOT_HEADER = struct.Struct("<QQd64sHH")
+    _ENTRY_HEADER = struct.Struct("<QdI")
+    _U64 = struct.Struct("<Q")
+    KEY_BYTES = 64
+    _KEY_OFF = 24  # Desplazamiento de la clave dentro del slot
+    TOMBSTONE = b"\xff"
+    READ_TIMEOUT = 0.05  # Segundos que un lector espera a un escritor a mitad
+
+    def __init__(self, path, slots=256, max_bytes=MMAP_MAX_BYTES, history=0, ttl=0):
+        self.path = path
+        self.slots = slots
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ring = history + 1  # Entrada actual + histórico
+        self.entry_size = self._ENTRY_HEADER.size + max_bytes
+        self.slot_size = self._SLOT_HEADER.size + self.ring * self.entry_size
+        size = self._FILE_HEADER.size + slots * self.slot_size
+
+        self._thread_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._claim_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._claim_guard():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, size)
+            magic, f_slots, f_bytes, f_hist = self._FILE_HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC:
+                self._FILE_HEADER.pack_into(self._mm, 0, self.MAGIC, slots, max_bytes, history)
+            elif (f_slots, f_bytes, f_hist) != (slots, max_bytes, history):
+                raise ValueError(f"{path} tiene otra geometría ({f_slots}, {f_bytes}, {f_hist}); bórralo")
+        self._slot_cache = {}  # key -> offset del slot (se valida en cada acceso)
+
+    # --- BLOQUEOS ---
+    @contextmanager
+    def _slot_guard(self, off):
+        lock = self._thread_locks[(off // self.slot_size) % _LOCK_STRIPES]
+        with lock:
+            if fcntl is not None: fcntl.lockf(self._fd, fcntl.LOCK_EX, self.slot_size, off)
+            try:
+                yield
+            finally:
+                if fcntl is not None: fcntl.lockf(self._fd, fcntl.LOCK_UN, self.slot_size, off)
+
+    @contextmanager
+    def _claim_guard(self):
+        with self._claim_lock:
+            if fcntl is not None: fcntl.lockf(self._fd, fcntl.LOCK_EX, self._FILE_HEADER.size, 0)
+            try:
+                yield
+            finally:
+                if fcntl is not None: fcntl.lockf(self._fd, fcntl.LOCK_UN, self._FILE_HEADER.size, 0)
+
+    # --- SLOTS ---
+    def _slot_offset(self, index):
+        return self._FILE_HEADER.size + index * self.slot_size
+
+    def _key_at(self, off):
+        return bytes(self._mm[off + self._KEY_OFF:off + self._KEY_OFF + self.KEY_BYTES]).rstrip(b"\0")
+
+    def _expired(self, off, now):
+        if not self.ttl: return False
+        (last_write,) = struct.unpack_from("<d", self._mm, off + 16)
+        return now - last_write > self.ttl
+
+    def _find(self, key_bytes, create):
+        """Sondeo lineal desde crc32(clave): determinista en todos los procesos."""
+        start = zlib.crc32(key_bytes) % self.slots
+        now = time.time()
+        reuse = None
+        for i in range(self.slots):
+            off = self._slot_offset((start + i) % self.slots)
+            stored = self._key_at(off)
+            if stored == key_bytes: return off
+            if not stored:
+                # Slot nunca usado: fin de la cadena de sondeo
+                if not create: return None
+                return self._claim(off if reuse is None else reuse, key_bytes)
+            if reuse is None and (stored == self.TOMBSTONE or self._expired(off, now)):
+                reuse = off
+        if create and reuse is not None: return self._claim(reuse, key_bytes)
+        if create: raise MemoryError("MmapPoseStore lleno: aumenta 'slots' o baja el ttl")
+        return None
+
+    def _claim(self, off, key_bytes):
+        """Asigna el slot a una clave nueva (vacía el histórico de la anterior)."""
+        with self._slot_guard(off):
+            (counter,) = self._U64.unpack_from(self._mm, off)
+            counter += counter & 1  # Escritor muerto a mitad: el slot se reescribe entero
+            self._U64.pack_into(self._mm, off, counter + 1)
+            self._mm[off + self._KEY_OFF:off + self._KEY_OFF + self.KEY_BYTES] = key_bytes.ljust(self.KEY_BYTES, b"\0")
+            struct.pack_into("<HH", self._mm, off + self._KEY_OFF + self.KEY_BYTES, 0, 0)
+            self._U64.pack_into(self._mm, off, counter + 2)
+        return off
+
+    def _offset(self, key, create):
+        key_bytes = key.encode("utf-8")
+        off = self._slot_cache.get(key)
+        # El slot pudo reasignarse a otra clave (caducidad) desde otro proceso
+        if off is not None and self._key_at(off) == key_bytes: return off
+        if len(key_bytes) > self.KEY_BYTES: raise ValueError(f"Clave demasiado larga: {key}")
+        off = self._find(key_bytes, create=False)
+        if off is None and create:
+            with self._claim_guard():
+                off = self._find(key_bytes, create=True)
+        if off is not None: self._slot_cache[key] = off
+        else: self._slot_cache.pop(key, None)
+        return off
+
+    def set_raw(self, key, raw):
+        if len(raw) > self.max_bytes:
+            raise PoseTooLarge(f"Pose de {len(raw)} bytes > max_bytes={self.max_bytes} (POSE_STORE['MAX_BYTES'])")
+        key_bytes = key.encode("utf-8")
+        while True:
+            off = self._offset(key, create=True)
+            with self._slot_guard(off):
+                counter, prev_seq, _, stored, count, head = self._SLOT_HEADER.unpack_from(self._mm, off)
+                if stored.rstrip(b"\0") != key_bytes:
+                    continue  # Reasignado mientras esperábamos el lock: buscar de nuevo
+                if counter & 1:
+                    # El escritor anterior murió a mitad: su entrada se pisa con esta
+                    counter += 1
+                now = time.time()
+                seq = _next_seq(prev_seq)
+                head = (head + 1) % self.ring if count else 0
+                count = min(count + 1, self.ring)
+
+                self._U64.pack_into(self._mm, off, counter + 1)  # Impar: escritura en curso
+                entry = off + self._SLOT_HEADER.size + head * self.entry_size
+                self._ENTRY_HEADER.pack_into(self._mm, entry, seq, now, len(raw))
+                data_off = entry + self._ENTRY_HEADER.size
+                self._mm[data_off:data_off + len(raw)] = raw
+                struct.pack_into("<Qd", self._mm, off + 8, seq, now)
+                struct.pack_into("<HH", self._mm, off + self._KEY_OFF + self.KEY_BYTES, count, head)
+                self._U64.pack_into(self._mm, off, counter + 2)  # Par: listo
+                return seq
+
+    def _read_slot(self, off, key_bytes, entries):
+        """
+        Lectura sin bloqueo con reintento seqlock. entries: cuántas entradas copiar.
+        Devuelve (seq, [(seq, ts, bytes), ...]) de la más nueva a la más vieja, o (0, [])
+        si no se consigue una lectura coherente en READ_TIMEOUT.
+        """
+        deadline = None
+        while True:
+            counter, seq, last_write, stored, count, head = self._SLOT_HEADER.unpack_from(self._mm, off)
+            if counter & 1:
+                # Escritor a mitad: cedemos la CPU y reintentamos, pero no para siempre
+                now = time.monotonic()
+                if deadline is None: deadline = now + self.READ_TIMEOUT
+                elif now > deadline: return 0, []
+                time.sleep(0)
+                continue
+            out = []
+            if stored.rstrip(b"\0") == key_bytes and not (self.ttl and time.time() - last_write > self.ttl):
+                for k in range(min(entries, count)):
+                    idx = (head - k) % self.ring
+                    entry = off + self._SLOT_HEADER.size + idx * self.entry_size
+                    e_seq, ts, length = self._ENTRY_HEADER.unpack_from(self._mm, entry)
+                    data_off = entry + self._ENTRY_HEADER.size
+                    out.append((e_seq, ts, self._mm[data_off:data_off + min(length, self.max_bytes)]))
+            else:
+                seq = 0
+            (counter2,) = self._U64.unpack_from(self._mm, off)
+            if counter2 == counter:
+                return seq, out
+
+    def seq(self, key):
+        off = self._offset(key, create=False)
+        if off is None: return 0
+        _, seq, last_write = struct.unpack_from("<QQd", self._mm, off)
+        if self.ttl and time.time() - last_write > self.ttl: return 0
+        return seq
+
+    def get_raw(self, key):
+        off = self._offset(key, create=False)
+        if off is None: return 0, None
+        seq, entries = self._read_slot(off, key.encode("utf-8"), 1)
+        if not entries: return 0, None
+        return seq, entries[0][2]
+
+    def history(self, key, n=None):
+        off = self._offset(key, create=False)
+        if off is None: return []
+        _, entries = self._read_slot(off, key.encode("utf-8"), self.ring if n is None else min(n, self.ring))
+        return [(seq, ts, json.loads(raw)) for seq, ts, raw in reversed(entries)]
+
+
+class RedisPoseStore(PoseStore):
+    """
+    Backend Redis (o cualquier servidor que hable su protocolo: KeyDB, Dragonfly, un
+    sustituto local...). Un script Lua hace seq + HSET + histórico + caducidad en una
+    sola operación atómica; las lecturas son un HMGET por clave.
+    """
+
+    _SET_SCRIPT = """
+    local prev = tonumber(redis.call('HGET', KEYS[1], 'seq') or '0')
+    local seq = math.max(prev + 1, tonumber(ARGV[4]))
+    local seq_str = string.format('%.0f', seq)
+    redis.call('HSET', KEYS[1], 'seq', seq_str, 'data', ARGV[1])
+    local hist = tonumber(ARGV[2])
+    if hist > 0 then
+        redis.call('LPUSH', KEYS[2], seq_str .. '|' .. ARGV[3] .. '|' .. ARGV[1])
+        redis.call('LTRIM', KEYS[2], 0, hist - 1)
+    end
+    local ttl_ms = tonumber(ARGV[5])
+    if ttl_ms > 0 then
+        redis.call('PEXPIRE', KEYS[1], ttl_ms)
+        if hist > 0 then redis.call('PEXPIRE', KEYS[2], ttl_ms) end
+    end
+    return seq_str
+    """
+
+    blocking = True
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="pose:", history=0, ttl=0, client=None):
+        if client is None:
+            if redis is None: raise ImportError("El backend 'redis' necesita 'pip install redis'")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.history_len = history
+        self.ttl = ttl
+        self._set = self.client.register_script(self._SET_SCRIPT)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def set_raw(self, key, raw):
+        k = self._key(key)
+        return int(self._set(keys=[k, k + ":hist"],
+                             args=[raw, self.history_len, repr(time.time()), time.time_ns() // 1000,
+                                   int(self.ttl * 1000)]))
+
+    def get_raw(self, key):
+        seq, raw = self.client.hmget(self._key(key), "seq", "data")
+        return (int(seq) if seq else 0), raw
+
+    def seq(self, key):
+        seq = self.client.hget(self._key(key), "seq")
+        return int(seq) if seq else 0
+
+    def history(self, key, n=None):
+        n = self.history_len if n is None else n
+        if not n: return []
+        items = self.client.lrange(self._key(key) + ":hist", 0, n - 1)
+        out = []
+        for item in reversed(items):
+            seq, ts, raw = item.split(b"|", 2)
+            out.append((int(seq), float(ts), json.loads(raw)))
+        return out
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def build_store(config):
+    backend = config.get("BACKEND", "local")
+    history = int(config.get("HISTORY", 0))
+    ttl = float(config.get("TTL", 0))
+    if backend == "local":
+        return LocalPoseStore(history=history, ttl=ttl)
+    if backend == "mmap":
+        return MmapPoseStore(config.get("PATH", "pose_store.bin"), slots=int(config.get("SLOTS", 256)),
+                             max_bytes=int(config.get("MAX_BYTES", MMAP_MAX_BYTES)), history=history, ttl=ttl)
+    if backend == "redis":
+        return RedisPoseStore(config.get("URL", "redis://localhost:6379/0"), history=history, ttl=ttl)
+    raise ValueError(f"Backend de POSE_STORE desconocido: {backend}")
+
+
+def get_store():
+    """Store configurado en settings.POSE_STORE (se crea una vez por proceso)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from django.conf import settings
+                _store = build_store(getattr(settings, "POSE_STORE", {}))
+    return _store
@@ -0,0 +1,133 @@
+"""
+Lo que necesita camera.html para montar la escena, resuelto en el servidor.
+
+La vista camera ya sabe qué escenario y personaje hay: en vez de que el navegador pida
+{escenario}_config.json y solo después empiece con el .glb (dos viajes en serie), aquí
+se lee y valida la configuración (cacheada en el proceso, se relee si cambia el
+fichero), se mete en la página y se calculan exactamente los modelos que se van a
+cargar para anunciarlos con <link rel="preload">.
+"""
+import json
+import math
+import os
+import re
+
+from django.conf import settings
+from django.templatetags.static import static
+
+from . import assets
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_COLOR_RE = re.compile(r"^#[0-9A-Fa-f]{6}$")
+
+# La que se usaba en camera.html cuando no había config
+DEFAULT_CONFIG = {
+    "scale": {"x": 3.0, "y": 3.0, "z": 3.0},
+    "position": {"x": 0.0, "y": 0.0, "z": 0.0},
+    "rotation": {"x": -math.pi / 2, "y": 0.0, "z": 0.0},
+    "background_color": "#bc8a5a",
+}
+# Fichero de animación del personaje -> acción de camera.html (sin build; el de elvis es walk.glb)
+CHARACTER_CLIPS = {"awaiting": ("idle.glb",), "walking": ("walking.glb", "walk.glb"), "waving": ("waving.glb",)}
+
+_configs = {}  # ruta -> (mtime, config validada)
+
+
+def _models_dir():
+    return os.path.join(settings.BASE_DIR, "static", "models")
+
+
+def clean_name(value):
+    """Nombre de escenario/personaje válido (va en rutas de ficheros), o None."""
+    return value if value and _NAME_RE.match(value) else None
+
+
+def _vec3(value, default):
+    if not isinstance(value, dict): return dict(default)
+    out = {}
+    for k in ("x", "y", "z"):
+        v = value.get(k, default[k])
+        out[k] = float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) else default[k]
+    return out
+
+
+def clean_config(raw):
+    """Config de escenario con todos los campos y tipos correctos (lo que falte o sobre se ignora)."""
+    if not isinstance(raw, dict): raw = {}
+    color = raw.get("background_color")
+    return {
+        "scale": _vec3(raw.get("scale"), DEFAULT_CONFIG["scale"]),
+        "position": _vec3(raw.get("position"), DEFAULT_CONFIG["position"]),
+        "rotation": _vec3(raw.get("rotation"), DEFAULT_CONFIG["rotation"]),
+        "background_color": color if isinstance(color, str) and _COLOR_RE.match(color) else DEFAULT_CONFIG["background_color"],
+    }
+
+
+def stage_config(stage):
+    """Config validada de static/models/room/<stage>_config.json (DEFAULT_CONFIG si no hay)."""
+    stage = clean_name(stage)
+    if stage is None: return clean_config(None)
+    path = os.path.join(_models_dir(), "room", f"{stage}_config.json")
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return clean_config(None)
+    cached = _configs.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[scene] {path}: {e}")
+            raw = None
+        cached = (mtime, clean_config(raw))
+        _configs[path] = cached
+    return cached[1]
+
+
+def room_model(stage):
+    """URL del GLB del escenario (el del build si existe), o None si no hay modelo."""
+    stage = clean_name(stage)
+    if stage is None: return None
+    built = assets.asset_url(f"models/room/{stage}.glb")
+    if built: return built
+    if os.path.isfile(os.path.join(_models_dir(), "room", f"{stage}.glb")):
+        return static(f"models/room/{stage}.glb")
+    return None
+
+
+def character_models(character):
+    """
+    (URL del GLB combinado o None, {acción: URL} de los GLB sueltos que existen). Los
+    sueltos son el respaldo si el combinado falla o no se ha hecho el build.
+    """
+    character = clean_name(character)
+    if character is None: return None, {}
+    built = assets.asset_url(f"models/caracter/{character}.glb")
+    folder = os.path.join(_models_dir(), "caracter", character)
+    files = {}
+    for action, candidates in CHARACTER_CLIPS.items():
+        for name in candidates:
+            if os.path.isfile(os.path.join(folder, name)):
+                files[action] = static(f"models/caracter/{character}/{name}")
+                break
+    return built, files
+
+
+def scene_context(stage, character):
+    """Contexto de camera.html: config del escenario, modelos a cargar y los que se precargan."""
+    room = room_model(stage)
+    combined, separate = character_models(character)
+    preload = [url for url in (room, combined) if url]
+    if not combined and "awaiting" in separate:
+        preload += separate.values()
+    built = [assets.entry(f"models/room/{stage}.glb") if clean_name(stage) else None,
+             assets.entry(f"models/caracter/{character}.glb") if clean_name(character) else None]
+    return {
+        "stage_config": stage_config(stage),
+        "room_model": room,
+        "character_model": combined,
+        "character_files": separate,
+        "preload_models": preload,
+        "assets_meshopt": any(e and e.get("meshopt") for e in built),
+    }
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from django.urls import reverse_lazy
+from django.core.exceptions import ImproperlyConfigured
 from django.contrib.messages import constants as messages
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -21,13 +23,23 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
+# Modo producción (HACKEPS_PRODUCTION=1): CSS comprimido offline (python manage.py compress
+# en el despliegue), plantillas compiladas una vez por proceso y sesión en cookie firmada,
+# así que elegir personaje/escenario y empezar una partida no escribe en SQLite.
+PRODUCTION = os.environ.get('HACKEPS_PRODUCTION', '0') == '1'
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-*$p0m^#-5dt%rrwt#gjk7--&k%7k#ggi!r+^h#-7g)!dz31w!e'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    if PRODUCTION:
+        # Con sesiones en cookie firmada, quien conozca la clave puede fabricar sesiones
+        raise ImproperlyConfigured('HACKEPS_PRODUCTION=1 necesita DJANGO_SECRET_KEY')
+    SECRET_KEY = 'django-insecure-*$p0m^#-5dt%rrwt#gjk7--&k%7k#ggi!r+^h#-7g)!dz31w!e'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '0' if PRODUCTION else '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [h for h in os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1' if PRODUCTION else '').split(',') if h]
 
 
 # Application definition
@@ -59,7 +71,7 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': not PRODUCTION,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -70,6 +82,15 @@ TEMPLATES = [
         },
     },
 ]
+if PRODUCTION:
+    # Cargador con caché explícito: cada plantilla se compila una vez por proceso y no se
+    # vuelve a mirar en disco (DEBUG ya no lo decide la versión de Django)
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
 
 WSGI_APPLICATION = 'hackeps25.wsgi.application'
 
@@ -85,6 +106,26 @@ DATABASES = {
 }
 
 
+# Sesiones: "db" (tabla django_session, una escritura por cambio), "cookies" (cookie
+# firmada, sin base de datos) o "cache" (CACHES['default']; con CACHE_URL=redis://... la
+# comparten todos los workers)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookies' if PRODUCTION else 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'cache': 'django.contrib.sessions.backends.cache',
+}[SESSION_BACKEND]
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_URL'],
+    } if os.environ.get('CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -126,9 +167,36 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Almacén de poses compartido entre workers (ver hackeps25/pose_store.py)
+# BACKEND: "local" (un worker), "mmap" (varios workers en la misma máquina) o "redis"
+POSE_STORE = {
+    'BACKEND': os.environ.get('POSE_STORE_BACKEND', 'local'),
+    'PATH': os.environ.get('POSE_STORE_PATH', str(BASE_DIR / 'pose_store.bin')),
+    'URL': os.environ.get('POSE_STORE_URL', 'redis://localhost:6379/0'),
+    'HISTORY': int(os.environ.get('POSE_STORE_HISTORY', '8')),
+    # Bytes por pose en el backend mmap (una pose estéreo en JSON ronda los 5 KB)
+    'MAX_BYTES': int(os.environ.get('POSE_STORE_MAX_BYTES', '16384')),
+    # Segundos sin escrituras tras los que un canal (jugador/cabina) se da por terminado
+    'TTL': float(os.environ.get('POSE_STORE_TTL', '300')),
+}
+
+# /metrics siempre; el perfilador por muestreo (/debug/profile/) solo si se activa aquí
+METRICS = {
+    'PROFILER': os.environ.get('METRICS_PROFILER', '1' if DEBUG else '0') == '1',
+}
+
+# Modelos 3D optimizados (python manage.py build_assets, ver hackeps25/assets.py)
+ASSETS = {
+    'SOURCE_DIR': BASE_DIR / 'static' / 'models',
+    'BUILD_DIR': Path(os.environ.get('ASSETS_BUILD_DIR', str(BASE_DIR / 'static' / 'build'))),
+}
+
 COMPRESS_ROOT = BASE_DIR / 'static'
 
 COMPRESS_ENABLED = True
+# En producción el {% compress %} no lee ni hashea el CSS en cada petición: se busca en
+# static/CACHE/manifest.json, que genera `python manage.py compress` (bundles con hash)
+COMPRESS_OFFLINE = PRODUCTION
 LOGOUT_REDIRECT_URL = 'login'
 STATICFILES_FINDERS = ('compressor.finders.CompressorFinder',)
 LOGIN_URL = 'login'
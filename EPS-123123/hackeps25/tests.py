@@ -0,0 +1,112 @@
+import os
+import json
+import asyncio
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+from posecommon import pose_codec
+
+from . import pose_api
+from .pose_store import MmapPoseStore, PoseTooLarge, channel_key
+
+JOINTS = ("nose", "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+          "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle", "left_foot", "right_foot")
+
+
+def stereo_pose(views=2):
+    """Pose como la arma main.py con fusión: 15 articulaciones con velocidad + extremities_3d."""
+    v = 0.123456789012345
+    return {
+        "timestamp": 1760000000.1234567,
+        "camera_mode": "stereo" if views > 1 else "single",
+        "state": "walking",
+        "extremities": {name: {"x": v, "y": v, "z": -v, "pixel_x": 1234.5678901234, "pixel_y": 765.43210987654,
+                               "moving": True, "speed": 12.345678901234, "vx": -v, "vy": v} for name in JOINTS},
+        "extremities_3d": {name: {"x": -v, "y": v, "z": 3.0123456789012} for name in JOINTS},
+    }
+
+
+class MmapPoseStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MmapPoseStore(os.path.join(self.tmp.name, "poses.bin"), slots=8, history=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stereo_pose_fits(self):
+        pose = stereo_pose()
+        self.assertGreater(len(json.dumps(pose, separators=(",", ":"))), 4096)
+        seq = self.store.set(channel_key("pose", "cabina1"), pose)
+        self.assertEqual(self.store.get(channel_key("pose", "cabina1")), (seq, pose))
+
+    def test_update_pose_stereo_and_too_large(self):
+        req = lambda body: pose_api.ApiRequest("POST", body, "application/json", "cabina1", "", "")
+        with mock.patch.object(pose_api, "get_store", return_value=self.store):
+            status, _, _ = pose_api.update_pose(req(json.dumps(stereo_pose()).encode()))
+            self.assertEqual(status, 200)
+            huge = stereo_pose()
+            huge["extremities_3d"] = {f"j{i}": {"x": 0.1, "y": 0.2, "z": 0.3} for i in range(1000)}
+            pose_api._last_error_log[0] = 0.0
+            with self.assertLogs("hackeps25.pose_api", "WARNING"):
+                status, _, body = pose_api.update_pose(req(json.dumps(huge).encode()))
+            self.assertEqual(status, 413)
+            self.assertIn("max_bytes", json.loads(body)["message"])
+
+    def test_reader_gives_up_on_dead_writer(self):
+        key = channel_key("pose", "cabina1")
+        self.store.set(key, stereo_pose())
+        off = self.store._offset(key, create=False)
+        (counter,) = self.store._U64.unpack_from(self.store._mm, off)
+        self.store._U64.pack_into(self.store._mm, off, counter + 1)  # Escritor muerto a mitad
+        self.assertEqual(self.store.get_raw(key), (0, None))
+        self.store.set(key, {"extremities": {}})  # El siguiente escritor repara el slot
+        self.assertEqual(self.store.get(key)[1], {"extremities": {}})
+        with self.assertRaises(PoseTooLarge):
+            self.store.set_raw(key, b"x" * (self.store.max_bytes + 1))
+
+    def test_state_follows_store(self):
+        req = lambda pose: pose_api.ApiRequest("POST", json.dumps(pose).encode(), "application/json", "cabina1", "", "")
+        coords = channel_key("coords", "cabina1")
+        with mock.patch.object(pose_api, "get_store", return_value=self.store):
+            pose_api.update_pose(req(stereo_pose()))
+            self.assertEqual(self.store.get(coords)[1]["state"], "walking")
+            self.store.set(coords, {"position": {"x": 0, "y": 0}, "state": "normal"})  # Otro worker, o el TTL
+            pose_api.update_pose(req(stereo_pose()))
+            self.assertEqual(self.store.get(coords)[1]["state"], "walking")
+
+
+class PoseCodecTests(SimpleTestCase):
+    def test_store_seq_survives_the_wire(self):
+        seq = 1760000000123456  # Los seq del store son microsegundos: no caben en 32 bits
+        encoder, decoder = pose_codec.DeltaEncoder(), pose_codec.DeltaDecoder()
+        decoder.feed(encoder.encode(stereo_pose(), seq))
+        moved = stereo_pose()
+        moved["extremities"]["nose"]["x"] += 0.1
+        delta = encoder.encode(moved, seq + 1)
+        self.assertEqual(pose_codec.decode(delta)["delta"]["base"], seq)
+        self.assertEqual(decoder.feed(delta)[-1]["seq"], seq + 1)
+
+
+class PoseAsgiTests(SimpleTestCase):
+    def asgi(self, *messages):
+        """Estados con los que responde pose_asgi a un POST con esos mensajes de entrada."""
+        pending, sent = list(messages), []
+
+        async def receive():
+            return pending.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": "/api/update-pose/", "method": "POST", "headers": []}
+        asyncio.run(pose_api.pose_asgi(scope, receive, send))
+        return [m["status"] for m in sent if m["type"] == "http.response.start"]
+
+    def test_disconnect_gets_no_response(self):
+        self.assertEqual(self.asgi({"type": "http.request", "body": b"{", "more_body": True},
+                                   {"type": "http.disconnect"}), [])
+
+    def test_body_too_large(self):
+        self.assertEqual(self.asgi({"type": "http.request", "body": b"x" * (pose_api.MAX_BODY + 1)}), [413])
@@ -19,11 +19,12 @@ from django.urls import path
 from .views import LoginBootstrapView
 from django.contrib.auth.views import LogoutView
 
-from .views import index, accordion, update_pose, update_coords, get_pose, camera, register, carousel, collapse, dial, \
+from .views import index, accordion, update_pose, update_coords, get_pose, get_full_pose, camera, register, carousel, collapse, dial, \
     dismiss, modal, \
     drawer, \
     dropdown, popover, tabs, \
-    tooltip, input_counter, datepicker, base, capture_motion_view, sign_out
+    tooltip, input_counter, datepicker, base, capture_motion_view, sign_out, serve_asset, \
+    metrics, profile
 
 urlpatterns = [
     path('logout/', sign_out, name='logout'),
@@ -33,7 +34,10 @@ urlpatterns = [
     path('', index, name='index'),
     path('api/update-pose/', update_pose, name='update_pose'),
     path('mocap/', capture_motion_view, name='mocap'),
-    path('api/get-pose/', get_pose, name='get_pose'),
+    path('assets/<path:name>', serve_asset, name='asset'),
+    path('metrics', metrics, name='metrics'),
+    path('debug/profile/', profile, name='profile'),
+    path('api/get-full-pose/', get_full_pose, name='get_full_pose'),
     path('accordion', accordion, name='accordion'),
     path('carousel', carousel, name='carousel'),
     path('collapse', collapse, name='collapse'),
@@ -1,13 +1,43 @@
-import json
 from django.contrib.auth.decorators import login_required
-import form
-from django.http import JsonResponse
+from django.http import HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.views import LoginView
 from django.contrib import messages
 from django.contrib.auth import login, authenticate
 from django.shortcuts import render, redirect
 
+from . import assets, pose_api, scene
+from .pose_store import clean_channel
+
+
+def _channel(request):
+    """
+    Canal (jugador/cabina) de la petición: cabecera X-Pose-Channel (tracker),
+    ?channel= (navegador) o el guardado en sesión por la vista camera.
+    """
+    value = request.headers.get("X-Pose-Channel") or request.GET.get("channel")
+    if not value and hasattr(request, "session"):
+        value = request.session.get("pose_channel")
+    return clean_channel(value)
+
+
+def _api_response(handler, request):
+    """Adapta un handler de pose_api (el camino rápido) a una vista de Django."""
+    req = pose_api.ApiRequest(request.method, request.body, request.content_type, _channel(request),
+                              request.headers.get("Accept", ""), request.headers.get("If-None-Match", ""))
+    status, headers, body = handler(req)
+    return HttpResponse(body, status=status, headers=headers)
+
+
+def _remember(request, **values):
+    """
+    Guarda valores en la sesión solo si cambian: repetir la misma selección no marca la
+    sesión como modificada (ni escritura en la tabla de sesiones ni Set-Cookie nuevo).
+    """
+    for key, value in values.items():
+        if request.session.get(key) != value:
+            request.session[key] = value
+
 
 @login_required  # This decorator checks if user is logged in
 def index(request):
@@ -17,17 +47,11 @@ def index(request):
         selected_character = request.POST.get('captain')  # Recibirá: 'the_boss', 'monster', etc.
         selected_stage = request.POST.get('sidekick')  # Recibirá: 'church', 'disco', etc.
 
-        # 2. (Opcional) Imprimimos en la terminal para comprobar que funciona
-        print(f"--- SELECCIÓN RECIBIDA ---")
-        print(f"Personaje: {selected_character}")
-        print(f"Escenario: {selected_stage}")
-
-        # 3. Guardamos la selección para usarla después (por ejemplo, en la vista del juego)
+        # 2. Guardamos la selección para usarla después (por ejemplo, en la vista del juego)
         # Usar 'request.session' es la forma correcta de pasar datos entre páginas en Django
-        request.session['player_character'] = selected_character
-        request.session['player_stage'] = selected_stage
+        _remember(request, player_character=selected_character, player_stage=selected_stage)
 
-        # 4. ¿Qué quieres hacer ahora?
+        # 3. ¿Qué quieres hacer ahora?
         # Opción A: Quedarse en la misma página
         # return render(request, 'index.html')
 
@@ -56,13 +80,8 @@ def camera(request):
         selected_character = request.POST.get('captain')
         selected_stage = request.POST.get('sidekick')
 
-        print(f"--- DATOS RECIBIDOS EN CAMERA ---")
-        print(f"Personaje: {selected_character}")
-        print(f"Escenario: {selected_stage}")
-
         # Guardamos en sesión (opcional, pero útil si recargas la página)
-        request.session['player_character'] = selected_character
-        request.session['player_stage'] = selected_stage
+        _remember(request, player_character=selected_character, player_stage=selected_stage)
 
         # Preparamos los datos para enviarlos al HTML 'camera.html'
         context = {
@@ -77,6 +96,14 @@ def camera(request):
             'selected_stage': request.session.get('player_stage')
         }
 
+    # Canal de pose de esta pantalla (?channel=cabina1 lo fija para la sesión)
+    if request.GET.get('channel'):
+        _remember(request, pose_channel=clean_channel(request.GET['channel']))
+    context['pose_channel'] = _channel(request)
+
+    # Config del escenario y modelos a cargar/precargar (GLB del build si existe, ver scene.py)
+    context.update(scene.scene_context(context.get('selected_stage'), context.get('selected_character')))
+
     # Renderizamos pasando el contexto
     return render(request, 'camera.html', context)
 
@@ -131,43 +158,14 @@ def base(request):
 
 
 
-latest_pose_data = {
-    "extremities": {
-        "nose": {"x": 0.5, "y": 0.5},
-        "left_wrist": {"x": 0.5, "y": 0.5},
-        "right_wrist": {"x": 0.5, "y": 0.5}
-    }
-}
-
-
 @csrf_exempt
 def update_pose(request):
     """
     Recibe el JSON completo del script de Python.
     Espera estructura: { "extremities": { ... }, "timestamp": ... }
+    El tracker normalmente entra por pose_api (sin middleware); esto es el mismo handler.
     """
-    global latest_pose_data
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-
-            # Validamos si viene la data de extremidades
-            if "extremities" in data:
-                latest_pose_data = data
-            # Soporte retroactivo para scripts viejos que solo mandan x, y
-            elif "x" in data and "y" in data:
-                latest_pose_data = {
-                    "extremities": {
-                        "nose": {"x": data["x"], "y": data["y"]}
-                    }
-                }
-
-            return JsonResponse({"status": "ok", "received": len(str(data))})
-        except Exception as e:
-            print(f"Error en update_pose: {e}")
-            return JsonResponse({"status": "error", "message": str(e)}, status=400)
-
-    return JsonResponse({"error": "POST only"}, status=405)
+    return _api_response(pose_api.update_pose, request)
 
 
 def capture_motion_view(request):
@@ -175,12 +173,11 @@ def capture_motion_view(request):
     return render(request, 'mocap.html')
 
 
-def get_pose(request):
+def get_full_pose(request):
     """
-    El Frontend JS consulta esto para mover al personaje.
+    Pose completa (extremidades) del canal.
     """
-    global latest_pose_data
-    return JsonResponse(latest_pose_data)
+    return _api_response(pose_api.get_full_pose, request)
 
 
 class LoginBootstrapView(LoginView):
@@ -191,48 +188,43 @@ class LoginBootstrapView(LoginView):
         return super().form_invalid(form)
 
 
-GLOBAL_POSE_DATA = {
-    "position": {"x": 0, "y": 0},
-    "state": "normal"  # Por defecto
-}
-
-
 @csrf_exempt
 def update_coords(request):
     """
     Recibe datos desde el script de Python (tracking_api.py)
     """
-    global GLOBAL_POSE_DATA
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-
-            # 1. Guardar Posición
-            GLOBAL_POSE_DATA["position"] = {
-                "x": data.get("x", 0),
-                "y": data.get("y", 0)
-            }
-
-            # 2. Guardar Estado (Waving / Normal)
-            # El .get("state", "normal") significa: si no envías nada, pon "normal"
-            GLOBAL_POSE_DATA["state"] = data.get("state", "normal")
-
-            return JsonResponse({"status": "ok"})
-        except Exception as e:
-            return JsonResponse({"status": "error", "message": str(e)})
-
-    return JsonResponse({"status": "bad request"})
+    return _api_response(pose_api.update_coords, request)
 
 
 def get_pose(request):
     """
     Envía datos al navegador (Three.js)
+    Si el navegador acepta application/x-pose-v1 se responde en binario.
     """
-    global GLOBAL_POSE_DATA
-    return JsonResponse(GLOBAL_POSE_DATA)
+    return _api_response(pose_api.get_pose, request)
+
 
+def metrics(request):
+    """Métricas del proceso en texto de Prometheus (por asgi.py / wsgi.py no pasa por middleware)."""
+    return _api_response(pose_api.metrics, request)
 
 
+@csrf_exempt
+def profile(request):
+    """Perfilador por muestreo: POST start|stop|reset, GET las pilas (si settings.METRICS['PROFILER'])."""
+    return _api_response(pose_api.profile, request)
+
+
+def serve_asset(request, name):
+    """Modelos de static/build/ (nombre con hash): caché de un año y variante .br/.gz si se acepta."""
+    status, headers, path = assets.asset_response(name, request.headers.get("Accept-Encoding", ""),
+                                                  request.headers.get("If-None-Match", ""))
+    if path is None: return HttpResponse(status=status, headers=headers)
+    response = FileResponse(open(path, "rb"), content_type=headers.pop("Content-Type"), filename=name.rsplit("/", 1)[-1])
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
 
 def register(request):
     from .forms import RegisterForm
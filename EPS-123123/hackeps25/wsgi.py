@@ -13,4 +13,14 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hackeps25.settings')
 
-application = get_wsgi_application()
+django_application = get_wsgi_application()
+
+# Importar después de get_wsgi_application() (necesita Django configurado)
+from hackeps25.pose_api import ROUTES as POSE_ROUTES, pose_wsgi  # noqa: E402
+
+
+def application(environ, start_response):
+    # La API de poses se atiende sin middleware (ver pose_api.py); el resto lo atiende Django
+    if environ.get("PATH_INFO") in POSE_ROUTES:
+        return pose_wsgi(environ, start_response)
+    return django_application(environ, start_response)
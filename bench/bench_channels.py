@@ -0,0 +1,132 @@
+"""
+Prueba de carga del enrutado por canal (un canal por jugador/cabina).
+
+Para N = 1, 10, 100, 1000 canales lanza un hilo escritor por canal (hasta --threads)
+que escribe poses a --rate Hz y mide la latencia p50/p99 de escritura y lectura en
+cada backend del store. Con --url se hace lo mismo contra un servidor Django en marcha
+(POST /api/update-coords/ + GET /api/get-pose/ con X-Pose-Channel).
+
+    python bench/bench_channels.py [--seconds 3] [--backends local,mmap]
+    python bench/bench_channels.py --url http://127.0.0.1:8000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "EPS-123123"))
+from hackeps25.pose_store import LocalPoseStore, MmapPoseStore, channel_key  # noqa: E402
+
+CHANNEL_COUNTS = (1, 10, 100, 1000)
+
+
+def percentile(values, p):
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def make_coords(rng):
+    return {"position": {"x": rng.uniform(-5, 5), "y": rng.uniform(-5, 5)}, "state": "normal"}
+
+
+def run_load(n_channels, seconds, rate, threads, write, read):
+    """Reparte los canales entre los hilos; cada canal escribe y lee a `rate` Hz."""
+    channels = [f"cabina{i}" for i in range(n_channels)]
+    groups = [channels[i::threads] for i in range(min(threads, n_channels))]
+    w_lat, r_lat = [], []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def worker(group, seed):
+        rng = random.Random(seed)
+        w, r = [], []
+        period = 1.0 / rate
+        next_t = time.perf_counter()
+        while time.perf_counter() < stop_at:
+            for ch in group:
+                t0 = time.perf_counter()
+                write(ch, make_coords(rng))
+                t1 = time.perf_counter()
+                read(ch)
+                t2 = time.perf_counter()
+                w.append(t1 - t0)
+                r.append(t2 - t1)
+            next_t += period
+            delay = next_t - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+        with lock:
+            w_lat.extend(w)
+            r_lat.extend(r)
+
+    ts = [threading.Thread(target=worker, args=(g, i)) for i, g in enumerate(groups)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return w_lat, r_lat
+
+
+def report(label, n, seconds, w_lat, r_lat):
+    print(f"{label:<6} {n:>5} canales {len(w_lat) / seconds:>9.0f} esc/s "
+          f"escritura p50 {percentile(w_lat, 50) * 1e6:>8.1f} us p99 {percentile(w_lat, 99) * 1e6:>8.1f} us  "
+          f"lectura p50 {percentile(r_lat, 50) * 1e6:>8.1f} us p99 {percentile(r_lat, 99) * 1e6:>8.1f} us")
+
+
+def bench_store(name, store, args):
+    for n in CHANNEL_COUNTS:
+        w, r = run_load(n, args.seconds, args.rate, args.threads,
+                        lambda ch, data: store.set(channel_key("coords", ch), data),
+                        lambda ch: store.get_raw(channel_key("coords", ch)))
+        report(name, n, args.seconds, w, r)
+
+
+def bench_http(args):
+    import requests
+
+    local = threading.local()
+
+    def session():
+        s = getattr(local, "session", None)
+        if s is None: s = local.session = requests.Session()
+        return s
+
+    def write(ch, data):
+        session().post(args.url + "/api/update-coords/", data=json.dumps(data["position"]),
+                       headers={"X-Pose-Channel": ch, "Content-Type": "application/json"}, timeout=2)
+
+    def read(ch):
+        session().get(args.url + "/api/get-pose/", headers={"X-Pose-Channel": ch}, timeout=2)
+
+    for n in CHANNEL_COUNTS:
+        w, r = run_load(n, args.seconds, args.rate, args.threads, write, read)
+        report("http", n, args.seconds, w, r)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rate", type=float, default=30.0, help="Escrituras por segundo y canal")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--backends", default="local,mmap")
+    parser.add_argument("--url", default=None, help="Probar contra un servidor en marcha")
+    args = parser.parse_args()
+
+    if args.url:
+        bench_http(args)
+        return
+
+    for backend in args.backends.split(","):
+        if backend == "local":
+            bench_store("local", LocalPoseStore(history=8, ttl=60), args)
+        elif backend == "mmap":
+            path = os.path.join(tempfile.mkdtemp(), "pose_store.bin")
+            bench_store("mmap", MmapPoseStore(path, slots=2048, history=8, ttl=60), args)
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
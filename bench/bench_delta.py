@@ -0,0 +1,125 @@
+"""
+Ancho de banda de las tramas delta (pose_codec) sobre sesiones grabadas.
+
+Reproduce cada grabación de recording.py por el mismo camino que el tracker
+(ExtremityState + GestureClassifier, un envío cada 0.1 s de tiempo de grabación) y
+compara bytes por envío de JSON, binario completo y binario con keyframes + deltas
+para varios tamaños de rejilla. Cada flujo delta se reconstruye con DeltaDecoder y
+se comprueba el error máximo frente a la pose original.
+
+    python bench/bench_delta.py grabaciones/sesion1 [grabaciones/sesion2 ...]
+    python bench/bench_delta.py --synthetic 60     (sin grabaciones: figura sintética)
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from posecommon import pose_codec  # noqa: E402
+from landmarks import ExtremityState, EXTREMITIES_IDX  # noqa: E402
+from gestures import GestureClassifier  # noqa: E402
+from recording import PoseRecorder, PoseReplayer  # noqa: E402
+
+STEPS = (0.001, 0.002, 0.005)
+
+
+def payloads(path, send_interval=0.1):
+    """Las poses que habría enviado el tracker con esta grabación."""
+    rep = PoseReplayer(path)
+    state = ExtremityState(rep.meta.get("extremities", EXTREMITIES_IDX))
+    gestures = GestureClassifier(state.names)
+    last_send = -1e9
+    out = []
+    for chunk in rep.chunks():
+        for t, lm, size in zip(chunk["t"], chunk["lm"], chunk["size"]):
+            if np.isnan(lm[0, 0]):
+                gestures.update(None, t)
+                continue
+            ext = state.update(lm, int(size[0]), int(size[1]), 3.0, t)
+            gestures.update(ext, t)
+            if t - last_send < send_interval or not ext.visible.any(): continue
+            last_send = t
+            out.append({"timestamp": float(t), "camera_mode": "stereo" if rep.meta.get("stereo") else "single",
+                        "state": gestures.state, "extremities": state.to_dict(ext)})
+    return out
+
+
+def max_error(poses, blobs):
+    decoder = pose_codec.DeltaDecoder()
+    worst = 0.0
+    for pose, blob in zip(poses, blobs):
+        full = decoder.feed(blob)[-1]
+        for name, j in pose["extremities"].items():
+            got = full["extremities"][name]
+            worst = max(worst, abs(got["x"] - j["x"]), abs(got["y"] - j["y"]))
+    return worst
+
+
+def measure(label, poses, keyframe_interval):
+    n = len(poses)
+    print(f"\n--- {label}: {n} envíos ---")
+    json_size = sum(len(json.dumps(p).encode("utf-8")) for p in poses) / n
+    full = [pose_codec.encode(p, seq=i + 1) for i, p in enumerate(poses)]
+    full_size = sum(len(b) for b in full) / n
+    print(f"{'json':<24} {json_size:>8.1f} B/envío")
+    print(f"{'binario completo':<24} {full_size:>8.1f} B/envío  x{json_size / full_size:.1f} vs json")
+    results = {"sends": n, "json": json_size, "binary": full_size, "delta": {}}
+    for step in STEPS:
+        enc = pose_codec.DeltaEncoder(keyframe_interval, step=step)
+        blobs = [enc.encode(p, i + 1) for i, p in enumerate(poses)]
+        size = sum(len(b) for b in blobs) / n
+        err = max_error(poses, blobs)
+        print(f"{f'delta step={step}':<24} {size:>8.1f} B/envío  x{full_size / size:.1f} vs binario "
+              f"({1 - size / full_size:.0%} menos)  error máx {err:.4f}")
+        results["delta"][str(step)] = {"bytes": size, "max_error": err}
+    return results
+
+
+def synthetic_recording(seconds, path):
+    from pose_backends import SyntheticBackend
+    backend = SyntheticBackend()
+    rec = PoseRecorder(path)
+    rng = np.random.default_rng(0)
+    frozen = 0
+    for i in range(int(seconds * 30)):
+        # Como en una sesión real: ratos quieto (5 s) y ratos moviéndose (5 s)
+        if (i // 150) % 2 == 0:
+            backend.frame = frozen
+        else:
+            frozen = backend.frame
+        lm = backend.infer(None).copy()
+        lm[:, :2] += rng.normal(0, 1.5 / 640, (lm.shape[0], 2))  # Temblor típico de MediaPipe
+        rec.add(i / 30.0, lm, 640, 480)
+    rec.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", help="Carpetas de recording.py")
+    parser.add_argument("--synthetic", type=float, default=0.0, help="Segundos de figura sintética si no hay grabaciones")
+    parser.add_argument("--keyframe-interval", type=int, default=pose_codec.KEYFRAME_INTERVAL)
+    parser.add_argument("--json-out", default=None, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    tmp = None
+    if not paths:
+        tmp = tempfile.TemporaryDirectory()
+        paths = [synthetic_recording(args.synthetic or 60.0, os.path.join(tmp.name, "synthetic"))]
+    results = {}
+    for path in paths:
+        results[path] = measure(os.path.basename(path.rstrip("/")), payloads(path), args.keyframe_interval)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if tmp is not None: tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+Latencia de extremo a extremo: captura -> inferencia -> envío -> store -> navegador.
+
+Levanta el servidor de Django (runserver o uvicorn/ASGI, o usa uno en marcha con
+--url), arranca un StereoTracker en headless sobre un vídeo (uno sintético generado al
+vuelo, o --video FICHERO) servido al ritmo de una cámara, y un cliente sin navegador que
+hace lo mismo que updatePose en camera.html: consulta cada --poll-ms con If-None-Match y
+Accept binario. Lee /api/get-full-pose/ en vez de /api/get-pose/ porque las coords no
+llevan el timestamp del frame, que es lo que permite seguir cada pose de punta a punta.
+
+Cada frame enviado se sigue por sus marcas de tiempo (mismo reloj, misma máquina):
+    capture    el grabber entrega el frame
+    inference  la pose sale del backend (process_extremities)
+    submit     el bucle la deja en la cola del PoseSender
+    stored     el POST al servidor responde (ya está en el store)
+    fetched    el cliente la recibe
+y se dan p50/p95/p99 de cada tramo, el rendimiento (frames/s de cada etapa) y la CPU
+por hilo del tracker, por etapa del bucle y del proceso servidor. stored->fetched
+incluye la espera hasta la siguiente consulta (hasta --poll-ms); el RTT de cada consulta
+va aparte (client_rtt) para ver atascos del propio servidor. Todo va a un JSON (--out)
+para comparar entre commits con --compare:
+
+    python bench/bench_e2e.py --seconds 20 --out e2e.json
+    python bench/bench_e2e.py --server asgi --wire binary --out e2e_asgi.json --compare e2e.json
+    python bench/bench_e2e.py --video sesion.mp4 --backend mediapipe:1 --workers 2
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+import cv2
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DJANGO_DIR = os.path.join(ROOT, "EPS-123123")
+sys.path.insert(0, ROOT)
+from posecommon import pose_codec  # noqa: E402
+from main import StereoTracker  # noqa: E402
+
+SEGMENTS = [("capture", "inference"), ("inference", "submit"), ("submit", "stored"),
+            ("stored", "fetched"), ("capture", "stored"), ("capture", "fetched")]
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    if not values: return None
+    return float(np.percentile(values, p))
+
+
+def summary(values_ms):
+    out = {"count": len(values_ms)}
+    for p in PERCENTILES:
+        v = percentile(values_ms, p)
+        out[f"p{p}_ms"] = None if v is None else round(v, 3)
+    out["mean_ms"] = round(float(np.mean(values_ms)), 3) if values_ms else None
+    return out
+
+
+# --- Fuente de vídeo ---
+
+def synthetic_video(path, w=640, h=480, fps=30.0, seconds=4.0):
+    """Vídeo corto con una figura que se mueve (se reproduce en bucle)."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    for i in range(int(seconds * fps)):
+        frame = np.full((h, w, 3), 90, dtype=np.uint8)
+        cx = int(w / 2 + w / 5 * np.sin(i / fps * 2.0))
+        cv2.circle(frame, (cx, h // 5), h // 14, (200, 200, 200), -1)
+        cv2.line(frame, (cx, h // 5), (cx, h * 3 // 5), (200, 200, 200), 12)
+        for dx in (-1, 1):
+            cv2.line(frame, (cx, h * 3 // 5), (cx + dx * w // 12, h * 9 // 10), (200, 200, 200), 10)
+            arm_y = int(h / 5 + h / 8 * np.sin(i / fps * 8.0)) if dx > 0 else h * 2 // 5
+            cv2.line(frame, (cx, h * 3 // 10), (cx + dx * w // 8, arm_y), (200, 200, 200), 10)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class PacedCapture:
+    """
+    Envuelve un cv2.VideoCapture de fichero para que entregue frames al ritmo de una
+    cámara (fps) en bucle, y que se acabe a los `seconds` (el tracker termina limpio).
+    """
+
+    def __init__(self, cap, fps, seconds):
+        self.cap = cap
+        self.period = 1.0 / fps
+        self.stop_at = time.time() + seconds
+        self._next = time.time()
+
+    def read(self):
+        now = time.time()
+        if now >= self.stop_at: return False, None
+        if self._next > now: time.sleep(self._next - now)
+        self._next = max(self._next + self.period, time.time() - self.period)
+        ok, frame = self.cap.read()
+        if not ok:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        return ok, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+# --- Servidor ---
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port):
+    if kind == "runserver":
+        cmd = [sys.executable, "manage.py", "runserver", "--noreload", f"127.0.0.1:{port}"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "hackeps25.asgi:application", "--port", str(port),
+               "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=DJANGO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"El servidor ({kind}) ha terminado al arrancar:\n{proc.stderr.read()[-2000:]}")
+        try:
+            requests.get(url + "/api/get-pose/", timeout=0.5)
+            return proc, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"El servidor ({kind}) no responde en {url}")
+
+
+def proc_cpu(pid, tid=None):
+    """Segundos de CPU (user + sys) de un proceso o de uno de sus hilos (Linux /proc). None si no hay."""
+    path = f"/proc/{pid}/task/{tid}/stat" if tid else f"/proc/{pid}/stat"
+    try:
+        with open(path) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class ThreadCpu:
+    """Muestrea la CPU de cada hilo de este proceso (los del tracker terminan antes del final)."""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self._last = {}  # native_id -> (nombre, segundos)
+        self._start = {}
+        self._running = False
+        self._thread = None
+
+    def _sample(self):
+        pid = os.getpid()
+        for t in threading.enumerate():
+            cpu = proc_cpu(pid, t.native_id)
+            if cpu is None: continue
+            self._start.setdefault(t.native_id, cpu)
+            self._last[t.native_id] = (t.name, cpu)
+
+    def _loop(self):
+        while self._running:
+            self._sample()
+            time.sleep(self.interval)
+
+    def start(self):
+        self._running = True
+        self._sample()
+        self._thread = threading.Thread(target=self._loop, name="bench-cpu", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=2.0)
+        self._sample()
+        out = {}
+        for tid, (name, cpu) in self._last.items():
+            out[name] = out.get(name, 0.0) + cpu - self._start[tid]
+        return out
+
+
+# --- Cliente (lo que hace camera.html) ---
+
+class PollingClient:
+    def __init__(self, url, channel, interval, binary=True):
+        self.url = url + "/api/get-full-pose/"
+        self.interval = interval
+        self.session = requests.Session()
+        self.session.headers["X-Pose-Channel"] = channel
+        if binary: self.session.headers["Accept"] = pose_codec.CONTENT_TYPE + ", application/json"
+        self.received = {}  # timestamp de la pose -> instante de llegada
+        self.rtt = []
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes = 0
+        self.errors = 0
+        self._etag = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="bench-client", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None: self._thread.join(timeout=2.0)
+
+    def _loop(self):
+        next_t = time.time()
+        while self._running:
+            headers = {"If-None-Match": self._etag} if self._etag else {}
+            try:
+                t0 = time.time()
+                r = self.session.get(self.url, headers=headers, timeout=2.0)
+                t = time.time()
+                self.rtt.append(t - t0)
+                self.requests += 1
+                if r.status_code == 304:
+                    self.not_modified += 1
+                elif r.ok:
+                    self._etag = r.headers.get("ETag")
+                    self.bytes += len(r.content)
+                    if pose_codec.is_binary(r.headers.get("Content-Type", "")):
+                        pose = pose_codec.decode(r.content)
+                    else:
+                        pose = r.json()
+                    ts = pose.get("timestamp")
+                    if ts and ts not in self.received: self.received[ts] = t
+            except (requests.RequestException, ValueError):
+                self.errors += 1
+            next_t += self.interval
+            delay = next_t - time.time()
+            if delay > 0: time.sleep(delay)
+            else: next_t = time.time()
+
+
+# --- Instrumentación del tracker ---
+
+class Trace:
+    """
+    Marca cada pose enviada con sus instantes por etapa envolviendo métodos del tracker
+    (sin tocar main.py): process_extremities, PoseSender.submit/_encode/session.post.
+    También cuenta la CPU del hilo en inferencia, extremidades y codificación.
+    """
+
+    def __init__(self, tracker):
+        self.frames = {}  # timestamp del payload -> {etapa: instante}
+        self.cpu = {"inference": [], "extremities": [], "encode": []}
+        self._last_capture = None
+        self._last_inference = None
+        self._in_flight = []
+        self._lock = threading.Lock()
+
+        detect = tracker.detect_pose
+        process = tracker.process_extremities
+        sender = tracker.sender
+        submit, encode, post = sender.submit, sender._encode, sender.session.post
+
+        def detect_pose(*a, **kw):
+            c0 = time.thread_time()
+            try:
+                return detect(*a, **kw)
+            finally:
+                self.cpu["inference"].append(time.thread_time() - c0)
+
+        def process_extremities(landmarks, width, height, t_capture=None):
+            t = time.time()
+            c0 = time.thread_time()
+            ext = process(landmarks, width, height, t_capture)
+            self.cpu["extremities"].append(time.thread_time() - c0)
+            self._last_capture, self._last_inference = t_capture, t
+            return ext
+
+        def sender_submit(payload):
+            ts = payload.get("timestamp")
+            if ts is not None and self._last_capture is not None:
+                with self._lock:
+                    self.frames[ts] = {"capture": self._last_capture, "inference": self._last_inference,
+                                       "submit": time.time()}
+            return submit(payload)
+
+        def sender_encode(body):
+            c0 = time.thread_time()
+            out = encode(body)
+            self.cpu["encode"].append(time.thread_time() - c0)
+            self._in_flight = [f.get("timestamp") for f in (body["frames"] if "frames" in body else [body])]
+            return out
+
+        def session_post(*a, **kw):
+            r = post(*a, **kw)
+            t = time.time()
+            if r.ok:
+                with self._lock:
+                    for ts in self._in_flight:
+                        if ts in self.frames: self.frames[ts]["stored"] = t
+            return r
+
+        tracker.detect_pose = detect_pose
+        tracker.process_extremities = process_extremities
+        sender.submit = sender_submit
+        sender._encode = sender_encode
+        sender.session.post = session_post
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\n--- Comparación con {previous_path} ({previous.get('meta', {}).get('commit', '?')}) ---")
+    for name, cur in current["latency"].items():
+        old = previous.get("latency", {}).get(name)
+        if not old: continue
+        parts = []
+        for p in PERCENTILES:
+            a, b = old.get(f"p{p}_ms"), cur.get(f"p{p}_ms")
+            if a is None or b is None: continue
+            change = (b - a) / a if a else 0.0
+            parts.append(f"p{p} {a:.1f} -> {b:.1f} ms ({change:+.0%})")
+        print(f"{name:<22} " + "  ".join(parts))
+    for name in ("captured_fps", "processed_fps", "sent_fps", "fetched_fps"):
+        a, b = previous.get("throughput", {}).get(name), current["throughput"].get(name)
+        if a and b: print(f"{name:<22} {a:.1f} -> {b:.1f} ({(b - a) / a:+.0%})")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=15.0, help="Duración de la medida")
+    parser.add_argument("--video", default=None, help="Vídeo de entrada (por defecto uno sintético)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Ritmo al que se sirven los frames")
+    parser.add_argument("--backend", default="synthetic", help="Backend de pose (ver pose_backends.py)")
+    parser.add_argument("--synthetic-ms", type=float, default=0.0,
+                        help="Coste de inferencia simulado del backend synthetic (ms)")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--wire", choices=["json", "binary"], default="json")
+    parser.add_argument("--roi-size", type=int, default=640)
+    parser.add_argument("--server", choices=["runserver", "asgi"], default="runserver",
+                        help="Servidor que se levanta (ignorado con --url)")
+    parser.add_argument("--url", default=None, help="Servidor ya en marcha (p. ej. http://127.0.0.1:8000)")
+    parser.add_argument("--poll-ms", type=float, default=50.0, help="Intervalo de consulta del cliente (camera.html: 50)")
+    parser.add_argument("--client-json", action="store_true", help="El cliente pide JSON en vez de binario")
+    parser.add_argument("--channel", default="bench-e2e")
+    parser.add_argument("--out", default="bench_e2e.json", help="Resultados en JSON")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    video = args.video or synthetic_video(os.path.join(tmp.name, "synthetic.avi"), fps=args.fps)
+
+    server, url = None, args.url
+    if url is None: server, url = start_server(args.server, free_port())
+    url = url.rstrip("/")
+    try:
+        tracker = StereoTracker(left_source=video, right_source=os.path.join(tmp.name, "sin_camara.avi"),
+                                api_url=url + "/api/update-pose/", workers=args.workers, wire=args.wire,
+                                channel=args.channel, json_out="", snapshot_file="", headless=True,
+                                roi_size=args.roi_size, backend=args.backend)
+        if getattr(tracker, "no_cameras", False): raise RuntimeError(f"No se puede abrir {video}")
+        view = tracker.primary
+        if view.pose is not None and args.synthetic_ms: view.pose.latency = args.synthetic_ms / 1000.0
+        view.cap = PacedCapture(view.cap, args.fps, args.seconds)
+        trace = Trace(tracker)
+        client = PollingClient(url, args.channel, args.poll_ms / 1000.0, binary=not args.client_json)
+
+        server_cpu0 = proc_cpu(server.pid) if server else None
+        cpu0 = time.process_time()
+        sampler = ThreadCpu()
+        sampler.start()
+        t0 = time.time()
+        client.start()
+        tracker.run()  # Termina solo cuando PacedCapture llega a --seconds
+        time.sleep(max(0.2, 3 * args.poll_ms / 1000.0))  # Lo último enviado aún puede estar en camino
+        client.stop()
+        elapsed = time.time() - t0
+        threads = sampler.stop()
+        cpu_total = time.process_time() - cpu0
+        server_cpu = proc_cpu(server.pid) if server else None
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    for ts, t in client.received.items():
+        if ts in trace.frames: trace.frames[ts]["fetched"] = t
+    frames = list(trace.frames.values())
+    latency = {}
+    for a, b in SEGMENTS:
+        latency[f"{a}->{b}"] = summary([(f[b] - f[a]) * 1000.0 for f in frames if a in f and b in f])
+
+    st = tracker.pipeline_stats()
+    grab = st["grabbers"].get("left", {})
+    throughput = {
+        "seconds": elapsed,
+        "captured_fps": grab.get("captured", 0) / elapsed,
+        "processed_fps": len(trace.cpu["extremities"]) / elapsed,
+        "sent_fps": sum(1 for f in frames if "stored" in f) / elapsed,
+        "fetched_fps": sum(1 for f in frames if "fetched" in f) / elapsed,
+        "dropped_frames": grab.get("dropped", 0),
+        "sender_coalesced": st["sender"]["coalesced"] + st["sender"]["dropped"],
+        "client_requests": client.requests,
+        "client_rtt": summary([v * 1000.0 for v in client.rtt]),
+        "client_not_modified": client.not_modified,
+        "client_errors": client.errors,
+        "client_bytes": client.bytes,
+        "sender_bytes": st["sender"]["bytes_sent"],
+    }
+    cpu = {
+        "tracker_process_s": cpu_total,
+        "tracker_cores": cpu_total / elapsed,
+        "server_s": None if server_cpu is None or server_cpu0 is None else server_cpu - server_cpu0,
+        "threads_s": threads,
+        "per_call_ms": {k: summary([v * 1000.0 for v in vals]) for k, vals in trace.cpu.items()},
+    }
+    if cpu["server_s"] is not None: cpu["server_cores"] = cpu["server_s"] / elapsed
+
+    result = {
+        "meta": {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "video": args.video or "synthetic",
+                 "backend": tracker.pose_backend, "workers": args.workers, "wire": args.wire,
+                 "server": "external" if args.url else args.server, "poll_ms": args.poll_ms, "fps": args.fps},
+        "latency": latency,
+        "throughput": throughput,
+        "cpu": cpu,
+        "tracker_stages": st["stages"],
+        "sender": st["sender"],
+    }
+
+    print(f"\n--- {result['meta']['backend']} | {result['meta']['server']} | wire {args.wire} | "
+          f"{elapsed:.1f} s ---")
+    for name, s in latency.items():
+        if not s["count"]:
+            print(f"{name:<22} sin datos")
+            continue
+        print(f"{name:<22} p50 {s['p50_ms']:>8.1f} ms  p95 {s['p95_ms']:>8.1f} ms  p99 {s['p99_ms']:>8.1f} ms  (n={s['count']})")
+    print(f"frames/s: capturados {throughput['captured_fps']:.1f}, procesados {throughput['processed_fps']:.1f}, "
+          f"enviados {throughput['sent_fps']:.1f}, recibidos por el cliente {throughput['fetched_fps']:.1f}")
+    line = f"CPU: tracker {cpu['tracker_cores']:.0%} de un núcleo"
+    if "server_cores" in cpu: line += f", servidor {cpu['server_cores']:.0%}"
+    print(line)
+    for name, s in cpu["per_call_ms"].items():
+        if s["count"]: print(f"  {name:<12} p50 {s['p50_ms']:.2f} ms CPU/llamada  p99 {s['p99_ms']:.2f} ms")
+    for name, seconds in sorted(threads.items(), key=lambda kv: -kv[1]):
+        print(f"  hilo {name:<18} {seconds / elapsed:.0%}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Resultados en {args.out}")
+    if args.compare: compare(result, args.compare)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
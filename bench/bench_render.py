@@ -0,0 +1,190 @@
+"""
+Rendimiento de las páginas del flujo de selección (index -> camera) en modo desarrollo y
+en modo producción (HACKEPS_PRODUCTION=1, ver settings.py).
+
+Cada modo corre en su propio proceso (los settings se leen al importar) con una base de
+datos de prueba en memoria, un usuario ya logueado y el cliente de pruebas de Django:
+se mide el coste de Django + plantillas + sesión sin red de por medio. En producción
+antes se hace lo que haría el despliegue (python manage.py compress).
+
+Por escenario da peticiones/s, p50/p95/p99 y las escrituras en SQLite por petición
+(INSERT/UPDATE/DELETE vistos con connection.execute_wrapper):
+
+    index     GET /              página de selección
+    select    POST /             elegir personaje y escenario (cambia en cada petición)
+    start     POST /camera       empezar la partida con la selección
+    camera    GET /camera        recargar la partida (selección desde la sesión)
+
+    python bench/bench_render.py --requests 500 --out render.json
+    python bench/bench_render.py --modes production --session cache --compare render.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import secrets
+import subprocess
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DJANGO_DIR = os.path.join(ROOT, "EPS-123123")
+PERCENTILES = (50, 95, 99)
+CHARACTERS = ("the_boss", "monster", "zombie", "elvis")
+STAGES = ("church", "disco", "wow", "cementery")
+MODES = {
+    "dev": {"HACKEPS_PRODUCTION": "0"},
+    "production": {"HACKEPS_PRODUCTION": "1"},
+}
+
+
+def summary(values_ms, seconds):
+    out = {"count": len(values_ms), "rps": len(values_ms) / seconds if seconds else None}
+    for p in PERCENTILES:
+        out[f"p{p}_ms"] = float(np.percentile(values_ms, p)) if values_ms else None
+    return out
+
+
+# --- Proceso hijo: un modo ---
+
+def run_mode(requests_per_scenario, warmup):
+    sys.path.insert(0, DJANGO_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hackeps25.settings")
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+
+    connection.creation.create_test_db(verbosity=0)  # En memoria: no toca db.sqlite3
+    if settings.COMPRESS_OFFLINE:
+        call_command("compress", force=True, verbosity=0)
+    user = get_user_model().objects.create_user("bench", password="bench-render")
+    client = Client(SERVER_NAME="localhost")
+    client.force_login(user)
+
+    writes = [0]
+
+    def count_writes(execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"): writes[0] += 1
+        return execute(sql, params, many, context)
+
+    def selection(i):
+        return {"captain": CHARACTERS[i % len(CHARACTERS)], "sidekick": STAGES[i // len(CHARACTERS) % len(STAGES)]}
+
+    scenarios = {
+        "index": lambda i: client.get("/"),
+        "select": lambda i: client.post("/", selection(i)),
+        "start": lambda i: client.post("/camera", selection(i)),
+        "camera": lambda i: client.get("/camera"),
+    }
+    results = {}
+    for name, request in scenarios.items():
+        for i in range(warmup):
+            response = request(i)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name}: HTTP {response.status_code}")
+        times, writes[0] = [], 0
+        with connection.execute_wrapper(count_writes):
+            t_start = time.perf_counter()
+            for i in range(warmup, warmup + requests_per_scenario):
+                t0 = time.perf_counter()
+                request(i)
+                times.append((time.perf_counter() - t0) * 1000.0)
+            elapsed = time.perf_counter() - t_start
+        results[name] = summary(times, elapsed)
+        results[name]["db_writes_per_request"] = writes[0] / requests_per_scenario
+    return {"settings": {"debug": settings.DEBUG, "session_engine": settings.SESSION_ENGINE,
+                         "compress_offline": settings.COMPRESS_OFFLINE,
+                         "loaders": settings.TEMPLATES[0]["OPTIONS"].get("loaders", "default")},
+            "scenarios": results}
+
+
+# --- Proceso padre ---
+
+def spawn(mode, args):
+    env = dict(os.environ, **MODES[mode])
+    env.setdefault("DJANGO_SECRET_KEY", secrets.token_urlsafe(50))
+    if args.session: env["SESSION_BACKEND"] = args.session
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--requests", str(args.requests),
+           "--warmup", str(args.warmup)]
+    proc = subprocess.run(cmd, cwd=DJANGO_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"El modo {mode} ha fallado:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def report(results):
+    for mode, res in results.items():
+        st = res["settings"]
+        print(f"\n--- {mode} (DEBUG={st['debug']}, {st['session_engine'].rsplit('.', 1)[-1]}, "
+              f"offline={st['compress_offline']}) ---")
+        for name, s in res["scenarios"].items():
+            print(f"{name:<8} {s['rps']:8.1f} req/s  p50 {s['p50_ms']:.2f}  p95 {s['p95_ms']:.2f}  "
+                  f"p99 {s['p99_ms']:.2f} ms  escrituras/petición {s['db_writes_per_request']:.2f}")
+    if "dev" in results and "production" in results:
+        print("\n--- dev -> production ---")
+        for name, old in results["dev"]["scenarios"].items():
+            new = results["production"]["scenarios"][name]
+            print(f"{name:<8} {old['rps']:.1f} -> {new['rps']:.1f} req/s ({(new['rps'] - old['rps']) / old['rps']:+.0%})")
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\n--- Comparación con {previous_path} ({previous.get('meta', {}).get('commit', '?')}) ---")
+    for mode, res in current["modes"].items():
+        old_mode = previous.get("modes", {}).get(mode)
+        if not old_mode: continue
+        for name, cur in res["scenarios"].items():
+            old = old_mode["scenarios"].get(name)
+            if not old: continue
+            a, b = old["rps"], cur["rps"]
+            print(f"{mode + ' ' + name:<20} {a:.1f} -> {b:.1f} req/s ({(b - a) / a:+.0%})")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300, help="Peticiones medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Peticiones sin medir antes de cada escenario")
+    parser.add_argument("--modes", default="dev,production", help="Modos a medir, separados por comas")
+    parser.add_argument("--session", choices=["db", "cookies", "cache"], default=None,
+                        help="Forzar el backend de sesión (por defecto el del modo)")
+    parser.add_argument("--out", default="bench_render.json", help="Resultados en JSON")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.requests, args.warmup)))
+        return
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for mode in modes:
+        if mode not in MODES: parser.error(f"modo desconocido: {mode} (dev, production)")
+    results = {mode: spawn(mode, args) for mode in modes}
+    report(results)
+    out = {"meta": {"commit": git_commit(), "python": platform.python_version(), "requests": args.requests,
+                    "session": args.session},
+           "modes": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+        print(f"\nResultados en {args.out}")
+    if args.compare: compare(out, args.compare)
+
+
+if __name__ == "__main__":
+    main()
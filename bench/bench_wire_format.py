@@ -0,0 +1,68 @@
+"""
+Benchmark del formato de envío de poses: JSON actual vs binario (pose_codec).
+
+Mide bytes por frame y coste de codificar/decodificar para una pose típica del
+tracker (15 extremidades visibles) con y sin posiciones 3D.
+
+    python bench/bench_wire_format.py [--frames 20000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from posecommon import pose_codec  # noqa: E402
+
+
+def make_pose(rng, with_3d=False):
+    """Pose con la misma forma que envía StereoTracker.run (incluye pixel_x/pixel_y)."""
+    ext = {}
+    ext3d = {}
+    for name in pose_codec.JOINT_NAMES:
+        x, y = rng.random(), rng.random()
+        ext[name] = {
+            "x": x, "y": y, "z": rng.uniform(-0.5, 0.5),
+            "pixel_x": x * 1280, "pixel_y": y * 720,
+            "moving": rng.random() > 0.5, "speed": rng.uniform(0, 20),
+        }
+        ext3d[name] = {"x": rng.uniform(-1, 1), "y": rng.uniform(-1, 1), "z": rng.uniform(1, 4)}
+    pose = {"timestamp": time.time(), "camera_mode": "stereo" if with_3d else "single", "extremities": ext}
+    if with_3d:
+        pose["extremities_3d"] = ext3d
+    return pose
+
+
+def bench(label, poses, encode, decode):
+    t0 = time.perf_counter()
+    blobs = [encode(p) for p in poses]
+    t1 = time.perf_counter()
+    for b in blobs:
+        decode(b)
+    t2 = time.perf_counter()
+    n = len(poses)
+    size = sum(len(b) for b in blobs) / n
+    print(f"{label:<22} {size:>8.1f} B/frame {(t1 - t0) / n * 1e6:>9.2f} us enc {(t2 - t1) / n * 1e6:>9.2f} us dec")
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for with_3d in (False, True):
+        poses = [make_pose(rng, with_3d) for _ in range(args.frames)]
+        print(f"\n--- {'estéreo con 3D' if with_3d else 'single'} ({args.frames} frames) ---")
+        base = bench("json", poses, lambda p: json.dumps(p).encode("utf-8"), json.loads)
+        f16 = bench("binario float16", poses, pose_codec.encode, pose_codec.decode)
+        f32 = bench("binario float32", poses, lambda p: pose_codec.encode(p, use_f32=True), pose_codec.decode)
+        print(f"reducción: float16 x{base / f16:.1f}, float32 x{base / f32:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import time
+import random
+from threading import Thread, Condition, Lock
+
+from posecommon.metrics import Histogram  # Compartido con el servidor (ver telemetry.py)
+
+
+class StageStats:
+    """Contador de latencia de una etapa del pipeline (en milisegundos) + histograma (segundos)."""
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha  # Peso de la media móvil exponencial
+        self.count = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+        self.hist = Histogram()
+        self._lock = Lock()
+
+    def add(self, seconds):
+        self.hist.observe(seconds)
+        ms = seconds * 1000.0
+        with self._lock:
+            self.count += 1
+            self.last_ms = ms
+            self.avg_ms = ms if self.count == 1 else self.avg_ms + self.alpha * (ms - self.avg_ms)
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def snapshot(self):
+        with self._lock:
+            return {"count": self.count, "last_ms": self.last_ms, "avg_ms": self.avg_ms, "max_ms": self.max_ms}
+
+
+class PipelineStats:
+    """Agrupa las estadísticas por etapa: self.stage("inference").add(dt)"""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = Lock()
+
+    def stage(self, name):
+        st = self._stages.get(name)
+        if st is None:
+            with self._lock:
+                st = self._stages.setdefault(name, StageStats())
+        return st
+
+    def snapshot(self):
+        return {name: st.snapshot() for name, st in list(self._stages.items())}
+
+    def items(self):
+        return list(self._stages.items())
+
+
+class Backoff:
+    """Espera entre reintentos de conexión: initial, x2, x4... hasta maximum (con ±20% de jitter)."""
+
+    def __init__(self, initial=0.5, maximum=10.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = initial
+
+    def next(self):
+        delay = self.delay
+        self.delay = min(self.delay * 2, self.maximum)
+        return delay * random.uniform(0.8, 1.2)
+
+    def reset(self):
+        self.delay = self.initial
+
+
+class FrameGrabber:
+    """
+    Hilo lector de una fuente de video.
+    Lee sin parar y guarda SOLO el último frame (buffer de una posición), así
+    la inferencia siempre trabaja con el frame más reciente y los viejos se descartan.
+    Con reopen (función que devuelve una captura nueva o None) una caída no termina el
+    hilo: se suelta la captura y se reintenta con espera creciente (Backoff).
+    """
+
+    def __init__(self, cap, name="cam", reopen=None, backoff=None):
+        self.cap = cap
+        self.name = name
+        self.reopen = reopen
+        self.backoff = backoff or Backoff()
+
+        self._cond = Condition()
+        self._frame = None
+        self._frame_time = 0.0  # time.time() del momento de captura
+        self._seq = 0  # Número de frame capturado (monótono)
+        self._consumed_seq = 0  # Último seq entregado al consumidor
+
+        self.alive = False
+        self.connected = cap is not None
+        self.disconnects = 0
+        self.reconnects = 0
+        self.frames_captured = 0
+        self.frames_dropped = 0  # Frames sobrescritos sin que nadie los leyera
+        self.read_stats = StageStats()  # Tiempo de cap.read()
+
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None: return self
+        self.alive = True
+        self._thread = Thread(target=self._loop, name=f"grabber-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while self.alive:
+            if self.cap is None:
+                if not self._reconnect(): break
+                continue
+            t0 = time.time()
+            ret, frame = self.cap.read()
+            t1 = time.time()
+            if not ret and self.reopen is not None:
+                self._disconnect()
+                continue
+            if not ret:
+                # Fuente cerrada o caída: avisamos al consumidor y salimos
+                with self._cond:
+                    self.alive = False
+                    self._cond.notify_all()
+                break
+
+            self.read_stats.add(t1 - t0)
+            with self._cond:
+                if self._seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_time = t1
+                self._seq += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def _disconnect(self):
+        self.cap.release()
+        with self._cond:
+            self.cap = None
+            self.connected = False
+            self.disconnects += 1
+            self._cond.notify_all()
+        print(f"[{self.name}] cámara caída, reintentando")
+
+    def _reconnect(self):
+        """Reintenta abrir la fuente hasta conseguirlo (True) o hasta stop() (False)."""
+        while self.alive:
+            cap = self.reopen()
+            if cap is not None:
+                with self._cond:
+                    self.cap = cap
+                    self.connected = True
+                    self.reconnects += 1
+                self.backoff.reset()
+                print(f"[{self.name}] cámara recuperada")
+                return True
+            with self._cond:
+                self._cond.wait(self.backoff.next())
+        return False
+
+    def read_latest(self, timeout=None):
+        """
+        Espera a que haya un frame NUEVO (no entregado antes) y lo devuelve.
+        Devuelve (seq, frame, capture_time) o None si la fuente murió o está caída, o si
+        vence el timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._seq <= self._consumed_seq:
+                if not self.alive or not self.connected: return None
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0: return None
+                self._cond.wait(remaining)
+            self._consumed_seq = self._seq
+            return self._seq, self._frame, self._frame_time
+
+    def peek_latest(self):
+        """Devuelve el último frame disponible sin esperar (puede repetirse). None si aún no hay."""
+        with self._cond:
+            if self._frame is None: return None
+            if self._seq > self._consumed_seq:
+                self._consumed_seq = self._seq
+            return self._seq, self._frame, self._frame_time
+
+    def stop(self):
+        with self._cond:
+            self.alive = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "captured": self.frames_captured,
+                "dropped": self.frames_dropped,
+                "read": self.read_stats.snapshot(),
+                "alive": self.alive,
+                "connected": self.connected,
+                "disconnects": self.disconnects,
+                "reconnects": self.reconnects,
+            }
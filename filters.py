@@ -0,0 +1,172 @@
+"""
+Filtros temporales por articulación, vectorizados sobre todo el array de golpe.
+
+La posición cruda de MediaPipe tiembla unos píxeles de un frame a otro; comparar
+dos frames crudos contra un umbral hace que "moviendo/quieto" parpadee. Aquí cada
+articulación lleva un filtro que devuelve posición suavizada y velocidad (unidades/s),
+y predict(h) extrapola la posición h segundos hacia delante para tapar la latencia
+de red y de render en vez de sumarla.
+
+    one_euro   Filtro One-Euro (Casiez et al.): suaviza mucho en reposo y casi nada
+               cuando la articulación va rápido. Barato y sin parámetros de ruido.
+    kalman     Kalman de velocidad constante por coordenada (estado posición + velocidad).
+               Velocidad más limpia, algo más de retardo en los cambios bruscos.
+    none       Sin filtro (la velocidad sale de la diferencia entre frames).
+
+Todos trabajan con arrays (K, D) y una máscara (K,) de filas medidas en este frame:
+las que no se ven conservan su estado y se reinician si llevan `reset_after` s sin verse.
+"""
+import math
+
+import numpy as np
+
+FILTERS = ["one_euro", "kalman", "none"]
+
+
+class JointFilter:
+    """Base: guarda el estado común (posición, velocidad, último instante visto)."""
+
+    def __init__(self, shape, reset_after=0.5):
+        self.shape = shape
+        self.reset_after = reset_after
+        self.pos = np.zeros(shape, dtype=np.float64)
+        self.vel = np.zeros(shape, dtype=np.float64)
+        self.seen = np.full(shape[0], -np.inf)  # Último instante con medida de cada fila
+        self.t = None
+
+    def reset(self):
+        self.pos[:] = 0.0
+        self.vel[:] = 0.0
+        self.seen[:] = -np.inf
+        self.t = None
+        self._reset_rows(slice(None))
+
+    def update(self, x, t, mask=None):
+        """Incorpora la medida x (K, D) del instante t. Devuelve (posición, velocidad) (vistas internas)."""
+        if mask is None: mask = np.ones(self.shape[0], dtype=bool)
+        dt = 0.0 if self.t is None else t - self.t
+        if dt < 0: dt = 0.0  # Resultados fuera de orden: no se retrocede
+        self.t = t if self.t is None else max(self.t, t)
+
+        # Filas nuevas o perdidas demasiado tiempo: arrancan en la medida, sin velocidad
+        fresh = mask & (t - self.seen > self.reset_after)
+        if fresh.any():
+            self.pos[fresh] = x[fresh]
+            self.vel[fresh] = 0.0
+            self._reset_rows(fresh)
+        track = mask & ~fresh
+        if track.any() and dt > 0: self._step(x, dt, track)
+        self.seen[mask] = t
+        return self.pos, self.vel
+
+    def predict(self, horizon, out=None):
+        """Posición extrapolada `horizon` segundos después de la última medida."""
+        if out is None: out = np.empty(self.shape, dtype=np.float64)
+        np.multiply(self.vel, horizon, out=out)
+        out += self.pos
+        return out
+
+    def _reset_rows(self, rows):
+        pass
+
+    def _step(self, x, dt, rows):
+        raise NotImplementedError
+
+
+class NoFilter(JointFilter):
+    def _step(self, x, dt, rows):
+        self.vel[rows] = (x[rows] - self.pos[rows]) / dt
+        self.pos[rows] = x[rows]
+
+
+class OneEuroFilter(JointFilter):
+    """
+    min_cutoff (Hz): suavizado en reposo (más bajo = menos temblor, más retardo).
+    beta: cuánto sube el corte con la velocidad (más alto = menos retardo en movimiento).
+    d_cutoff (Hz): corte del filtro de la propia velocidad.
+    """
+
+    def __init__(self, shape, min_cutoff=1.0, beta=0.03, d_cutoff=1.0, reset_after=0.5):
+        super().__init__(shape, reset_after)
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.dx = np.zeros(shape, dtype=np.float64)
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def _reset_rows(self, rows):
+        self.dx[rows] = 0.0
+
+    def _step(self, x, dt, rows):
+        xr = x[rows]
+        prev = self.pos[rows]
+        a_d = self._alpha(self.d_cutoff, dt)
+        # Derivada del filtro original (medida contra la posición filtrada): decide el corte
+        dx = self.dx[rows]
+        dx += a_d * ((xr - prev) / dt - dx)
+        speed = np.sqrt((dx * dx).sum(axis=1, keepdims=True))
+        cutoff = self.min_cutoff + self.beta * speed
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        a = 1.0 / (1.0 + tau / dt)
+        new = prev + a * (xr - prev)
+        # La velocidad publicada es la de la propia salida filtrada (la otra sobreestima
+        # mientras el filtro va por detrás) y es la que usa predict()
+        vel = self.vel[rows]
+        vel += a_d * ((new - prev) / dt - vel)
+        self.pos[rows] = new
+        self.vel[rows] = vel
+        self.dx[rows] = dx
+
+
+class KalmanFilter(JointFilter):
+    """
+    Velocidad constante, una dimensión por coordenada (covarianza 2x2 guardada en
+    tres arrays). accel: desviación de la aceleración (unidades/s²); noise: desviación
+    de la medida (unidades).
+    """
+
+    def __init__(self, shape, accel=400.0, noise=3.0, reset_after=0.5):
+        super().__init__(shape, reset_after)
+        self.q = float(accel) ** 2
+        self.r = float(noise) ** 2
+        self.p00 = np.full(shape, self.r)
+        self.p01 = np.zeros(shape)
+        self.p11 = np.full(shape, self.q)
+
+    def _reset_rows(self, rows):
+        self.p00[rows] = self.r
+        self.p01[rows] = 0.0
+        self.p11[rows] = self.q
+
+    def _step(self, x, dt, rows):
+        pos, vel = self.pos[rows], self.vel[rows]
+        p00, p01, p11 = self.p00[rows], self.p01[rows], self.p11[rows]
+        # Predicción: x' = x + v dt; P' = F P F^T + Q (ruido de aceleración blanco)
+        pos += vel * dt
+        dt2 = dt * dt
+        p00 += dt * (2.0 * p01 + dt * p11) + self.q * dt2 * dt2 / 4.0
+        p01 += dt * p11 + self.q * dt2 * dt / 2.0
+        p11 += self.q * dt2
+        # Corrección con la medida de posición
+        s = p00 + self.r
+        k0, k1 = p00 / s, p01 / s
+        innov = x[rows] - pos
+        pos += k0 * innov
+        vel += k1 * innov
+        p11 -= k1 * p01
+        p01 *= 1.0 - k0
+        p00 *= 1.0 - k0
+        self.pos[rows], self.vel[rows] = pos, vel
+        self.p00[rows], self.p01[rows], self.p11[rows] = p00, p01, p11
+
+
+def create_filter(kind, shape, **params):
+    """kind: 'one_euro', 'kalman' o 'none'."""
+    if kind == "one_euro": return OneEuroFilter(shape, **params)
+    if kind == "kalman": return KalmanFilter(shape, **params)
+    if kind in ("none", None): return NoFilter(shape, **params)
+    raise ValueError(f"Filtro desconocido: {kind} (opciones: {', '.join(FILTERS)})")
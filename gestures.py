@@ -0,0 +1,165 @@
+"""
+Clasificador de gestos en streaming: produce el campo "state" de la pose.
+
+Trabaja sobre el Extremities filtrado de cada frame (posición en píxeles, visibilidad
+y velocidad de filters.py) y mantiene solo contadores y colas cortas de eventos, así
+que cada frame cuesta O(1) sin volver a recorrer la ventana:
+
+    waving    una muñeca por encima de su hombro cambiando de sentido horizontal
+              al menos `wave_reversals` veces en `window` segundos
+    walking   los tobillos se alternan (la diferencia de altura cambia de signo)
+              `step_reversals` veces en la ventana, o la cadera se desplaza de lado
+    jumping   caderas y tobillos por encima de su altura de reposo a la vez
+    arms_up   las dos muñecas por encima de la cabeza
+
+Las distancias van en "torsos" (hombros -> caderas, media móvil) para que no
+dependan de la distancia a la cámara. Un estado nuevo tiene que mantenerse `hold`
+segundos antes de publicarse: update() solo marca changed=True en las transiciones.
+"""
+import math
+from collections import deque
+
+from posecommon.pose_codec import STATES  # Una sola lista: el índice del estado viaja en la trama binaria
+
+# Si se cumplen varios a la vez gana el primero
+PRIORITY = ["jumping", "waving", "arms_up", "walking"]
+assert set(PRIORITY) <= set(STATES), "cada gesto nuevo va también en posecommon.pose_codec.STATES"
+
+
+class _Reversals:
+    """Cuenta cambios de signo de una señal con banda muerta, dentro de una ventana de tiempo."""
+
+    def __init__(self, window, threshold):
+        self.window = window
+        self.threshold = threshold
+        self.sign = 0
+        self.times = deque()
+
+    def update(self, value, t):
+        if value > self.threshold: sign = 1
+        elif value < -self.threshold: sign = -1
+        else: sign = 0
+        if sign and sign != self.sign:
+            if self.sign: self.times.append(t)
+            self.sign = sign
+        while self.times and t - self.times[0] > self.window:
+            self.times.popleft()
+        return len(self.times)
+
+    def reset(self):
+        self.sign = 0
+        self.times.clear()
+
+
+class GestureClassifier:
+    def __init__(self, names, window=1.2, hold=0.15, wave_reversals=3, step_reversals=2,
+                 wave_speed=0.6, step_amplitude=0.06, jump_height=0.12, lateral_speed=0.8):
+        idx = {n: i for i, n in enumerate(names)}
+        self._i = {k: idx.get(k) for k in (
+            "nose", "left_shoulder", "right_shoulder", "left_hip", "right_hip",
+            "left_wrist", "right_wrist", "left_ankle", "right_ankle")}
+        self.hold = hold
+        self.wave_reversals = wave_reversals
+        self.step_reversals = step_reversals
+        self.wave_speed = wave_speed  # torsos/s para contar un cambio de sentido de la mano
+        self.jump_height = jump_height  # torsos por encima del reposo
+        self.lateral_speed = lateral_speed  # torsos/s de la cadera para contar como andar
+
+        self._wave = {"left": _Reversals(window, 1.0), "right": _Reversals(window, 1.0)}
+        self._steps = _Reversals(window * 1.25, step_amplitude)
+        self.torso = None
+        self._hip_rest = None  # Altura de reposo (media lenta) de caderas y tobillos
+        self._ankle_rest = None
+        self._t = None
+
+        self.state = "normal"
+        self._candidate = "normal"
+        self._candidate_since = 0.0
+        self.transitions = 0
+        self.scores = {}  # Última evaluación de cada gesto (depuración / preview)
+
+    def _point(self, ext, name):
+        i = self._i.get(name)
+        if i is None or not ext.visible[i]: return None
+        return ext.px[i]
+
+    def reset(self):
+        for r in self._wave.values(): r.reset()
+        self._steps.reset()
+        self.torso = None
+        self._hip_rest = self._ankle_rest = None
+        self._t = None
+        self.state = self._candidate = "normal"
+        self._candidate_since = 0.0
+
+    def update(self, ext, t):
+        """Procesa un frame. Devuelve (estado, changed)."""
+        if ext is None: return self._settle("normal", t)
+        dt = 0.0 if self._t is None else max(0.0, t - self._t)
+        self._t = t
+        p = {k: self._point(ext, k) for k in self._i}
+
+        # Escala: longitud del torso (media móvil)
+        ls, rs, lh, rh = p["left_shoulder"], p["right_shoulder"], p["left_hip"], p["right_hip"]
+        if ls is None or rs is None or lh is None or rh is None: return self._settle("normal", t)
+        sx, sy = (ls[0] + rs[0]) / 2, (ls[1] + rs[1]) / 2
+        hx, hy = (lh[0] + rh[0]) / 2, (lh[1] + rh[1]) / 2
+        torso = math.hypot(hx - sx, hy - sy)
+        if torso < 1.0: return self._settle(self.state, t)
+        self.torso = torso if self.torso is None else self.torso + 0.05 * (torso - self.torso)
+        unit = self.torso
+
+        # Waving: muñeca sobre su hombro y velocidad horizontal que cambia de signo
+        waving = False
+        for side, shoulder in (("left", ls), ("right", rs)):
+            wrist = p[side + "_wrist"]
+            rev = self._wave[side]
+            if wrist is None or wrist[1] > shoulder[1]:
+                rev.reset()
+                continue
+            vx = float(ext.velocity[self._i[side + "_wrist"], 0]) / unit
+            if rev.update(vx / self.wave_speed, t) >= self.wave_reversals: waving = True
+
+        # Brazos arriba: las dos muñecas por encima de la cabeza (o de los hombros si no se ve)
+        head_y = p["nose"][1] if p["nose"] is not None else sy - 0.3 * unit
+        lw, rw = p["left_wrist"], p["right_wrist"]
+        arms_up = lw is not None and rw is not None and lw[1] < head_y and rw[1] < head_y
+
+        # Salto: caderas y tobillos por encima de su altura de reposo (y crece hacia abajo)
+        la, ra = p["left_ankle"], p["right_ankle"]
+        ankle_y = (la[1] + ra[1]) / 2 if la is not None and ra is not None else None
+        jumping = False
+        if self._hip_rest is None:
+            self._hip_rest, self._ankle_rest = hy, ankle_y
+        else:
+            lift = (self._hip_rest - hy) / unit
+            jumping = lift > self.jump_height and ankle_y is not None and self._ankle_rest is not None \
+                and (self._ankle_rest - ankle_y) / unit > self.jump_height * 0.5
+            if not jumping:
+                # Reposo: se adapta despacio (agacharse o acercarse a la cámara); hacia arriba
+                # aún más despacio para que el arranque de un salto no arrastre la referencia
+                a = min(1.0, dt * 0.5)
+                self._hip_rest += (a if hy > self._hip_rest else 0.1 * a) * (hy - self._hip_rest)
+                if ankle_y is not None:
+                    self._ankle_rest = ankle_y if self._ankle_rest is None else self._ankle_rest + a * (ankle_y - self._ankle_rest)
+
+        # Andar: los tobillos se alternan, o la cadera se desplaza de lado
+        steps = self._steps.update((la[1] - ra[1]) / unit, t) if la is not None and ra is not None else 0
+        hip_vx = abs(float(ext.velocity[self._i["left_hip"], 0] + ext.velocity[self._i["right_hip"], 0])) / 2 / unit
+        walking = steps >= self.step_reversals or hip_vx > self.lateral_speed
+
+        self.scores = {"waving": waving, "walking": walking, "jumping": jumping, "arms_up": arms_up}
+        for state in PRIORITY:
+            if self.scores[state]: return self._settle(state, t)
+        return self._settle("normal", t)
+
+    def _settle(self, candidate, t):
+        """Histéresis temporal: el candidato tiene que durar `hold` s para publicarse."""
+        if candidate != self._candidate:
+            self._candidate = candidate
+            self._candidate_since = t
+        if candidate != self.state and t - self._candidate_since >= self.hold:
+            self.state = candidate
+            self.transitions += 1
+            return self.state, True
+        return self.state, False
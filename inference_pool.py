@@ -0,0 +1,307 @@
+import time
+import signal
+import multiprocessing as mproc
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_conns
+
+import numpy as np
+
+NUM_LANDMARKS = 33  # MediaPipe Pose devuelve 33 puntos
+
+
+def _worker_main(slot_names, task_conn, result_conn, backend_spec):
+    """
+    Proceso de inferencia: tiene su propio modelo (ver pose_backends) y lee los frames
+    directamente de la memoria compartida (sin pickle del frame).
+    Cada tarea devuelve siempre su resultado (None si falla) para no dejar un hueco en
+    la secuencia del flujo.
+    """
+    import cv2
+    from pose_backends import create_backend
+
+    # Ctrl+C llega a todo el grupo de procesos: el que cierra el pool es el proceso principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    shms = []
+    for name in slot_names:
+        # El worker comparte el resource_tracker del proceso principal (que es quien hace
+        # unlink al cerrar): no hay que desregistrar nada aquí
+        shms.append(shared_memory.SharedMemory(name=name))
+
+    # Un modelo por flujo (left/right/jugador) para que el tracking temporal no se mezcle
+    poses = {}
+    failed = {}  # stream -> error al crear el modelo (no se reintenta en cada frame)
+    last_error = 0.0
+
+    while True:
+        try:
+            task = task_conn.recv()
+        except EOFError:
+            break  # El proceso principal cerró el pool (o murió)
+        if task is None: break
+        stream, seq, slot, shape = task
+
+        lms, infer_s = None, 0.0
+        try:
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shms[slot].buf)
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Copia fuera del slot compartido
+
+            pose = poses.get(stream)
+            if pose is None and stream not in failed:
+                try:
+                    pose = poses[stream] = create_backend(backend_spec)
+                except Exception as e:
+                    failed[stream] = e
+                    print(f"[pose-worker] no se pudo crear el modelo {backend_spec} ({stream}): {e}")
+            if pose is not None:
+                t0 = time.time()
+                lms = pose.infer(rgb)  # Array nuevo por frame: viaja por la cola de resultados
+                infer_s = time.time() - t0
+        except Exception as e:
+            lms = None
+            if time.time() - last_error > 5.0:  # Como mucho un aviso cada 5 segundos
+                last_error = time.time()
+                print(f"[pose-worker] error en la inferencia ({stream}): {e}")
+        result_conn.send((stream, seq, slot, lms, infer_s))
+
+    for pose in poses.values():
+        pose.close()
+    for shm in shms:
+        shm.close()
+
+
+class PoseWorkerPool:
+    """
+    Pool de N procesos, cada uno con su propio modelo de pose (backend_spec de pose_backends).
+
+    - Los frames viajan por slots de memoria compartida (solo se encola el índice del slot).
+    - Cada flujo ("left", "right", "player_3"...) tiene su propio número de secuencia y
+      los resultados se devuelven reordenados por secuencia, así process_extremities
+      nunca ve un frame viejo después de uno nuevo.
+    - Si no hay slots libres el frame se descarta (mismo criterio que el FrameGrabber).
+    - Cada worker tiene un pipe de tareas y otro de resultados (un solo lector y un solo
+      escritor: sin locks entre procesos que un worker muerto pueda dejar cogidos); las
+      tareas van al que menos tiene pendiente. Si un worker muere se vuelve a arrancar y
+      sus tareas se dan por perdidas (landmarks None); un worker con una tarea que tarda
+      más de task_timeout se detiene y pasa lo mismo. Así un fallo nunca deja un flujo esperando
+      para siempre un seq que no va a llegar.
+    """
+
+    def __init__(self, workers=2, backend_spec="mediapipe:1", slots_per_worker=2, task_timeout=10.0):
+        self.workers = max(1, int(workers))
+        self.backend_spec = backend_spec
+        self.n_slots = self.workers * slots_per_worker
+        self.task_timeout = task_timeout
+
+        self._ctx = mproc.get_context("spawn")
+        self._task_conns = []  # Por worker: extremo de escritura del pipe de tareas
+        self._result_conns = []  # Por worker: extremo de lectura del pipe de resultados
+        self._procs = []
+        self._shms = []
+        self._slot_bytes = 0
+        self._free_slots = []
+
+        self._next_submit = {}  # stream -> siguiente seq a asignar
+        self._next_emit = {}  # stream -> siguiente seq a devolver
+        self._reorder = {}  # stream -> {seq: (landmarks, meta)}
+        self._meta = {}  # (stream, seq) -> meta del llamador (frame, timestamp...)
+        self._tasks = {}  # slot -> (stream, seq, instante de envío, worker) de la tarea que lo ocupa
+
+        self.submitted = 0
+        self.dropped = 0  # Sin slot libre
+        self.completed = 0
+        self.lost = 0  # Tareas de un worker muerto o que no respondió a tiempo
+        self.restarts = 0
+        self.last_infer_ms = 0.0
+
+    @property
+    def started(self):
+        return bool(self._procs)
+
+    @property
+    def in_flight(self):
+        return self.n_slots - len(self._free_slots)
+
+    def start(self, max_frame_bytes):
+        """Reserva los slots de memoria compartida y arranca los workers."""
+        if self.started: return self
+        self._slot_bytes = int(max_frame_bytes)
+        self._shms = [shared_memory.SharedMemory(create=True, size=self._slot_bytes) for _ in range(self.n_slots)]
+        self._free_slots = list(range(self.n_slots))
+        for i in range(self.workers):
+            self._procs.append(None)
+            self._task_conns.append(None)
+            self._result_conns.append(None)
+            self._spawn(i)
+        print(f"Pool de inferencia: {self.workers} procesos, {self.n_slots} slots de {self._slot_bytes} bytes")
+        return self
+
+    def _spawn(self, i):
+        task_recv, task_send = self._ctx.Pipe(duplex=False)
+        result_recv, result_send = self._ctx.Pipe(duplex=False)
+        p = self._ctx.Process(target=_worker_main, name=f"pose-worker-{i}",
+                              args=([shm.name for shm in self._shms], task_recv, result_send, self.backend_spec),
+                              daemon=True)
+        p.start()
+        # Los extremos del worker se cierran aquí: si muere, el pipe de resultados da EOF
+        task_recv.close()
+        result_send.close()
+        self._procs[i], self._task_conns[i], self._result_conns[i] = p, task_send, result_recv
+
+    def _lose(self, slot):
+        """Da por perdida la tarea del slot: su seq sale sin landmarks y el slot queda libre."""
+        stream, seq, _, _ = self._tasks.pop(slot)
+        self._free_slots.append(slot)
+        self._reorder.setdefault(stream, {})[seq] = (None, self._meta.pop((stream, seq), None))
+        self.lost += 1
+
+    def _reap(self):
+        """
+        Rearranca los workers muertos y da por perdidas sus tareas. Un worker con una tarea
+        de más de task_timeout se detiene antes: mientras siga vivo puede estar leyendo el
+        slot, y liberarlo sin más le seguiría mandando frames que nunca devuelve.
+        """
+        if self.task_timeout:
+            now = time.time()
+            for i in {task[3] for task in self._tasks.values() if now - task[2] > self.task_timeout}:
+                p = self._procs[i]
+                print(f"[pool] {p.name} no responde en {self.task_timeout:g} s; se detiene")
+                p.terminate()
+                p.join(1.0)
+                if p.is_alive():
+                    p.kill()
+                    p.join()
+        for i, p in enumerate(self._procs):
+            if p.is_alive(): continue
+            for slot, task in list(self._tasks.items()):
+                if task[3] == i: self._lose(slot)
+            self._task_conns[i].close()
+            self._result_conns[i].close()
+            print(f"[pool] {p.name} terminó (código {p.exitcode}); se vuelve a arrancar")
+            self.restarts += 1
+            self._spawn(i)
+
+    def submit(self, stream, frame, meta=None):
+        """
+        Copia el frame a un slot libre y lo encola. Devuelve el seq asignado,
+        o None si el frame se descartó por falta de slots.
+        """
+        if not self.started:
+            self.start(frame.nbytes)
+        if frame.nbytes > self._slot_bytes:
+            raise ValueError(f"Frame de {frame.nbytes} bytes no cabe en slots de {self._slot_bytes}")
+        if not self._free_slots:
+            self._collect(block=False)
+        if not self._free_slots:
+            self.dropped += 1
+            return None
+
+        slot = self._free_slots.pop()
+        dst = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shms[slot].buf)
+        dst[...] = frame
+
+        seq = self._next_submit.get(stream, 0)
+        self._next_submit[stream] = seq + 1
+        self._next_emit.setdefault(stream, seq)
+        self._meta[(stream, seq)] = meta
+        load = [0] * self.workers
+        for task in self._tasks.values():
+            load[task[3]] += 1
+        worker = load.index(min(load))
+        self._tasks[slot] = (stream, seq, time.time(), worker)
+        try:
+            self._task_conns[worker].send((stream, seq, slot, frame.shape))
+        except OSError:
+            pass  # Worker muerto: _reap da la tarea por perdida y lo vuelve a arrancar
+        self.submitted += 1
+        return seq
+
+    def _collect(self, block, timeout=None):
+        """Pasa los resultados de los pipes al buffer de reordenado. Devuelve cuántos llegaron."""
+        got = 0
+        ready = wait_conns(self._result_conns, timeout if block else 0)
+        for conn in ready:
+            try:
+                while conn.poll():
+                    item = conn.recv()
+                    stream, seq, slot, lms, infer_s = item
+                    task = self._tasks.get(slot)
+                    if task is None or task[:2] != (stream, seq):
+                        continue  # Tarea ya dada por perdida (el slot pudo reutilizarse): se ignora
+                    del self._tasks[slot]
+                    self._free_slots.append(slot)
+                    self._reorder.setdefault(stream, {})[seq] = (lms, self._meta.pop((stream, seq), None))
+                    self.completed += 1
+                    self.last_infer_ms = infer_s * 1000.0
+                    got += 1
+            except (EOFError, OSError):
+                pass  # Worker muerto: lo recoge _reap
+        return got
+
+    def pending(self, stream):
+        """Frames de este flujo enviados y aún no devueltos."""
+        return self._next_submit.get(stream, 0) - self._next_emit.get(stream, 0)
+
+    def poll(self, stream, block=False, timeout=None):
+        """
+        Devuelve, en orden de secuencia, la lista [(seq, landmarks, meta), ...] lista para
+        este flujo. landmarks es un array (33, 4) float32 [x, y, z, visibility] o None.
+        Con block=True espera a que salga al menos el siguiente resultado en orden (o a
+        que su tarea se dé por perdida).
+        """
+        self._collect(block=False)
+        self._reap()
+        buf = self._reorder.setdefault(stream, {})
+        nxt = self._next_emit.get(stream, 0)
+        if block and nxt not in buf and self.pending(stream) > 0:
+            deadline = None if timeout is None else time.time() + timeout
+            while nxt not in buf:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0: break
+                self._collect(block=True, timeout=min(remaining, 0.25) if remaining is not None else 0.25)
+                self._reap()
+
+        out = []
+        while nxt in buf:
+            lms, meta = buf.pop(nxt)
+            out.append((nxt, lms, meta))
+            nxt += 1
+        self._next_emit[stream] = nxt
+        return out
+
+    def close(self):
+        if not self.started: return
+        for conn in self._task_conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for p in self._procs:
+            p.join(timeout=2.0)
+            if p.is_alive(): p.terminate()
+        for conn in self._task_conns + self._result_conns:
+            conn.close()
+        self._procs = []
+        self._task_conns = []
+        self._result_conns = []
+        self._tasks = {}
+        for shm in self._shms:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shms = []
+        self._free_slots = []
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "lost": self.lost,
+            "restarts": self.restarts,
+            "in_flight": self.in_flight,
+            "last_infer_ms": self.last_infer_ms,
+        }
@@ -0,0 +1,269 @@
+"""
+Entrada de cámaras IP.
+
+Dos formas de leer un http://.../video (o rtsp://...):
+
+    opencv   cv2.VideoCapture con tiempo máximo de conexión/lectura (una cámara colgada no
+             bloquea el hilo para siempre) y CAP_PROP_BUFFERSIZE (frames que la captura
+             acumula por detrás; 1 = siempre el último, si el backend lo respeta)
+    mjpeg    Lector propio de multipart/x-mixed-replace (IP Webcam de Android, la mayoría
+             de cámaras IP baratas): un hilo recibe los JPEG sin decodificar y un grupo de
+             hilos decodifica solo el más reciente, y solo cuando el tracker ya se llevó
+             el frame anterior. Los JPEG que llegan mientras tanto se descartan sin
+             decodificar (cv2.imdecode suelta el GIL, así que los hilos decodifican de
+             verdad en paralelo).
+
+En los dos casos una caída se reintenta con espera creciente (capture.Backoff) y el
+bucle del tracker sigue con las demás cámaras.
+"""
+import re
+import time
+import urllib.request
+from threading import Thread
+
+import cv2
+import numpy as np
+
+from capture import FrameGrabber, StageStats
+
+BACKENDS = ("opencv", "mjpeg")
+
+
+def open_opencv(source, buffer_size=1, timeout=5.0):
+    """cv2.VideoCapture de una fuente; las de red con timeout de conexión y de lectura."""
+    if isinstance(source, str) and "://" in source:
+        ms = int(timeout * 1000)
+        cap = cv2.VideoCapture(source, cv2.CAP_ANY,
+                               [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, ms])
+    else:
+        cap = cv2.VideoCapture(source)
+    if buffer_size and cap.isOpened():
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    return cap
+
+
+class MjpegReader:
+    """Parte un stream multipart/x-mixed-replace en JPEGs (con o sin Content-Length por parte)."""
+
+    def __init__(self, resp, boundary, chunk_size=65536):
+        self.resp = resp
+        self.delim = boundary if boundary.startswith(b"--") else b"--" + boundary
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+        self.bytes_received = 0
+
+    def _fill(self):
+        data = self.resp.read1(self.chunk_size)
+        if not data: raise EOFError("la cámara cerró el stream")
+        self.buf += data
+        self.bytes_received += len(data)
+
+    def _find(self, needle, start=0):
+        """Posición de needle en el buffer, leyendo de la red hasta que aparezca."""
+        scanned = start
+        while True:
+            i = self.buf.find(needle, scanned)
+            if i >= 0: return i
+            scanned = max(start, len(self.buf) - len(needle))
+            self._fill()
+
+    def next_jpeg(self):
+        # Cabeceras de la parte: del delimitador a la línea en blanco
+        start = self._find(self.delim)
+        end = self._find(b"\r\n\r\n", start)
+        headers = bytes(self.buf[start:end]).lower()
+        del self.buf[:end + 4]
+        m = re.search(rb"content-length:\s*(\d+)", headers)
+        if m:
+            n = int(m.group(1))
+            while len(self.buf) < n: self._fill()
+        else:
+            n = self._find(self.delim)
+        jpeg = bytes(self.buf[:n])
+        del self.buf[:n]
+        return jpeg.rstrip(b"\r\n") if not m else jpeg
+
+
+def open_mjpeg(url, timeout=5.0):
+    """Abre la conexión y devuelve (respuesta, boundary). OSError si no es un stream MJPEG."""
+    resp = urllib.request.urlopen(urllib.request.Request(url, headers={"User-Agent": "hackeps25-tracker"}),
+                                  timeout=timeout)
+    ctype = resp.headers.get("Content-Type", "")
+    m = re.search(r'boundary="?([^";]+)"?', ctype)
+    if "multipart" not in ctype.lower() or not m:
+        resp.close()
+        raise OSError(f"{url} no es MJPEG (Content-Type: {ctype or '?'}); usa el backend opencv")
+    return resp, m.group(1).strip().encode("latin-1")
+
+
+def _ema(avg, value, alpha=0.2):
+    return value if avg == 0.0 else avg + alpha * (value - avg)
+
+
+class MjpegGrabber(FrameGrabber):
+    """
+    FrameGrabber para cámaras MJPEG: mismo read_latest / peek_latest / stats, pero la
+    recepción y la decodificación van en hilos distintos y solo se decodifica lo que el
+    tracker va a usar. Con el ritmo al que el tracker pide frames, lo que tarda en
+    decodificarse uno y cada cuánto llega un JPEG se calcula cuándo empezar a decodificar
+    para que el frame esté listo justo cuando se pida; los JPEG anteriores se descartan.
+    Si el tracker va más rápido que la cámara se decodifican todos.
+    """
+
+    def __init__(self, url, name="cam", decode_threads=2, timeout=5.0, chunk_size=65536, backoff=None):
+        super().__init__(None, name, reopen=None, backoff=backoff)
+        self.url = url
+        self.decode_threads = max(1, decode_threads)
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._jpeg = None  # Último JPEG recibido (sin decodificar)
+        self._jpeg_time = 0.0
+        self._jpeg_seq = 0
+        self._decoding_seq = 0  # Último JPEG que algún hilo empezó a decodificar
+        self._frame_jpeg_seq = 0  # JPEG del que salió el frame publicado
+        # Medias móviles para decidir cuándo decodificar (segundos)
+        self._last_consume = 0.0
+        self._consume_period = 0.0  # Entre dos frames que se lleva el tracker
+        self._jpeg_period = 0.0  # Entre dos JPEG que llegan
+        self._waiting = 0  # Consumidores bloqueados en read_latest: se decodifica ya
+        self._resp = None
+        self._threads = []
+        self.frames_undecoded = 0  # JPEGs recibidos y descartados sin decodificar
+        self.decode_errors = 0
+        self.bytes_received = 0
+        self.read_stats = StageStats()  # Tiempo de recibir cada JPEG
+        self.decode_stats = StageStats()  # Tiempo de cv2.imdecode
+
+    def start(self):
+        if self._threads: return self
+        self.alive = True
+        self._threads = [Thread(target=self._receive_loop, name=f"mjpeg-{self.name}", daemon=True)]
+        self._threads += [Thread(target=self._decode_loop, name=f"mjpeg-{self.name}-dec{i}", daemon=True)
+                          for i in range(self.decode_threads)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def _receive_loop(self):
+        while self.alive:
+            try:
+                self._resp, boundary = open_mjpeg(self.url, self.timeout)
+            except OSError as e:
+                if self.reconnects == 0 and self.disconnects == 0: print(f"[{self.name}] {e}")
+                with self._cond:
+                    self._cond.wait(self.backoff.next())
+                continue
+            with self._cond:
+                self.connected = True
+                if self.disconnects: self.reconnects += 1
+            reader = MjpegReader(self._resp, boundary, self.chunk_size)
+            received, first = self.bytes_received, True
+            try:
+                while self.alive:
+                    t0 = time.time()
+                    jpeg = reader.next_jpeg()
+                    t1 = time.time()
+                    self.read_stats.add(t1 - t0)
+                    if first:
+                        # La espera vuelve a empezar de cero solo si la conexión da frames de verdad
+                        self.backoff.reset()
+                        first = False
+                    with self._cond:
+                        if self._jpeg_seq > self._decoding_seq:
+                            self.frames_undecoded += 1
+                            self.frames_dropped += 1
+                        if self._jpeg_time: self._jpeg_period = _ema(self._jpeg_period, t1 - self._jpeg_time)
+                        self._jpeg, self._jpeg_time = jpeg, t1
+                        self._jpeg_seq += 1
+                        self.frames_captured += 1
+                        self.bytes_received = received + reader.bytes_received
+                        self._cond.notify_all()
+            except (OSError, EOFError, ValueError) as e:
+                if self.alive: print(f"[{self.name}] cámara caída ({e}), reintentando")
+            finally:
+                self._resp.close()
+                self._resp = None
+            with self._cond:
+                self.connected = False
+                self.disconnects += 1
+                self._cond.notify_all()
+                if self.alive: self._cond.wait(self.backoff.next())
+
+    def _wanted(self):
+        # Hay un JPEG sin empezar y el tracker no tiene ya un frame nuevo esperándole
+        return self._jpeg_seq > self._decoding_seq and self._seq <= self._consumed_seq
+
+    def _decode_at(self):
+        """Instante en que hay que empezar a decodificar para llegar a la próxima petición."""
+        lead = self.decode_stats.avg_ms / 1000.0 + self._jpeg_period
+        return self._last_consume + self._consume_period - lead
+
+    def _decode_loop(self):
+        while True:
+            with self._cond:
+                while self.alive:
+                    if not self._wanted():
+                        self._cond.wait()
+                        continue
+                    wait = 0 if self._waiting else self._decode_at() - time.time()
+                    if wait <= 0: break
+                    self._cond.wait(wait)
+                if not self.alive: return
+                seq, jpeg, t_capture = self._jpeg_seq, self._jpeg, self._jpeg_time
+                self._decoding_seq = seq
+            t0 = time.time()
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self.decode_stats.add(time.time() - t0)
+            with self._cond:
+                if frame is None:
+                    self.decode_errors += 1
+                    continue
+                if seq < self._frame_jpeg_seq:
+                    self.frames_dropped += 1  # Otro hilo ya publicó uno más nuevo
+                    continue
+                if self._seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                self._frame, self._frame_time, self._frame_jpeg_seq = frame, t_capture, seq
+                self._seq += 1
+                self._cond.notify_all()
+
+    def _consumed(self):
+        now = time.time()
+        with self._cond:
+            gap = now - self._last_consume
+            if gap < 1.0: self._consume_period = _ema(self._consume_period, gap)  # Sin contar paradas
+            self._last_consume = now
+            self._cond.notify_all()  # Los decodificadores esperan a que se consuma
+
+    def read_latest(self, timeout=None):
+        with self._cond:
+            self._waiting += 1
+            self._cond.notify_all()
+        try:
+            out = super().read_latest(timeout)
+        finally:
+            with self._cond:
+                self._waiting -= 1
+        if out is not None: self._consumed()
+        return out
+
+    def peek_latest(self):
+        before = self._consumed_seq
+        out = super().peek_latest()
+        if self._consumed_seq != before: self._consumed()
+        return out
+
+    def stop(self):
+        with self._cond:
+            self.alive = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+
+    def stats(self):
+        out = super().stats()
+        with self._cond:
+            out.update(undecoded=self.frames_undecoded, decode_errors=self.decode_errors,
+                       bytes=self.bytes_received, decode=self.decode_stats.snapshot())
+        return out
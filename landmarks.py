@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+import numpy as np
+
+from filters import create_filter
+
+NUM_LANDMARKS = 33  # MediaPipe Pose: 33 puntos, columnas [x, y, z, visibility]
+
+# Resultado vectorizado de un frame (todo arrays de tamaño K = nº de extremidades)
+# norm: x, y (filtrados o predichos) y z normalizados; px: posición filtrada en píxeles;
+# velocity: píxeles/s del filtro
+Extremities = namedtuple("Extremities", ["norm", "px", "visible", "moving", "speed", "velocity"])
+
+# Extremidades a rastrear (Índices de MediaPipe)
+# Referencia: https://developers.google.com/mediapipe/solutions/vision/pose
+EXTREMITIES_IDX = {
+    "nose": 0,
+    # Torso (Fundamental para la rotación del cuerpo)
+    "left_shoulder": 11,
+    "right_shoulder": 12,
+    "left_hip": 23,
+    "right_hip": 24,
+    # Brazos
+    "left_elbow": 13,
+    "right_elbow": 14,
+    "left_wrist": 15,
+    "right_wrist": 16,
+    # Piernas
+    "left_knee": 25,
+    "right_knee": 26,
+    "left_ankle": 27,
+    "right_ankle": 28,
+    # Pies (Punta del pie, útil para saber orientación)
+    "left_foot_index": 31,
+    "right_foot_index": 32
+}
+
+
+def landmarks_to_array(landmark_list, out=None):
+    """
+    Vuelca un NormalizedLandmarkList de MediaPipe a un array (33, 4) float32.
+    Si se pasa `out` (preasignado) se reutiliza y no se reserva memoria por frame.
+    """
+    if out is None:
+        out = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    lms = landmark_list.landmark
+    n = min(len(lms), out.shape[0])
+    for i in range(n):
+        lm = lms[i]
+        out[i, 0] = lm.x
+        out[i, 1] = lm.y
+        out[i, 2] = lm.z
+        out[i, 3] = lm.visibility
+    if n < out.shape[0]:
+        out[n:] = 0.0  # Puntos que faltan: visibilidad 0
+    return out
+
+
+def landmarks_payload(lm, width, height):
+    """Payload estilo original {"landmarks": [{id, x, y, z, visibility}, ...]} en píxeles."""
+    if lm is None: return None
+    scaled = lm.astype(np.float64)
+    scaled[:, 0] *= width
+    scaled[:, 1] *= height
+    scaled[:, 2] *= width
+    return {"landmarks": [
+        {"id": i, "x": x, "y": y, "z": z, "visibility": v}
+        for i, (x, y, z, v) in enumerate(scaled.tolist())
+    ]}
+
+
+class ExtremityState:
+    """
+    Estado de movimiento de las extremidades calculado con arrays:
+    - Las posiciones en píxeles pasan por un filtro temporal (ver filters.py) que da
+      posición suavizada y velocidad; con horizon > 0 se extrapola la posición.
+    - Guarda un ring buffer con las últimas `history` posiciones filtradas y su
+      visibilidad. La velocidad se mide contra la posición VISIBLE más reciente de cada
+      articulación dentro del ring (mismo criterio que el antiguo dict prev_extremities,
+      pero una articulación que lleva más de `history` frames sin verse vuelve a empezar
+      sin velocidad). "moving" tiene histéresis: se activa por encima de sensitivity y
+      solo se apaga por debajo de la mitad.
+    """
+
+    def __init__(self, extremities_idx, history=8, min_visibility=0.5, filter="one_euro", filter_params=None):
+        self.names = list(extremities_idx.keys())
+        self.indices = np.array(list(extremities_idx.values()), dtype=np.intp)
+        self.min_visibility = min_visibility
+        k = len(self.names)
+        self.filter = create_filter(filter, (k, 2), **(filter_params or {}))
+        self.moving = np.zeros(k, dtype=bool)
+
+        # Ring buffer de frames anteriores: posiciones y máscara de visibilidad
+        self.history = history
+        self.ring_px = np.zeros((history, k, 2), dtype=np.float32)
+        self.ring_visible = np.zeros((history, k), dtype=bool)
+        self.head = -1  # Índice del último frame escrito
+        self.frames = 0
+        self._cols = np.arange(k)
+        self._back = np.arange(history)
+
+        # Buffers de trabajo reutilizados
+        self._px = np.zeros((k, 2), dtype=np.float32)
+        self._scale = np.ones(2, dtype=np.float32)
+
+    def reset(self):
+        self.ring_visible[:] = False
+        self.moving[:] = False
+        self.filter.reset()
+        self.head = -1
+        self.frames = 0
+
+    def update(self, lm, width, height, sensitivity, timestamp=0.0, horizon=0.0):
+        """
+        Procesa un frame (33, 4) capturado en `timestamp` y devuelve un Extremities con
+        arrays por articulación. horizon: segundos a predecir en norm (0 = posición filtrada).
+        """
+        sel = lm[self.indices]  # (K, 4) copia pequeña
+        visible = sel[:, 3] >= self.min_visibility
+
+        self._scale[0] = width
+        self._scale[1] = height
+        raw = np.multiply(sel[:, :2], self._scale, out=self._px)
+        pos, vel = self.filter.update(raw, timestamp, visible)
+        px = raw
+        px[visible] = pos[visible]  # Las no visibles se quedan con la medida cruda
+
+        # Posición visible más reciente de cada articulación en el ring (antes de este frame)
+        order = (self.head - self._back) % self.history  # Del más nuevo al más viejo
+        seen = self.ring_visible[order]  # (history, K)
+        newest = seen.argmax(axis=0)
+        delta = px - self.ring_px[order[newest], self._cols]
+        speed = np.sqrt((delta * delta).sum(axis=1))
+        valid = visible & seen.any(axis=0)
+        speed = np.where(valid, speed, 0.0).astype(np.float32)
+        moving = valid & ((speed > sensitivity) | (self.moving & (speed > 0.5 * sensitivity)))
+        self.moving[:] = moving
+
+        # Coordenadas normalizadas que se envían: filtradas (o predichas) donde se ve
+        sel[visible, :2] = (self.filter.predict(horizon)[visible] if horizon > 0 else pos[visible]) / self._scale
+        velocity = np.where(visible[:, None], vel, 0.0).astype(np.float32)
+
+        self.head = (self.head + 1) % self.history
+        self.ring_px[self.head] = px
+        self.ring_visible[self.head] = visible
+        self.frames += 1
+
+        return Extremities(norm=sel[:, :3], px=px.copy(), visible=visible, moving=moving, speed=speed,
+                           velocity=velocity)
+
+    def to_dict(self, ext):
+        """
+        Borde de serialización: arrays -> dict
+        { "left_wrist": {x, y, z, pixel_x, pixel_y, moving, speed, vx, vy}, ... }
+        (vx, vy en coordenadas normalizadas por segundo)
+        """
+        if ext is None: return None
+        out = {}
+        norm = ext.norm.tolist()
+        px = ext.px.tolist()
+        moving = ext.moving.tolist()
+        speed = ext.speed.tolist()
+        vel = (ext.velocity / self._scale).tolist()
+        for i in np.flatnonzero(ext.visible).tolist():
+            out[self.names[i]] = {
+                "x": norm[i][0],
+                "y": norm[i][1],
+                "z": norm[i][2],
+                "pixel_x": px[i][0],
+                "pixel_y": px[i][1],
+                "moving": moving[i],
+                "speed": speed[i],
+                "vx": vel[i][0],
+                "vy": vel[i][1],
+            }
+        return out
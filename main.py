@@ -1,11 +1,23 @@
 import cv2
 import numpy as np
 import time
-import json
 import math
-import requests
-from threading import Thread
-from urllib.parse import urlparse, urlunparse
+import signal
+
+from capture import PipelineStats
+from inference_pool import PoseWorkerPool
+from landmarks import ExtremityState, landmarks_to_array, NUM_LANDMARKS, EXTREMITIES_IDX
+from multiview import CameraView, FusionEngine, parse_source, load_sources
+from ipcam import BACKENDS
+from sender import PoseSender
+from snapshot import SnapshotWriter, JsonExporter
+from recording import PoseRecorder
+from preview import MjpegPreview
+from roi import RoiCropper
+from filters import FILTERS
+from gestures import GestureClassifier
+from pose_backends import create_backend, select_backend, uses_image
+from telemetry import MetricsServer, tracker_collector, install_profiler_signal, REGISTRY
 
 # Intentar importar MediaPipe
 try:
@@ -15,103 +27,131 @@ except Exception:
 
 
 class StereoTracker:
-    def __init__(self, left_source=0, right_source=1, json_out="coords.json",
-                 api_url="http://localhost:5000/api/movement"):
+    def __init__(self, left_source=0, right_source=1, sources=None, views_calib="multiview_calib.npz",
+                 json_out="coords.json",
+                 api_url="http://localhost:5000/api/movement", stats_interval=0.0, workers=0,
+                 calib_file="stereo_calib.npz", board=(9, 6), square_size=0.025, wire="json",
+                 channel=None, snapshot_file="pose_snapshot.bin", json_rate=2.0,
+                 record=None, headless=False, preview_port=0, preview_fps=10.0,
+                 roi_size=640, roi_pad=0.3, backend="mediapipe:1", target_fps=30.0,
+                 filter="one_euro", predict_ms=0.0, metrics_port=0, camera_options=None):
         # --- CONFIGURACIÓN DE CÁMARAS ---
-        self.left_source = left_source
-        self.right_source = right_source
+        # sources: [(nombre, fuente[, opciones]), ...] (ver multiview.load_sources); sin ella, el par izq/der
+        # camera_options: opciones de entrada por defecto de todas las cámaras (ver ipcam.py)
+        if sources is None: sources = [("left", left_source, {}), ("right", right_source, {})]
+        self.views = []
+        for i, (name, src, *opts) in enumerate(sources):
+            options = {**(camera_options or {}), **(opts[0] if opts else {})}
+            self.views.append(CameraView(i, name, src, **options))
+        self.primary = None  # Vista que marca el ritmo y da las posiciones 2D (la primera conectada)
+        self.max_view_skew = 0.1  # Segundos máximos entre el frame principal y el de otra vista
         self.json_out = json_out
+        # Última pose para otros procesos: mmap con seqlock en el bucle, JSON legible aparte
+        self.snapshot_file = snapshot_file
+        self.snapshot = None
+        # Recorte adaptativo alrededor del jugador antes de la inferencia (0 = frame completo)
+        for view in self.views:
+            view.roi = RoiCropper(roi_size, pad=roi_pad) if roi_size else None
+        # Sin pantalla: nada de ventanas, dibujo ni teclado (opcional: preview MJPEG local)
+        self.headless = headless
+        self.preview = MjpegPreview(preview_port, fps=preview_fps, annotate=self._annotate) if preview_port else None
+        self._stop_requested = False
+        # Grabación de landmarks para reproducir sin cámaras (ver recording.py)
+        self.record_path = record
+        self.recorder = None
+        self.json_export = JsonExporter(json_out, rate=json_rate, sanitize=self._sanitize) if json_out else None
 
         # --- CONFIGURACIÓN API Y MOVIMIENTO (NUEVO) ---
         self.api_url = api_url
         self.movement_sensitivity = 3.0  # Mínimo de píxeles para considerar que hubo movimiento
         self.api_send_interval = 0.1  # Enviar datos máx cada 0.1s (10 FPS)
+        # Predicción: lo que se envía se extrapola la edad del frame + predict_ms (red + render)
+        self.predict_ahead = predict_ms / 1000.0
         self.last_api_send_time = 0
-
-        # Extremidades a rastrear (Índices de MediaPipe)
-        # Extremidades a rastrear (Índices de MediaPipe)
-        # Referencia: https://developers.google.com/mediapipe/solutions/vision/pose
-        self.EXTREMITIES_IDX = {
-            "nose": 0,
-            # Torso (Fundamental para la rotación del cuerpo)
-            "left_shoulder": 11,
-            "right_shoulder": 12,
-            "left_hip": 23,
-            "right_hip": 24,
-            # Brazos
-            "left_elbow": 13,
-            "right_elbow": 14,
-            "left_wrist": 15,
-            "right_wrist": 16,
-            # Piernas (Lo que pediste)
-            "left_knee": 25,
-            "right_knee": 26,
-            "left_ankle": 27,
-            "right_ankle": 28,
-            # Pies (Punta del pie, útil para saber orientación)
-            "left_foot_index": 31,
-            "right_foot_index": 32
-        }
-        # Almacena posición anterior { "left_wrist": (x, y), ... }
-        self.prev_extremities = {}
+        # Emisor único con keep-alive y cola acotada (se arranca en run)
+        # channel: jugador/cabina (cada tracker escribe en su propio canal del servidor)
+        self.sender = PoseSender(api_url, wire=wire, channel=channel, sanitize=self._sanitize)
+
+        # Extremidades a rastrear (Índices de MediaPipe, ver landmarks.EXTREMITIES_IDX)
+        self.EXTREMITIES_IDX = EXTREMITIES_IDX
+        # Estado vectorizado: ring buffer de posiciones anteriores por articulación
+        # y filtro temporal por articulación (ver filters.py)
+        self.ext_state = ExtremityState(self.EXTREMITIES_IDX, filter=filter)
+        # Gestos (waving, walking...) -> campo "state" de la pose; las transiciones se envían ya
+        self.gestures = GestureClassifier(self.ext_state.names)
+        self._state_changed = False
+        # Buffer preasignado donde se vuelcan los 33 landmarks de cada frame (cada vista tiene el suyo)
+        self._lm_buf = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+
+        # --- MÉTRICAS DEL PIPELINE ---
+        self.stats = PipelineStats()
+        self.stats_interval = stats_interval  # Cada cuántos segundos imprimir resumen (0 = nunca)
+        self._last_stats_print = time.time()
+        self.frames_pose = 0  # Frames con/sin persona detectada
+        self.frames_no_pose = 0
+        # Endpoint /metrics (Prometheus) y perfilador a demanda (ver telemetry.py)
+        self.metrics = MetricsServer(metrics_port) if metrics_port else None
+        self._pair_id = 0  # Empareja los frames de las vistas dentro del pool
+        self._pair_floor = 0  # Resultados anteriores al último cambio de vista principal se ignoran
+        self._view_results = {}  # (vista, par) -> (frame, landmarks)
+        self._view_last = {}  # vista -> último par recibido
+        self._pool_warned = set()
 
         # --- INICIALIZACIÓN DE FUENTES DE VIDEO ---
-        self.left_is_ip = isinstance(left_source, str)
-        self.right_is_ip = isinstance(right_source, str)
-        self.left_is_pc = not self.left_is_ip
-        self.right_is_pc = not self.right_is_ip
-
-        print(f"Iniciando cámaras... Izq: {left_source}, Der: {right_source}")
-        self.cap_left = cv2.VideoCapture(left_source)
-        self.cap_right = cv2.VideoCapture(right_source)
-        self.use_single_camera = False
-
-        # Validación de cámaras
-        def _validate(cap, attempts=20):
-            if cap is None or not cap.isOpened(): return False
-            for _ in range(attempts):
-                ret, _ = cap.read()
-                if ret: return True
-                time.sleep(0.05)
-            return False
-
-        left_ok = _validate(self.cap_left)
-        right_ok = _validate(self.cap_right)
-
-        if left_ok and right_ok:
-            print("Modo Estéreo Activo.")
-        elif left_ok and not right_ok:
-            self.use_single_camera = True
-            if right_ok: self.cap_right.release()
-            print("Solo cámara Izquierda detectada. Modo SINGLE.")
-        else:
+        print("Iniciando cámaras... " + ", ".join(f"{v.name}: {v.source}" for v in self.views))
+        opened = []
+        for view in self.views:
+            if view.connect():
+                opened.append(view)
+            else:
+                # Una cámara en vivo que no responde se sigue reintentando en segundo plano
+                print(f"Cámara {view.name} ({view.source}) no disponible" + (", se reintentará" if view.live else ""))
+        if not opened and not any(v.live for v in self.views):
             self.no_cameras = True
             print("ERROR: No se encontraron cámaras.")
             return
+        self.primary = opened[0] if opened else self.views[0]
+        print(f"{len(opened)} de {len(self.views)} cámaras activas." if len(self.views) > 1 else "Modo SINGLE.")
+
+        # --- FUSIÓN MULTIVISTA (calibración cacheada en disco + triangulación) ---
+        self.fusion = None
+        if len(self.views) > 1:
+            self.fusion = FusionEngine(len(self.views), cache_path=views_calib, stereo_cache=calib_file,
+                                       pattern=board, square_size=square_size)
 
-        # --- CONFIGURACIÓN MEDIAPIPE ---
-        self.pose = None
+        # --- BACKEND DE POSE (ver pose_backends.py) ---
         self.pose_backend = None
+        self.pool = None  # Pool multiproceso opcional (--workers N)
+        self.mp_drawing = None
         if mp is not None:
             try:
+                # Solo para dibujar el esqueleto (ventana / preview)
                 self.mp_pose = mp.solutions.pose
                 self.mp_drawing = mp.solutions.drawing_utils
                 self.mp_styles = mp.solutions.drawing_styles
-                self.pose = self.mp_pose.Pose(
-                    model_complexity=1,
-                    enable_segmentation=False,
-                    smooth_landmarks=True,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5,
-                )
-                self.pose_backend = "mediapipe"
             except Exception as e:
                 print(f"Error iniciando MediaPipe: {e}")
-        else:
-            print("MediaPipe no instalado. No se detectarán extremidades.")
+        try:
+            if backend == "auto":
+                backend = self._auto_backend(target_fps)
+            if workers > 0:
+                # Cada worker carga su propio modelo
+                self.pool = PoseWorkerPool(workers=workers, backend_spec=backend)
+                self.pose_backend = backend
+            else:
+                # Un modelo por vista (tracking independiente en cada una)
+                for view in self.views:
+                    if view in opened or view.live: view.pose = create_backend(backend)
+                self.pose_backend = self.primary.pose.name
+            if not uses_image(backend):
+                for view in self.views:
+                    view.roi = None
+            print(f"Backend de pose: {self.pose_backend}")
+        except Exception as e:
+            print(f"ERROR iniciando el backend de pose '{backend}': {e}. No se detectarán extremidades.")
 
         # Variables auxiliares originales
-        self.calibration = None
+        self.calibration = self.fusion.calibration.summary() if self.fusion and self.fusion.ready else None
         self.cal_distance_m = 2.0
         self._calib_msg_until = 0.0
         self.anchor_landmark_id = 0
@@ -128,108 +168,235 @@ class StereoTracker:
         if isinstance(obj, (np.generic, np.float32, np.float64)): return float(obj)
         return self._nan_to_none(obj)
 
-    def _write_json_snapshot(self, snapshot):
-        try:
-            with open(self.json_out, 'w', encoding='utf-8') as f:
-                json.dump(self._sanitize(snapshot), f, ensure_ascii=False)
-        except Exception:
-            pass
+    def _write_snapshot(self, lm, w, h):
+        # Sin disco ni JSON en el bucle: copiar 33x4 floats al mmap y pasar la referencia al exportador
+        if self.snapshot is not None:
+            self.snapshot.write(lm, w, h, self.calibration)
+        if self.json_export is not None:
+            self.json_export.submit(lm, w, h, self.calibration)
 
     # --- LÓGICA DE API Y MOVIMIENTO ---
 
     def _send_api_async(self, payload):
-        def worker():
-            try:
-                print("Intentando enviar a API...")  # DEBUG
-                headers = {'Content-Type': 'application/json'}
-                r = requests.post(self.api_url, json=payload, headers=headers, timeout=1.0)
-                print(f"API Respondió: {r.status_code}")  # DEBUG
-            except requests.exceptions.ConnectionError:
-                print(f"ERROR: No se pudo conectar a {self.api_url}. ¿Está encendido el servidor?")
-            except Exception as e:
-                print(f"ERROR API: {e}")
-
-        t = Thread(target=worker, daemon=True)
-        t.start()
-
-    def process_extremities(self, landmarks, width, height):
-        """Calcula posición y velocidad de las extremidades clave."""
-        if not landmarks: return None
-
-        data_out = {}
-
-        for name, idx in self.EXTREMITIES_IDX.items():
-            if idx >= len(landmarks.landmark): continue
-
-            lm = landmarks.landmark[idx]
-
-            # Coordenadas Píxeles (Para dibujar en OpenCV)
-            cx, cy = float(lm.x * width), float(lm.y * height)
-
-            # Coordenadas Normalizadas 0.0 a 1.0 (Para enviar a Three.js/Django)
-            norm_x, norm_y = float(lm.x), float(lm.y)
-
-            vis = float(lm.visibility)
-
-            if vis < 0.5: continue
-
-            is_moving = False
-            speed = 0.0
-
-            if name in self.prev_extremities:
-                prev_x, prev_y = self.prev_extremities[name]
-                dist = math.sqrt((cx - prev_x) ** 2 + (cy - prev_y) ** 2)
-                speed = dist
-                if dist > self.movement_sensitivity:
-                    is_moving = True
-
-            self.prev_extremities[name] = (cx, cy)
-
-            data_out[name] = {
-                # IMPORTANTE: Enviamos las normalizadas como x e y para la API
-                "x": norm_x,
-                "y": norm_y,
-                "z": lm.z,
-                "pixel_x": cx,  # Guardamos pixel por si acaso se necesita debug
-                "pixel_y": cy,
-                "moving": is_moving,
-                "speed": speed
-            }
-
-        return data_out
-
-    def detect_pose(self, frame):
-        """Detecta pose y devuelve payload + landmarks crudos."""
-        if not self.pose or self.pose_backend != "mediapipe":
+        # Lo envía el hilo del PoseSender; aquí solo se encola
+        self.sender.submit(payload)
+
+    def process_extremities(self, landmarks, width, height, t_capture=None):
+        """
+        Calcula posición y velocidad (filtradas) de las extremidades clave.
+        Acepta el array (33, 4) o un NormalizedLandmarkList y devuelve un Extremities
+        (arrays por articulación); el dict se arma solo al serializar con ext_state.to_dict.
+        t_capture: instante de captura del frame (el filtro necesita el tiempo real entre frames).
+        """
+        if landmarks is None: return None
+        if not isinstance(landmarks, np.ndarray):
+            landmarks = landmarks_to_array(landmarks, self._lm_buf)
+        now = time.time()
+        if t_capture is None: t_capture = now
+        horizon = now - t_capture + self.predict_ahead if self.predict_ahead > 0 else 0.0
+        ext = self.ext_state.update(landmarks, width, height, self.movement_sensitivity, t_capture, horizon)
+        # Clasificador incremental: también ve los resultados intermedios del pool
+        _, changed = self.gestures.update(ext, t_capture)
+        self._state_changed |= changed
+        self.stats.stage("extremities").add(time.time() - now)
+        return ext
+
+    def _landmarks_from_array(self, arr):
+        """Convierte el array (33, 4) en un NormalizedLandmarkList de MediaPipe (solo para dibujar)."""
+        from mediapipe.framework.formats import landmark_pb2  # type: ignore
+        lm_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, vis in arr.tolist():
+            lm_list.landmark.add(x=x, y=y, z=z, visibility=vis)
+        return lm_list
+
+    def detect_pose(self, frame, view=None):
+        """
+        Detecta pose y devuelve (landmarks (33, 4) normalizados al frame completo,
+        resultado crudo del backend (solo MediaPipe), relativo al recorte si hay ROI).
+        Usa el modelo, el buffer y el recorte de `view` (por defecto la vista principal).
+        No dibuja nada: eso lo hace _annotate solo cuando hay algo que mostrar.
+        """
+        view = view or self.primary
+        pose = view.pose
+        if not pose:
             return None, None
-
-        h, w = frame.shape[:2]
+        roi = view.roi
+        tf = None
+        if roi is not None:
+            frame, tf = roi.prepare(frame)
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        result = self.pose.process(rgb)
-
-        pose_payload = None
-        raw_landmarks = None
-
-        if result.pose_landmarks:
-            raw_landmarks = result.pose_landmarks
-
-            # Dibujo básico de esqueleto
+        t0 = time.time()
+        lm = pose.infer(rgb, view.lm_buf)
+        dt = time.time() - t0
+        self.stats.stage("infer" if view is self.primary else f"infer_{view.name}").add(dt)
+        if roi is not None: roi.record_inference(tf, dt)
+        if lm is None:
+            if roi is not None: roi.update(None)
+            return None, None
+        return self._roi_result(roi, lm, tf), pose.last_raw
+
+    def _auto_backend(self, target_fps):
+        """Elige el modelo más pesado que aguante target_fps con un frame real de esta cámara."""
+        frame = self.primary.sample_frame()
+        if frame is None: frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        if self.primary.roi is not None: frame, _ = self.primary.roi.prepare(frame)
+        spec, seconds = select_backend(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), target_fps)
+        print(f"Auto: {spec} ({1.0 / seconds:.0f} FPS de inferencia, objetivo {target_fps:.0f})")
+        return spec
+
+    def _roi_result(self, roi, lm, tf):
+        """Landmarks del recorte -> frame completo, y decide el recorte del siguiente frame."""
+        if roi is None: return lm
+        roi.to_full(lm, tf)
+        roi.update(lm)
+        return lm
+
+    def _roi_prepare(self, roi, frame):
+        return roi.prepare(frame) if roi is not None else (frame, None)
+
+    def _annotate(self, frame, lm, extremities_status):
+        """Esqueleto + estado de cada extremidad sobre `frame` (ventana o preview)."""
+        if lm is not None and self.mp_drawing is not None:
             self.mp_drawing.draw_landmarks(
                 frame,
-                raw_landmarks,
+                self._landmarks_from_array(lm),
                 self.mp_pose.POSE_CONNECTIONS,
                 landmark_drawing_spec=self.mp_styles.get_default_pose_landmarks_style(),
             )
-
-            # Payload estilo original (todos los landmarks)
-            lm_list = []
-            for idx, lm in enumerate(raw_landmarks.landmark):
-                lm_list.append({
-                    "id": idx, "x": lm.x * w, "y": lm.y * h, "z": lm.z * w, "visibility": lm.visibility
-                })
-            pose_payload = {"landmarks": lm_list}
-
-        return pose_payload, raw_landmarks
+        if extremities_status is None: return
+        y_txt = 30
+        px = extremities_status.px.astype(np.int32).tolist()
+        for i in np.flatnonzero(extremities_status.visible).tolist():
+            part = self.ext_state.names[i]
+            moving = bool(extremities_status.moving[i])
+            # Color: Verde si se mueve, Rojo si está quieto
+            color = (0, 255, 0) if moving else (0, 0, 255)
+
+            # Dibujar círculo en la articulación
+            cv2.circle(frame, (px[i][0], px[i][1]), 10, color, 2)
+
+            # Texto de estado
+            txt = f"{part}: {'MOVIENDO' if moving else 'QUIETO'} ({int(extremities_status.speed[i])})"
+            cv2.putText(frame, txt, (10, y_txt), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            y_txt += 20
+        cv2.putText(frame, f"ESTADO: {self.gestures.state}", (10, frame.shape[0] - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+
+    def _request_stop(self, *_):
+        # Ctrl+C en headless: terminamos el bucle y limpiamos como con la tecla Q
+        self._stop_requested = True
+
+    def _switch_primary(self, view):
+        """Otra vista pasa a dar las posiciones 2D: el historial de la anterior ya no vale."""
+        print(f"Vista principal: {view.name}" + (f" (en lugar de {self.primary.name})" if self.primary else ""))
+        self.primary = view
+        self.ext_state.reset()
+        self._pair_floor = self._pair_id
+
+    def _detect_pose_pool(self, frame, t_capture, others=()):
+        """
+        Envía el frame de la vista principal (y los de `others` [(vista, frame)], si hay
+        triangulación) al pool y devuelve (frame, t_capture, landmarks, [(vista, frame,
+        landmarks)] de las demás vistas con persona) del resultado más reciente en orden
+        de secuencia, o None si todavía no ha vuelto ninguno.
+        """
+        primary = self.primary
+        pair_id = self._pair_id
+        self._pair_id += 1
+        if not self.pool.started:
+            # Los slots deben caber tanto el frame completo de cualquier vista como cualquier recorte
+            sizes = [frame.nbytes] + [f.nbytes for _, f in others]
+            sizes += [int(np.prod(v.frame_shape)) for v in self.views if v.frame_shape]
+            sizes += [v.roi.max_bytes for v in self.views if v.roi is not None]
+            self.pool.start(max(sizes))
+        self._pool_submit(primary, frame, t_capture, pair_id)
+        for view, f in others:
+            self._pool_submit(view, f, t_capture, pair_id)
+
+        # Solo esperamos si todos los workers están ocupados con este flujo
+        block = self.pool.pending(primary.name) >= self.pool.workers
+        ready = self.pool.poll(primary.name, block=block, timeout=1.0)
+        # Lo que se envió antes de que esta vista pasara a ser la principal no cuenta
+        ready = [r for r in ready if r[2][2] >= self._pair_floor]
+        if not ready: return None
+
+        # Los resultados intermedios también pasan por process_extremities, en orden,
+        # para que la velocidad se calcule frame a frame sin saltos
+        for _, lms, (f, t_cap, _, tf) in ready[:-1]:
+            lms = self._roi_result(primary.roi, lms, tf)
+            if lms is not None:
+                self.process_extremities(lms, f.shape[1], f.shape[0], t_cap)
+
+        _, lms, (f, t_cap, pid, tf) = ready[-1]
+        if primary.roi is not None: primary.roi.record_inference(tf, self.pool.last_infer_ms / 1000.0)
+        lm = self._roi_result(primary.roi, lms, tf)
+
+        # Emparejamos con los resultados de las demás vistas del mismo par (mismo instante de captura)
+        seen = []
+        for view in self.views:
+            if view is primary: continue
+            while ((view.name, pid) not in self._view_results and self._view_last.get(view.name, -1) < pid
+                   and self.pool.pending(view.name) > 0):
+                got = self.pool.poll(view.name, block=True, timeout=1.0)
+                if not got: break
+                self._store_view_results(view, got)
+            self._store_view_results(view, self.pool.poll(view.name))
+            f_v, lm_v = self._view_results.get((view.name, pid), (None, None))
+            if lm_v is not None: seen.append((view, f_v, lm_v))
+        # Los pares más viejos ya no sirven
+        for key in [k for k in self._view_results if k[1] <= pid]:
+            del self._view_results[key]
+        return f, t_cap, lm, seen
+
+    def _pool_submit(self, view, frame, t_capture, pair_id):
+        img, tf = self._roi_prepare(view.roi, frame)
+        try:
+            self.pool.submit(view.name, img, meta=(frame, t_capture, pair_id, tf))
+        except ValueError as e:
+            # Una cámara que volvió con más resolución de la que cabe en los slots
+            if view.name not in self._pool_warned:
+                print(f"[{view.name}] {e}")
+                self._pool_warned.add(view.name)
+
+    def _store_view_results(self, view, got):
+        for _, lms, (f, _, rid, tf) in got:
+            self._view_results[(view.name, rid)] = (f, self._roi_result(view.roi, lms, tf))
+            self._view_last[view.name] = rid
+
+    # --- MÉTRICAS ---
+    def pipeline_stats(self):
+        """Latencias por etapa y contadores de frames capturados/descartados por cámara."""
+        out = {"stages": self.stats.snapshot(), "grabbers": {}}
+        for view in self.views:
+            if view.grabber is not None:
+                out["grabbers"][view.name] = view.grabber.stats()
+        if self.pool is not None:
+            out["pool"] = self.pool.stats()
+        out["sender"] = self.sender.stats()
+        if self.primary.roi is not None:
+            out["roi"] = self.primary.roi.stats()
+        out["gesture"] = {"state": self.gestures.state, "transitions": self.gestures.transitions}
+        return out
+
+    def _maybe_print_stats(self):
+        if not self.stats_interval: return
+        now = time.time()
+        if now - self._last_stats_print < self.stats_interval: return
+        self._last_stats_print = now
+        st = self.pipeline_stats()
+        parts = [f"{k}={v['avg_ms']:.1f}ms" for k, v in st["stages"].items()]
+        parts += [f"{k}: cap={v['captured']} drop={v['dropped']}" + ("" if v["connected"] else " CAÍDA")
+                  for k, v in st["grabbers"].items()]
+        snd = st["sender"]
+        parts.append(f"api: q={snd['queue_depth']} drop={snd['dropped'] + snd['coalesced']} "
+                     f"rtt={snd['latency']['avg_ms']:.1f}ms")
+        roi = st.get("roi")
+        if roi is not None:
+            speedup = f"x{roi['speedup']:.2f}" if roi["speedup"] else "-"
+            parts.append(f"roi: {roi['frames_roi']}/{roi['frames_roi'] + roi['frames_full']} px={roi['pixel_frac']:.0%} "
+                         f"infer full={roi['infer_full']['avg_ms']:.1f}ms roi={roi['infer_roi']['avg_ms']:.1f}ms {speedup}")
+        parts.append(f"state={st['gesture']['state']} ({st['gesture']['transitions']} cambios)")
+        print("[stats] " + " | ".join(parts))
 
     # --- BUCLE PRINCIPAL ---
     def run(self):
@@ -237,83 +404,173 @@ class StereoTracker:
 
         print(f"Rastreando... Enviando a API: {self.api_url}")
 
+        self.sender.start()
+        if self.preview: self.preview.start()
+        if self.metrics:
+            REGISTRY.add_collector(tracker_collector(self))
+            self.metrics.start()
+        install_profiler_signal()
+        if self.headless:
+            signal.signal(signal.SIGINT, self._request_stop)
+            signal.signal(signal.SIGTERM, self._request_stop)
+        if self.snapshot_file: self.snapshot = SnapshotWriter(self.snapshot_file)
+        if self.json_export: self.json_export.start()
+        if self.record_path:
+            self.recorder = PoseRecorder(self.record_path, stereo=len(self.views) > 1)
+
+        # Un hilo lector por cámara: cada uno guarda solo el último frame (y reabre las caídas)
+        for view in self.views:
+            view.start()
+
         while True:
-            # 1. Leer frames
-            if self.use_single_camera:
-                ret, frame = self.cap_left.read()
-                if not ret: break
-                frame_main = frame  # Usamos frame izquierdo/único para análisis
+            t_loop = time.time()
+
+            # 1. Leer frames: la vista principal marca el ritmo; si se cae, la siguiente conectada
+            primary = next((v for v in self.views if v.connected), None)
+            if primary is None:
+                if all(v.finished for v in self.views) or self._stop_requested: break
+                time.sleep(0.05)  # Todas caídas: esperamos a que vuelva alguna
+                continue
+            if primary is not self.primary: self._switch_primary(primary)
+            latest = primary.grabber.read_latest(timeout=0.5)
+            if latest is None:
+                if self._stop_requested: break
+                continue  # Caída o sin frame nuevo: en la siguiente vuelta se reelige la vista
+            _, frame_main, t_capture = latest
+            # Las demás no marcan el ritmo: lo último que tengan, si es del mismo instante
+            others = []
+            for view in self.views:
+                if view is primary or not view.connected: continue
+                got = view.grabber.peek_latest()
+                if got is not None and abs(got[2] - t_capture) <= self.max_view_skew:
+                    others.append((view, got[1]))
+            t_frames = time.time()
+            self.stats.stage("wait_frame").add(t_frames - t_loop)
+            self.stats.stage("frame_age").add(t_frames - t_capture)
+            # Frames para calibrar con la tecla C (las vistas sin frame reciente no cuentan)
+            raw = {primary.index: frame_main, **{view.index: f for view, f in others}}
+
+            # 2. Detección de Pose (en todas las vistas si hay triangulación)
+            use_3d = self.fusion is not None and self.fusion.ready and bool(others)
+            if use_3d:
+                others = [(view, f) for view, f in others if self.fusion.matches(view.index, f)]
+                use_3d = bool(others) and self.fusion.matches(primary.index, frame_main)
+            t_infer = time.time()
+            seen = []  # [(vista, frame, landmarks)] de las demás vistas con persona
+            if self.pool is not None:
+                pooled = self._detect_pose_pool(frame_main, t_capture, others if use_3d else ())
+                if pooled is not None:
+                    # Seguimos con el frame al que pertenece el resultado (no el recién capturado)
+                    frame_main, t_capture, lm, seen = pooled
+                else:
+                    lm = None
             else:
-                ret1, frame_l = self.cap_left.read()
-                ret2, frame_r = self.cap_right.read()
-                if not ret1 or not ret2: break
-                frame_main = frame_l
-
-                # 2. Detección de Pose
-            pose_payload, raw_landmarks = self.detect_pose(frame_main)
+                lm, _ = self.detect_pose(frame_main)
+                if use_3d and lm is not None:
+                    for view, f in others:
+                        lm_v, _ = self.detect_pose(f, view)
+                        if lm_v is not None: seen.append((view, f, lm_v))
+            self.stats.stage("inference").add(time.time() - t_infer)
+            if lm is None: self.frames_no_pose += 1
+            else: self.frames_pose += 1
             h, w = frame_main.shape[:2]
+            if self.recorder is not None:
+                self.recorder.add(t_capture, lm, w, h, seen[0][2] if seen else None)
+
+            # 2b. Triangulación en lote de las extremidades vistas por al menos dos cámaras
+            extremities_3d = None
+            if lm is not None and seen:
+                t_tri = time.time()
+                observations = [(primary.index, lm, w, h)]
+                observations += [(view.index, lm_v, f.shape[1], f.shape[0]) for view, f, lm_v in seen]
+                extremities_3d = self.fusion.triangulate_landmarks(observations, self.ext_state.indices)
+                self.stats.stage("triangulate").add(time.time() - t_tri)
 
             # 3. Análisis de Extremidades y API
             extremities_status = None
-            if raw_landmarks:
-                extremities_status = self.process_extremities(raw_landmarks, w, h)
-
-                # Visualización en pantalla
-                if extremities_status:
-                    y_txt = 30
-                    for part, info in extremities_status.items():
-                        # Color: Verde si se mueve, Rojo si está quieto
-                        color = (0, 255, 0) if info['moving'] else (0, 0, 255)
-
-                        # Dibujar círculo en la articulación
-                        cv2.circle(frame_main, (int(info['x']), int(info['y'])), 10, color, 2)
-
-                        # Texto de estado
-                        txt = f"{part}: {'MOVIENDO' if info['moving'] else 'QUIETO'} ({int(info['speed'])})"
-                        cv2.putText(frame_main, txt, (10, y_txt), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                        y_txt += 20
+            if lm is None:
+                _, changed = self.gestures.update(None, t_capture)
+                self._state_changed |= changed
+            else:
+                extremities_status = self.process_extremities(lm, w, h, t_capture)
+                visible = extremities_status.visible
 
-                # Enviar a API (Rate limited)
+                # Enviar a API (Rate limited; un cambio de estado se envía sin esperar)
                 now = time.time()
-                if (now - self.last_api_send_time > self.api_send_interval) and extremities_status:
+                due = now - self.last_api_send_time > self.api_send_interval or self._state_changed
+                if due and visible.any():
                     api_data = {
                         "timestamp": now,
-                        "camera_mode": "single" if self.use_single_camera else "stereo",
-                        "extremities": extremities_status
+                        "camera_mode": "stereo" if extremities_3d is not None else "single",
+                        "state": self.gestures.state,
+                        # El dict solo se arma aquí, cuando de verdad se envía
+                        "extremities": self.ext_state.to_dict(extremities_status)
                     }
-                    # Sanitizar y enviar asíncronamente
-                    self._send_api_async(self._sanitize(api_data))
+                    if extremities_3d is not None:
+                        # Posiciones métricas (metros, sistema de la vista 0)
+                        api_data["extremities_3d"] = self.fusion.to_dict(self.ext_state.names, *extremities_3d)
+                    # Enviar asíncronamente (el PoseSender sanitiza si sale en JSON)
+                    self._send_api_async(api_data)
                     self.last_api_send_time = now
-
-            # 4. Mostrar ventanas
-            cv2.imshow("Main Camera (Tracking)", frame_main)
-            if not self.use_single_camera:
-                cv2.imshow("Secondary Camera", frame_r)
-
-            # 5. Guardar JSON local (funcionalidad original)
+                    self._state_changed = False
+                    # Latencia captura -> envío (lo que ve el servidor)
+                    self.stats.stage("capture_to_send").add(time.time() - t_capture)
+
+            # 4. Mostrar ventanas (en headless no se dibuja nada en el camino de tracking)
+            t_show = time.time()
+            if not self.headless:
+                self._annotate(frame_main, lm, extremities_status)
+                cv2.imshow("Main Camera (Tracking)", frame_main)
+                for view, f in others:
+                    cv2.imshow(f"Camera {view.name}", f)
+            if self.preview is not None and self.preview.due():
+                if self.headless:
+                    # Copia: el dibujo y el JPEG se hacen en el hilo del preview
+                    lm_copy = None if lm is None else lm.copy()
+                    self.preview.submit(frame_main.copy(), lm_copy, extremities_status)
+                else:
+                    self.preview.submit(frame_main.copy())  # Ya anotado para la ventana
+            self.stats.stage("display").add(time.time() - t_show)
+
+            # 5. Snapshot local (mmap) y coords.json (en su hilo, a baja frecuencia)
+            t_snap = time.time()
             try:
-                full_snap = {"pose": pose_payload, "calibration": self.calibration}
-                self._write_json_snapshot(full_snap)
+                self._write_snapshot(lm, w, h)
             except Exception:
                 pass
+            self.stats.stage("snapshot").add(time.time() - t_snap)
 
-            # 6. Controles
-            key = cv2.waitKey(1) & 0xFF
-            if key in (ord('q'), ord('Q')):
+            # 6. Controles (solo con ventana; en headless se para con Ctrl+C)
+            key = -1 if self.headless else cv2.waitKey(1) & 0xFF
+            if key in (ord('q'), ord('Q')) or self._stop_requested:
                 break
-            # Calibración manual simple (tecla C)
-            if key in (ord('c'), ord('C')) and raw_landmarks:
+            # Calibración (tecla C): con varias cámaras captura el tablero en las que lo ven
+            if key in (ord('c'), ord('C')) and self.fusion is not None:
+                if self.fusion.capture_board(raw) and self.fusion.ready:
+                    self.calibration = self.fusion.calibration.summary()
+            elif key in (ord('c'), ord('C')) and lm is not None:
                 self.calibration = {
                     "timestamp": time.time(),
                     "msg": "Calibracion manual disparada"
                 }
                 print("Calibración capturada.")
 
+            self.stats.stage("loop").add(time.time() - t_loop)
+            self._maybe_print_stats()
+
         # Limpieza
-        if self.cap_left: self.cap_left.release()
-        if self.cap_right: self.cap_right.release()
-        if self.pose: self.pose.close()
-        cv2.destroyAllWindows()
+        self.sender.stop()
+        if self.json_export: self.json_export.stop()
+        if self.snapshot: self.snapshot.close()
+        if self.recorder:
+            self.recorder.close()
+            print(f"Grabación: {self.recorder.frames} frames en {self.record_path}")
+        for view in self.views:
+            view.close()
+        if self.pool: self.pool.close()
+        if self.preview: self.preview.stop()
+        if self.metrics: self.metrics.stop()
+        if not self.headless: cv2.destroyAllWindows()
 
 
 # --- ENTRY POINT ---
@@ -323,33 +580,85 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--left", default="0", help="ID o URL camara izquierda")
     parser.add_argument("--right", default="1", help="ID o URL camara derecha")
+    parser.add_argument("--sources", default=None,
+                        help="JSON con las cámaras o lista '0,1,rtsp://...' (ver multiview.py); sustituye a --left/--right")
+    parser.add_argument("--ip-backend", choices=BACKENDS, default="opencv",
+                        help="Lectura de cámaras http://: OpenCV o el lector MJPEG propio (ver ipcam.py)")
+    parser.add_argument("--ip-buffer", type=int, default=1, help="CAP_PROP_BUFFERSIZE de las capturas OpenCV")
+    parser.add_argument("--ip-timeout", type=float, default=5.0, help="Segundos máximos para conectar/leer una cámara IP")
+    parser.add_argument("--decode-threads", type=int, default=2, help="Hilos que decodifican JPEG (backend mjpeg)")
+    parser.add_argument("--reconnect-max", type=float, default=10.0,
+                        help="Espera máxima entre reintentos de una cámara caída (segundos)")
+    parser.add_argument("--views-calib", default="multiview_calib.npz", help="Caché de la calibración multivista")
     # CAMBIO AQUÍ: Apuntar a Django update-pose
     parser.add_argument("--api", default="http://127.0.0.1:8000/api/update-pose/", help="Endpoint API")
+    parser.add_argument("--stats-interval", type=float, default=0.0,
+                        help="Imprimir latencias por etapa cada N segundos (0 = desactivado)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Procesos de inferencia en paralelo (0 = inferencia en el hilo principal)")
+    parser.add_argument("--calib-file", default="stereo_calib.npz",
+                        help="Calibración estéreo antigua (vistas 0 y 1 si aún no hay --views-calib)")
+    parser.add_argument("--board", default="9x6", help="Esquinas interiores del tablero (COLxFIL)")
+    parser.add_argument("--square", type=float, default=0.025, help="Lado del cuadrado del tablero en metros")
+    parser.add_argument("--wire", choices=["json", "binary"], default="json",
+                        help="Formato de envío a la API (binary = application/x-pose-v1)")
+    parser.add_argument("--json-out", default="coords.json", help="JSON legible con la última pose ('' = no)")
+    parser.add_argument("--json-rate", type=float, default=2.0, help="Escrituras por segundo del JSON legible")
+    parser.add_argument("--snapshot-file", default="pose_snapshot.bin",
+                        help="Snapshot mmap para otros procesos (ver snapshot.py; '' = no)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin ventanas, dibujo ni teclado (parar con Ctrl+C)")
+    parser.add_argument("--preview-port", type=int, default=0,
+                        help="Preview MJPEG en http://127.0.0.1:PUERTO/ (0 = desactivado)")
+    parser.add_argument("--preview-fps", type=float, default=10.0, help="FPS máximos del preview")
+    parser.add_argument("--backend", default="mediapipe:1",
+                        help="mediapipe[:0|1|2], onnx:MODELO.onnx, synthetic[:GRABACION] o auto")
+    parser.add_argument("--target-fps", type=float, default=30.0,
+                        help="FPS de inferencia que debe aguantar el modelo elegido por --backend auto")
+    parser.add_argument("--roi-size", type=int, default=640,
+                        help="Lado máximo de la imagen que llega al modelo (recorte alrededor del jugador; 0 = frame completo)")
+    parser.add_argument("--roi-pad", type=float, default=0.3, help="Margen del recorte (fracción del cuerpo)")
+    parser.add_argument("--record", default=None,
+                        help="Grabar los landmarks en esta carpeta (reproducir con recording.py replay)")
+    parser.add_argument("--filter", choices=FILTERS, default="one_euro",
+                        help="Filtro temporal por articulación (ver filters.py)")
+    parser.add_argument("--predict-ms", type=float, default=0.0,
+                        help="Predecir la pose enviada edad del frame + N ms por delante (0 = sin predicción)")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Métricas Prometheus en http://127.0.0.1:PUERTO/metrics y perfilador en /debug/profile (0 = no)")
+    parser.add_argument("--channel", default=None,
+                        help="Canal del jugador/cabina (la pantalla lo abre con /camera/?channel=...)")
     args = parser.parse_args()
 
 
-    # ... resto del código ...
-
-
-    def parse_source(v):
-        # Intenta convertir a entero (webcam USB)
-        try:
-            return int(v)
-        except:
-            pass
-
-        # Limpieza básica de URL
-        s = str(v).strip()
-        if s.isdigit(): return int(s)
-        # Si es HTTP sin ruta, agregar /video (común en IP Webcam android)
-        if (s.startswith("http") and urlparse(s).path in ["", "/"]):
-            return urlunparse(urlparse(s)._replace(path="/video"))
-        return s
-
-
     tracker = StereoTracker(
         left_source=parse_source(args.left),
         right_source=parse_source(args.right),
-        api_url=args.api
+        sources=load_sources(args.sources) if args.sources else None,
+        views_calib=args.views_calib,
+        api_url=args.api,
+        stats_interval=args.stats_interval,
+        workers=args.workers,
+        calib_file=args.calib_file,
+        board=tuple(int(v) for v in args.board.lower().split("x")),
+        square_size=args.square,
+        wire=args.wire,
+        channel=args.channel,
+        json_out=args.json_out,
+        snapshot_file=args.snapshot_file,
+        json_rate=args.json_rate,
+        record=args.record,
+        headless=args.headless,
+        preview_port=args.preview_port,
+        preview_fps=args.preview_fps,
+        roi_size=args.roi_size,
+        roi_pad=args.roi_pad,
+        backend=args.backend,
+        target_fps=args.target_fps,
+        filter=args.filter,
+        predict_ms=args.predict_ms,
+        metrics_port=args.metrics_port,
+        camera_options={"backend": args.ip_backend, "buffer_size": args.ip_buffer, "timeout": args.ip_timeout,
+                        "decode_threads": args.decode_threads, "max_backoff": args.reconnect_max}
     )
     tracker.run()
\ No newline at end of file
@@ -0,0 +1,450 @@
+"""
+Tracker con N cámaras: fuentes en un fichero de configuración y fusión de los landmarks
+2D de todas las vistas en un esqueleto 3D.
+
+    [{"name": "frente", "source": 0},
+     {"name": "lateral", "source": "rtsp://192.168.1.20/stream"},
+     "http://192.168.1.21:8080/video"]
+
+(o {"sources": [...]}, o una lista separada por comas en --sources). Cada vista tiene su
+hilo lector (capture.FrameGrabber: decodifican a la vez), su recorte y su modelo; si una
+cámara en vivo se cae se reintenta en segundo plano y el bucle sigue con las demás. Las
+opciones de entrada de cámaras IP (ver ipcam.py) se pueden dar por cámara:
+{"source": "http://...", "backend": "mjpeg", "buffer_size": 1, "decode_threads": 2}.
+
+Calibración: la vista 0 es la referencia y cada una de las demás se calibra contra ella
+con el tablero (tecla C con el tablero visible en la 0 y en otra a la vez). Se guarda por
+vista K, D (intrínsecos) y R, T (de la vista 0 a esa vista). Las dos primeras pueden salir
+de una calibración estéreo antigua (stereo_calib.npz).
+
+Triangulación: no se rectifican los frames (un remap por cámara y frame); solo se
+corrige la distorsión de las pocas articulaciones que se triangulan y se resuelve un DLT
+por articulación en lote, con las filas de cada vista pesadas por la visibilidad que da
+el modelo. Una vista cuyo punto no cuadra con el resto (reproyección mayor que
+max_reproj) se descarta para esa articulación si quedan al menos dos.
+"""
+import os
+import json
+import time
+from urllib.parse import urlparse, urlunparse
+
+import cv2
+import numpy as np
+
+from capture import Backoff, FrameGrabber
+from ipcam import MjpegGrabber, open_opencv
+from landmarks import NUM_LANDMARKS
+
+
+def parse_source(v):
+    """'0' -> 0 (webcam USB); http://IP sin ruta -> http://IP/video (IP Webcam de Android)."""
+    if isinstance(v, int): return v
+    s = str(v).strip()
+    if s.isdigit(): return int(s)
+    if s.startswith("http") and urlparse(s).path in ["", "/"]:
+        return urlunparse(urlparse(s)._replace(path="/video"))
+    return s
+
+
+def load_sources(spec):
+    """
+    Lista de (nombre, fuente, opciones) de un JSON (ver arriba) o de "0,1,rtsp://...".
+    Las vistas sin nombre se llaman cam0, cam1...
+    """
+    if os.path.isfile(spec):
+        with open(spec, encoding="utf-8") as f:
+            raw = json.load(f)
+        if isinstance(raw, dict): raw = raw.get("sources", [])
+    else:
+        raw = [part for part in spec.split(",") if part.strip()]
+    out = []
+    for i, item in enumerate(raw):
+        if isinstance(item, dict):
+            options = {k: item[k] for k in CameraView.OPTIONS if k in item}
+            out.append((str(item.get("name") or f"cam{i}"), parse_source(item["source"]), options))
+        else:
+            out.append((f"cam{i}", parse_source(item), {}))
+    names = [name for name, _, _ in out]
+    if len(set(names)) != len(names): raise ValueError(f"Nombres de cámara repetidos: {names}")
+    return out
+
+
+class CameraView:
+    """Una cámara del tracker: fuente, hilo lector, recorte y modelo de pose propios."""
+
+    OPTIONS = ("backend", "buffer_size", "decode_threads", "timeout", "max_backoff")
+
+    def __init__(self, index, name, source, backend="opencv", buffer_size=1, decode_threads=2,
+                 timeout=5.0, max_backoff=10.0):
+        self.index = index
+        self.name = name
+        self.source = source
+        # Un fichero de vídeo que se acaba no se reabre; una cámara o un stream sí
+        self.live = isinstance(source, int) or "://" in str(source)
+        # El lector MJPEG propio solo entiende HTTP; el resto va siempre por OpenCV
+        self.backend = backend if str(source).startswith("http") else "opencv"
+        self.buffer_size = buffer_size
+        self.decode_threads = decode_threads
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.cap = None
+        self.grabber = None
+        self.roi = None
+        self.pose = None
+        self.lm_buf = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        self.frame_shape = None
+
+    def connect(self):
+        """Al arrancar: abre la fuente y espera al primer frame. True si respondió."""
+        if self.backend == "mjpeg":
+            # El lector MJPEG lleva su propia conexión (y sus reintentos) desde ya
+            self.grabber = MjpegGrabber(self.source, self.name, self.decode_threads, self.timeout,
+                                        backoff=Backoff(maximum=self.max_backoff)).start()
+            deadline, got = time.time() + self.timeout, None
+            while got is None and time.time() < deadline:
+                got = self.grabber.read_latest(timeout=deadline - time.time())
+                if got is None: time.sleep(0.05)  # Aún conectando
+            if got is not None: self.frame_shape = got[1].shape
+            return got is not None
+        self.cap = self.open()
+        return self.cap is not None
+
+    def open(self, attempts=20):
+        """Abre la fuente (OpenCV) y espera al primer frame. Devuelve la captura o None."""
+        cap = open_opencv(self.source, self.buffer_size, self.timeout)
+        if cap is None or not cap.isOpened():
+            if cap is not None: cap.release()
+            return None
+        for _ in range(attempts):
+            ret, frame = cap.read()
+            if ret:
+                self.frame_shape = frame.shape
+                return cap
+            time.sleep(0.05)
+        cap.release()
+        return None
+
+    def start(self):
+        if self.grabber is not None: return self  # MJPEG: arrancado en connect()
+        if self.cap is None and not self.live: return self
+        self.grabber = FrameGrabber(self.cap, self.name, reopen=self.open if self.live else None,
+                                    backoff=Backoff(maximum=self.max_backoff)).start()
+        return self
+
+    def sample_frame(self):
+        """Un frame de la cámara antes de arrancar el bucle (para elegir modelo), o None."""
+        if self.cap is not None:
+            ok, frame = self.cap.read()
+            return frame if ok else None
+        got = self.grabber.peek_latest() if self.grabber is not None else None
+        return got[1] if got else None
+
+    @property
+    def connected(self):
+        return self.grabber is not None and self.grabber.alive and self.grabber.connected
+
+    @property
+    def finished(self):
+        return self.grabber is None or not self.grabber.alive
+
+    def close(self):
+        cap = self.cap
+        if self.grabber is not None:
+            self.grabber.stop()
+            cap = self.grabber.cap
+        if cap is not None: cap.release()
+        if self.pose is not None: self.pose.close()
+
+
+class MultiViewCalibration:
+    """
+    Intrínsecos y pose de cada vista respecto a la vista 0 (None en las que aún no se han
+    calibrado). P[i] = [R | T] en coordenadas normalizadas (sin K: los puntos se pasan
+    antes por cv2.undistortPoints).
+    """
+
+    def __init__(self, n_views):
+        self.n_views = n_views
+        self.K = [None] * n_views
+        self.D = [None] * n_views
+        self.R = [None] * n_views
+        self.T = [None] * n_views
+        self.image_size = [None] * n_views  # (ancho, alto)
+        self.rms = [None] * n_views
+        self.P = [None] * n_views
+
+    def set_view(self, i, K, D, R, T, image_size, rms=None):
+        self.K[i] = np.asarray(K, np.float64)
+        self.D[i] = np.asarray(D, np.float64).reshape(-1)
+        self.R[i] = np.asarray(R, np.float64)
+        self.T[i] = np.asarray(T, np.float64).reshape(3, 1)
+        self.image_size[i] = (int(image_size[0]), int(image_size[1]))
+        self.rms[i] = rms
+        self.P[i] = np.hstack([self.R[i], self.T[i]])
+
+    def calibrated(self, i):
+        return i < self.n_views and self.P[i] is not None
+
+    @property
+    def views(self):
+        return [i for i in range(self.n_views) if self.P[i] is not None]
+
+    def summary(self):
+        """Resumen serializable (para el snapshot JSON)."""
+        return {
+            "views": self.views,
+            "image_size": {i: list(self.image_size[i]) for i in self.views},
+            "baseline_m": {i: float(np.linalg.norm(self.T[i])) for i in self.views if i},
+            "rms": {i: self.rms[i] for i in self.views if i},
+        }
+
+    # --- CACHÉ EN DISCO ---
+    def save(self, path):
+        arrays = {"n_views": np.array(self.n_views)}
+        for i in self.views:
+            arrays.update({f"K{i}": self.K[i], f"D{i}": self.D[i], f"R{i}": self.R[i], f"T{i}": self.T[i],
+                           f"size{i}": np.array(self.image_size[i]),
+                           f"rms{i}": np.array(-1.0 if self.rms[i] is None else self.rms[i])})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, n_views):
+        if not os.path.exists(path): return None
+        calib = cls(n_views)
+        with np.load(path) as d:
+            for i in range(min(n_views, int(d["n_views"]))):
+                if f"K{i}" not in d: continue
+                rms = float(d[f"rms{i}"])
+                calib.set_view(i, d[f"K{i}"], d[f"D{i}"], d[f"R{i}"], d[f"T{i}"], tuple(d[f"size{i}"]),
+                               None if rms < 0 else rms)
+        return calib
+
+    @classmethod
+    def load_stereo(cls, path, n_views):
+        """Vistas 0 y 1 de una calibración estéreo antigua (K1, D1, K2, D2, R, T; izquierda = referencia)."""
+        if not os.path.exists(path): return None
+        calib = cls(n_views)
+        with np.load(path) as d:
+            rms = float(d["rms"])
+            size = tuple(d["image_size"])
+            calib.set_view(0, d["K1"], d["D1"], np.eye(3), np.zeros(3), size)
+            calib.set_view(1, d["K2"], d["D2"], d["R"], d["T"], size, None if rms < 0 else rms)
+        return calib
+
+    # --- POR FRAME ---
+    def undistort(self, i, pts):
+        """Píxeles (K, 2) de la vista i -> coordenadas normalizadas sin distorsión (K, 2)."""
+        src = np.ascontiguousarray(pts, dtype=np.float64).reshape(-1, 1, 2)
+        return cv2.undistortPoints(src, self.K[i], self.D[i]).reshape(-1, 2)
+
+    def triangulate(self, views, pts, weights, max_reproj=0.05):
+        """
+        DLT en lote pesado por confianza.
+        views: índices de vista (V,); pts: (V, K, 2) normalizados; weights: (V, K), 0 = no usar.
+        Devuelve (pts3d (K, 3) en metros en el sistema de la vista 0, vistas usadas (K,)).
+        """
+        P = np.stack([self.P[i] for i in views])  # (V, 3, 4)
+        w = np.array(weights, dtype=np.float64)
+        pts = np.where(w[..., None] > 0, pts, 0.0)
+        X = self._solve(P, pts, w)
+
+        # Una vista que no cuadra con las demás (detección cruzada, oclusión) se descarta
+        err = self._reprojection(P, X, pts)  # (V, K)
+        used = w > 0
+        n_used = used.sum(axis=0)
+        worst = np.argmax(np.where(used, err, -1.0), axis=0)
+        k = np.arange(w.shape[1])
+        redo = (n_used >= 3) & (err[worst, k] > max_reproj)
+        if redo.any():
+            w[worst[redo], k[redo]] = 0.0
+            X[redo] = self._solve(P, pts[:, redo], w[:, redo])
+            n_used = (w > 0).sum(axis=0)
+
+        pts3d = X[:, :3] / np.where(np.abs(X[:, 3:]) < 1e-12, np.nan, X[:, 3:])
+        # Delante de todas las cámaras que la ven
+        depth = np.einsum("vj,kj->vk", P[:, 2, :3], pts3d) + P[:, 2, 3][:, None]
+        in_front = np.all((depth > 0) | (w <= 0), axis=0)
+        n_used = np.where(in_front & np.isfinite(pts3d).all(axis=1), n_used, 0)
+        return pts3d, n_used
+
+    @staticmethod
+    def _solve(P, pts, w):
+        # Dos filas por vista: x·P3 - P1 y y·P3 - P2, escaladas por el peso de la vista
+        rows_x = pts[..., 0, None] * P[:, None, 2, :] - P[:, None, 0, :]  # (V, K, 4)
+        rows_y = pts[..., 1, None] * P[:, None, 2, :] - P[:, None, 1, :]
+        A = np.concatenate([rows_x * w[..., None], rows_y * w[..., None]], axis=0)  # (2V, K, 4)
+        _, _, vt = np.linalg.svd(A.transpose(1, 0, 2))
+        return vt[:, -1, :]  # (K, 4) homogéneo
+
+    @staticmethod
+    def _reprojection(P, X, pts):
+        proj = np.einsum("vij,kj->vki", P, X)  # (V, K, 3)
+        z = proj[..., 2]
+        z = np.where(np.abs(z) < 1e-12, np.nan, z)
+        err = np.linalg.norm(proj[..., :2] / z[..., None] - pts, axis=-1)
+        return np.nan_to_num(err, nan=np.inf)
+
+
+class ChessboardCollector:
+    """Acumula pares de fotos de un tablero de ajedrez (vista de referencia, otra vista)."""
+
+    def __init__(self, pattern=(9, 6), square_size=0.025, min_pairs=12):
+        self.pattern = pattern  # Esquinas interiores (columnas, filas)
+        self.square_size = square_size  # Lado del cuadrado en metros
+        self.min_pairs = min_pairs
+        self.obj_points = []
+        self.img_points_l = []
+        self.img_points_r = []
+        self.image_size = None
+
+        objp = np.zeros((pattern[0] * pattern[1], 3), np.float32)
+        objp[:, :2] = np.mgrid[0:pattern[0], 0:pattern[1]].T.reshape(-1, 2)
+        self._objp = objp * square_size
+
+    @property
+    def count(self):
+        return len(self.obj_points)
+
+    def add_pair(self, frame_l, frame_r):
+        """Busca el tablero en ambas vistas. Devuelve True si se añadió el par."""
+        gray_l = cv2.cvtColor(frame_l, cv2.COLOR_BGR2GRAY)
+        gray_r = cv2.cvtColor(frame_r, cv2.COLOR_BGR2GRAY)
+        ok_l, corners_l = cv2.findChessboardCorners(gray_l, self.pattern)
+        ok_r, corners_r = cv2.findChessboardCorners(gray_r, self.pattern)
+        if not (ok_l and ok_r): return False
+
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+        corners_l = cv2.cornerSubPix(gray_l, corners_l, (11, 11), (-1, -1), criteria)
+        corners_r = cv2.cornerSubPix(gray_r, corners_r, (11, 11), (-1, -1), criteria)
+
+        self.image_size = (gray_l.shape[1], gray_l.shape[0])
+        self.obj_points.append(self._objp)
+        self.img_points_l.append(corners_l)
+        self.img_points_r.append(corners_r)
+        return True
+
+
+class MultiViewCalibrator:
+    """Pares de tablero (vista 0, vista i) por cámara; calibra cada una al llegar a min_pairs."""
+
+    def __init__(self, n_views, pattern=(9, 6), square_size=0.025, min_pairs=12):
+        self.collectors = {i: ChessboardCollector(pattern, square_size, min_pairs) for i in range(1, n_views)}
+        self.sizes = {}
+
+    def add(self, frames):
+        """frames: {índice de vista: frame}. Devuelve las vistas a las que se añadió un par."""
+        ref = frames.get(0)
+        if ref is None: return []
+        added = []
+        for i, frame in frames.items():
+            if i == 0 or i not in self.collectors: continue
+            if self.collectors[i].add_pair(ref, frame):
+                self.sizes[i] = (frame.shape[1], frame.shape[0])
+                added.append(i)
+        return added
+
+    def ready(self, i):
+        c = self.collectors[i]
+        return c.count >= c.min_pairs
+
+    def calibrate(self, i, calib):
+        """Calibra la vista i contra la 0 (con los intrínsecos de la 0 si ya los hay) en `calib`."""
+        c = self.collectors[i]
+        if not calib.calibrated(0):
+            _, K0, D0, _, _ = cv2.calibrateCamera(c.obj_points, c.img_points_l, c.image_size, None, None)
+            calib.set_view(0, K0, D0, np.eye(3), np.zeros(3), c.image_size)
+        _, Ki, Di, _, _ = cv2.calibrateCamera(c.obj_points, c.img_points_r, self.sizes[i], None, None)
+        rms, _, _, Ki, Di, R, T, _, _ = cv2.stereoCalibrate(
+            c.obj_points, c.img_points_l, c.img_points_r, calib.K[0], calib.D[0], Ki, Di, c.image_size,
+            flags=cv2.CALIB_FIX_INTRINSIC,
+            criteria=(cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 1e-5))
+        calib.set_view(i, Ki, Di, R, T, self.sizes[i], float(rms))
+        # Las siguientes capturas de esta vista empiezan de cero (recalibrar = otra ronda)
+        self.collectors[i] = ChessboardCollector(c.pattern, c.square_size, c.min_pairs)
+
+
+class FusionEngine:
+    """
+    Motor de fusión del tracker: carga/guarda la calibración de las N vistas y triangula
+    las extremidades con todas las vistas que las ven.
+    """
+
+    def __init__(self, n_views, cache_path="multiview_calib.npz", stereo_cache=None, pattern=(9, 6),
+                 square_size=0.025, min_visibility=0.5, max_reproj=0.05):
+        self.n_views = n_views
+        self.cache_path = cache_path
+        self.min_visibility = min_visibility
+        self.max_reproj = max_reproj
+        self.calibrator = MultiViewCalibrator(n_views, pattern, square_size)
+        self.calibration = MultiViewCalibration.load(cache_path, n_views)
+        if self.calibration is None and stereo_cache:
+            self.calibration = MultiViewCalibration.load_stereo(stereo_cache, n_views)
+            if self.calibration is not None:
+                print(f"Vistas 0 y 1 calibradas con {stereo_cache}")
+        if self.calibration is None:
+            self.calibration = MultiViewCalibration(n_views)
+        self._size_warned = set()
+        if self.ready:
+            print(f"Calibración multivista: vistas {self.calibration.views} ({cache_path})")
+
+    @property
+    def ready(self):
+        return len(self.calibration.views) >= 2
+
+    def matches(self, i, frame):
+        """La calibración de una vista solo vale para la resolución con la que se hizo."""
+        if not self.calibration.calibrated(i): return False
+        h, w = frame.shape[:2]
+        if (w, h) == self.calibration.image_size[i]: return True
+        if i not in self._size_warned:
+            print(f"AVISO: vista {i} calibrada a {self.calibration.image_size[i]}, cámara a {(w, h)}. Se ignora en 3D.")
+            self._size_warned.add(i)
+        return False
+
+    def capture_board(self, frames):
+        """Tecla C: añade el tablero de cada vista que lo ve junto a la 0. True si se calibró alguna."""
+        added = self.calibrator.add(frames)
+        if not added:
+            print("Tablero no encontrado en la vista 0 y alguna otra a la vez.")
+            return False
+        done = False
+        for i in added:
+            c = self.calibrator.collectors[i]
+            print(f"Vista {i}: par de calibración {c.count}/{c.min_pairs}")
+            if not self.calibrator.ready(i): continue
+            t0 = time.time()
+            self.calibrator.calibrate(i, self.calibration)
+            self._size_warned.discard(i)
+            done = True
+            print(f"Vista {i} calibrada en {time.time() - t0:.1f}s (rms {self.calibration.rms[i]:.3f})")
+        if done:
+            self.calibration.save(self.cache_path)
+            print(f"Calibración multivista guardada en {self.cache_path}")
+        return done
+
+    def triangulate_landmarks(self, observations, indices):
+        """
+        observations: [(índice de vista, landmarks (33, 4) normalizados, ancho, alto)].
+        Devuelve (pts3d (K, 3), valid (K,)) para las articulaciones `indices`, o None si
+        no hay al menos dos vistas calibradas.
+        """
+        views, pts, weights = [], [], []
+        for i, lm, width, height in observations:
+            if not self.calibration.calibrated(i) or self.calibration.image_size[i] != (width, height): continue
+            sel = lm[indices]
+            vis = sel[:, 3].astype(np.float64)
+            views.append(i)
+            pts.append(self.calibration.undistort(i, sel[:, :2] * (width, height)))
+            weights.append(np.where(vis >= self.min_visibility, vis, 0.0))
+        if len(views) < 2: return None
+        pts3d, n_used = self.calibration.triangulate(views, np.stack(pts), np.stack(weights), self.max_reproj)
+        return pts3d, n_used >= 2
+
+    def to_dict(self, names, pts3d, valid):
+        """Borde de serialización: { "left_wrist": {"x", "y", "z"} } en metros."""
+        out = {}
+        pts = pts3d.tolist()
+        for i in np.flatnonzero(valid).tolist():
+            x, y, z = pts[i]
+            out[names[i]] = {"x": x, "y": y, "z": z}
+        return out
@@ -0,0 +1,221 @@
+"""
+Backends de estimación de pose intercambiables.
+
+Todos reciben una imagen RGB y devuelven un array (33, 4) float32 con
+[x, y, z, visibility] normalizados a la imagen (o None si no hay persona), así que
+el resto del tracker no sabe qué modelo hay detrás.
+
+Se eligen con una cadena:
+    mediapipe[:0|1|2]      MediaPipe Pose con esa model_complexity (por defecto 1)
+    onnx:RUTA.onnx         Modelo de landmarks tipo BlazePose con ONNX Runtime en CPU
+    synthetic[:CARPETA]    Figura sintética animada, o una grabación de recording.py (para tests)
+    auto                   El más pesado de AUTO_CANDIDATES que aguante los FPS objetivo
+
+onnxruntime y mediapipe son opcionales: solo se importan al crear su backend.
+"""
+import os
+import math
+import time
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, landmarks_to_array
+
+# De más pesado a más ligero (lo que prueba "auto")
+AUTO_CANDIDATES = ["mediapipe:2", "mediapipe:1", "mediapipe:0"]
+
+
+class PoseBackend:
+    name = "base"
+    last_raw = None  # Resultado crudo del modelo (solo MediaPipe), por si alguien lo quiere dibujar
+
+    def infer(self, rgb, out=None):
+        """Imagen RGB uint8 (H, W, 3) -> array (33, 4) float32 o None."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(PoseBackend):
+    def __init__(self, complexity=1):
+        try:
+            import mediapipe as mp  # type: ignore
+        except Exception as e:
+            raise RuntimeError(f"MediaPipe no disponible ({e}); instala 'mediapipe' o usa otro backend") from e
+        self.name = f"mediapipe:{complexity}"
+        self.pose = mp.solutions.pose.Pose(
+            model_complexity=complexity,
+            enable_segmentation=False,
+            smooth_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+
+    def infer(self, rgb, out=None):
+        result = self.pose.process(rgb)
+        self.last_raw = result.pose_landmarks
+        if not self.last_raw: return None
+        # Una sola pasada por los 33 puntos, sobre el buffer preasignado
+        return landmarks_to_array(self.last_raw, out)
+
+    def close(self):
+        self.pose.close()
+
+
+class OnnxBackend(PoseBackend):
+    """
+    Modelo de landmarks de pose exportado a ONNX (p. ej. el de BlazePose).
+    Entrada float32 [0, 1] NHWC o NCHW; salida con al menos 33 filas de
+    [x, y, z, visibility(, presence)] en píxeles de la entrada y visibilidad en logits.
+    Espera la persona más o menos centrada: va bien detrás del recorte de roi.py.
+    """
+
+    def __init__(self, model_path, threads=0, min_score=0.5):
+        try:
+            import onnxruntime as ort  # type: ignore
+        except Exception as e:
+            raise RuntimeError(f"onnxruntime no disponible ({e}); instala 'onnxruntime'") from e
+        if not os.path.isfile(model_path):
+            raise RuntimeError(f"No existe el modelo ONNX: {model_path}")
+        import cv2
+        self._cv2 = cv2
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads: opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        shape = inp.shape
+        self.nchw = shape[1] == 3
+        self.size = (int(shape[3]), int(shape[2])) if self.nchw else (int(shape[2]), int(shape[1]))  # (W, H)
+        self.min_score = min_score
+        self.name = f"onnx:{os.path.basename(model_path)}"
+
+    def infer(self, rgb, out=None):
+        w, h = self.size
+        img = self._cv2.resize(rgb, (w, h), interpolation=self._cv2.INTER_LINEAR).astype(np.float32)
+        img *= 1.0 / 255.0
+        if self.nchw: img = img.transpose(2, 0, 1)
+        outputs = self.session.run(None, {self.input_name: img[None]})
+
+        flat = np.asarray(outputs[0], dtype=np.float32).reshape(-1)
+        cols = 5 if flat.size % 5 == 0 and flat.size // 5 >= NUM_LANDMARKS else 4
+        pts = flat[:flat.size // cols * cols].reshape(-1, cols)[:NUM_LANDMARKS]
+        # Puntuación de persona presente (segunda salida de BlazePose), si la hay
+        if len(outputs) > 1 and np.size(outputs[1]) == 1:
+            if 1.0 / (1.0 + math.exp(-float(np.ravel(outputs[1])[0]))) < self.min_score: return None
+
+        if out is None: out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        out[:, 0] = pts[:, 0] / w
+        out[:, 1] = pts[:, 1] / h
+        out[:, 2] = pts[:, 2] / w
+        out[:, 3] = 1.0 / (1.0 + np.exp(-pts[:, 3]))
+        return out
+
+
+class SyntheticBackend(PoseBackend):
+    """
+    Sin modelo: devuelve una figura que camina y saluda, o los frames de una grabación
+    de recording.py en bucle. latency simula el coste de inferencia (segundos).
+    """
+
+    # Esqueleto de pie en coordenadas normalizadas (índices de MediaPipe)
+    _BASE = {
+        0: (0.50, 0.20), 11: (0.44, 0.32), 12: (0.56, 0.32), 13: (0.40, 0.44), 14: (0.60, 0.44),
+        15: (0.38, 0.55), 16: (0.62, 0.55), 23: (0.46, 0.58), 24: (0.54, 0.58), 25: (0.46, 0.72),
+        26: (0.54, 0.72), 27: (0.46, 0.86), 28: (0.54, 0.86), 31: (0.45, 0.90), 32: (0.55, 0.90),
+    }
+
+    def __init__(self, recording=None, latency=0.0, fps=30.0):
+        self.latency = latency
+        self.fps = fps
+        self.frame = 0
+        self.frames = None
+        if recording:
+            from recording import PoseReplayer
+            lm = PoseReplayer(recording).load()["lm"]
+            self.frames = lm[~np.isnan(lm[:, 0, 0])]
+            if not len(self.frames): raise RuntimeError(f"{recording} no tiene poses")
+        self.name = f"synthetic:{os.path.basename(recording)}" if recording else "synthetic"
+        self._base = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._base[:, :2] = 0.5
+        for i, (x, y) in self._BASE.items():
+            self._base[i, :2] = (x, y)
+            self._base[i, 3] = 1.0
+
+    def infer(self, rgb, out=None):
+        if self.latency: time.sleep(self.latency)
+        if out is None: out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        k = self.frame
+        self.frame += 1
+        if self.frames is not None:
+            out[:] = self.frames[k % len(self.frames)]
+            return out
+        t = k / self.fps
+        shift = 0.15 * math.sin(t * 0.5)  # Se desplaza de lado a lado
+        out[:] = self._base
+        out[:, 0] += shift
+        # Saluda con la mano derecha (de la imagen)
+        out[14, :2] = (0.62 + shift, 0.30)
+        out[16, :2] = (0.62 + shift + 0.06 * math.sin(t * 8.0), 0.18)
+        return out
+
+
+def create_backend(spec):
+    """Crea un backend a partir de su cadena (ver el docstring del módulo)."""
+    kind, _, arg = spec.partition(":")
+    if kind == "mediapipe":
+        complexity = int(arg) if arg else 1
+        if complexity not in (0, 1, 2): raise ValueError("model_complexity debe ser 0, 1 o 2")
+        return MediaPipeBackend(complexity)
+    if kind == "onnx":
+        if not arg: raise ValueError("Uso: onnx:RUTA_DEL_MODELO.onnx")
+        return OnnxBackend(arg)
+    if kind == "synthetic":
+        return SyntheticBackend(recording=arg or None)
+    raise ValueError(f"Backend de pose desconocido: {spec}")
+
+
+def uses_image(spec):
+    """False si el backend ignora la imagen (synthetic): no tiene sentido recortarla."""
+    return not spec.startswith("synthetic")
+
+
+def benchmark(backend, rgb, runs=10, warmup=3):
+    """Segundos por inferencia (mediana) de este backend sobre la imagen dada."""
+    out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    for _ in range(warmup):
+        backend.infer(rgb, out)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        backend.infer(rgb, out)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def select_backend(rgb, target_fps, candidates=None, verbose=True):
+    """
+    Prueba los candidatos de más pesado a más ligero sobre una imagen real de esta
+    máquina y devuelve (spec, segundos por inferencia) del primero que aguanta
+    target_fps. Si ninguno llega, el más rápido de los que funcionan.
+    """
+    budget = 1.0 / target_fps
+    fastest = None
+    for spec in candidates or AUTO_CANDIDATES:
+        try:
+            backend = create_backend(spec)
+        except Exception as e:
+            if verbose: print(f"[auto] {spec}: no disponible ({e})")
+            continue
+        try:
+            seconds = benchmark(backend, rgb)
+        finally:
+            backend.close()
+        if verbose: print(f"[auto] {spec}: {seconds * 1000:.1f} ms/frame ({1.0 / seconds:.0f} FPS)")
+        if seconds <= budget: return spec, seconds
+        if fastest is None or seconds < fastest[1]: fastest = (spec, seconds)
+    if fastest is None: raise RuntimeError("Ningún backend de pose disponible")
+    return fastest
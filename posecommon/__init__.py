@@ -0,0 +1,7 @@
+"""
+Código común del tracker (raíz del repositorio) y del servidor Django (EPS-123123/):
+solo librería estándar, sin depender de Django ni de OpenCV.
+
+    pose_codec   formato binario de las poses (tracker -> servidor -> navegador)
+    metrics      contadores, histogramas y perfilador en texto de Prometheus
+"""
@@ -0,0 +1,217 @@
+"""
+Métricas de bajo coste en formato de texto de Prometheus, compartidas por el servidor
+(pose_api, ruta /metrics) y el tracker (telemetry.py, --metrics-port).
+
+En el camino caliente solo se suma a un contador o se mete una duración en un
+histograma de cubos fijos (una búsqueda binaria y un lock). Los valores que ya existen
+en otro sitio (contadores del PoseSender, clientes del hub...) no se duplican: se leen
+al renderizar con add_collector().
+
+    requests = REGISTRY.counter("pose_api_requests_total", "Peticiones", handler="get_pose", status="200")
+    requests.inc()
+    REGISTRY.histogram("pose_api_request_seconds", "Duración", handler="get_pose").observe(dt)
+
+SamplingProfiler muestrea la pila de todos los hilos cada `interval` segundos mientras
+está activo (se enciende y apaga en caliente) y devuelve las pilas en formato "collapsed"
+(flamegraph.pl / speedscope).
+"""
+import sys
+import time
+import bisect
+import threading
+from collections import Counter as _Tally
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Segundos: de 0.5 ms (una inferencia recortada, un handler) a 2.5 s (un atasco)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(cubos acumulados [(le, n)], suma, total)."""
+        with self._lock:
+            counts, total, n = list(self.counts), self.sum, self.count
+        cumulative, acc = [], 0
+        for le, c in zip(self.buckets + (float("inf"),), counts):
+            acc += c
+            cumulative.append((le, acc))
+        return cumulative, total, n
+
+
+def _labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(v):
+    if v == float("inf"): return "+Inf"
+    if isinstance(v, bool): return "1" if v else "0"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}  # (nombre, etiquetas) -> métrica
+        self._meta = {}  # nombre -> (tipo, ayuda)
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, kind, factory, name, help_text, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    self._meta.setdefault(name, (kind, help_text))
+                    metric = self._metrics[key] = factory()
+        return metric
+
+    def counter(self, name, help_text="", **labels):
+        return self._get("counter", Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get("histogram", lambda: Histogram(buckets), name, help_text, labels)
+
+    def add_collector(self, fn):
+        """
+        fn() devuelve una lista de (nombre, tipo, ayuda, etiquetas, valor); tipo "gauge" o
+        "counter" con un número, o "histogram" con un Histogram. Se llama en cada render().
+        """
+        self._collectors.append(fn)
+
+    def render(self):
+        families = {}  # nombre -> (tipo, ayuda, [(etiquetas, valor)])
+        for (name, labels), metric in list(self._metrics.items()):
+            kind, help_text = self._meta[name]
+            families.setdefault(name, (kind, help_text, []))[2].append((dict(labels), metric))
+        for fn in list(self._collectors):
+            try:
+                samples = fn()
+            except Exception as e:
+                samples = [("metrics_collector_errors", "gauge", f"Error del colector: {e}", {}, 1)]
+            for name, kind, help_text, labels, value in samples:
+                families.setdefault(name, (kind, help_text, []))[2].append((labels, value))
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if kind == "histogram":
+                    cumulative, total, n = value.snapshot()
+                    for le, c in cumulative:
+                        lines.append(f"{name}_bucket{_labels(labels, ('le', _number(le)))} {c}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                    lines.append(f"{name}_count{_labels(labels)} {n}")
+                else:
+                    v = value.value if isinstance(value, Counter) else value
+                    if v is None: continue
+                    lines.append(f"{name}{_labels(labels)} {_number(v)}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Perfilador por muestreo de todos los hilos (sys._current_frames), encendido a demanda."""
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started_at = None
+        self._stacks = _Tally()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, interval=None):
+        if interval: self.interval = interval
+        if self._running: return self
+        self._running = True
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        return self
+
+    def toggle(self):
+        return self.stop() if self._running else self.start()
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _loop(self):
+        own = threading.get_ident()
+        names = {}
+        while self._running:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own: continue
+                parts = []
+                while frame is not None and len(parts) < self.max_depth:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                parts.append(names.get(ident, str(ident)))
+                stacks.append(";".join(reversed(parts)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self, limit=0):
+        """Una línea 'hilo;func (fichero:línea);... N' por pila, de más a menos muestras."""
+        with self._lock:
+            items = self._stacks.most_common(limit or None)
+        return "".join(f"{stack} {n}\n" for stack, n in items)
+
+    def status(self):
+        return {"running": self._running, "samples": self.samples, "interval": self.interval,
+                "started_at": self.started_at, "stacks": len(self._stacks)}
+
+
+REGISTRY = Registry()
+PROFILER = SamplingProfiler()
@@ -0,0 +1,346 @@
+"""
+Formato binario compacto para las poses (tracker -> servidor -> navegador).
+
+Se negocia por Content-Type / Accept con CONTENT_TYPE; si no, se usa JSON como siempre.
+Solo usa la librería estándar (struct) para que lo puedan importar tanto Django
+como el tracker (main.py) sin dependencias extra.
+
+Trama v2 (little endian; la v1 llevaba los seq en 32 bits y daban la vuelta cada ~71
+minutos con los seq del store, que son microsegundos):
+    cabecera   2s  magic b"PS"
+               B   versión (2)
+               B   flags (FLAG_*)
+               d   timestamp
+               Q   seq
+               I   máscara de articulaciones visibles (bit i -> JOINT_NAMES[i])
+               I   máscara de articulaciones en movimiento
+               B   estado (índice en STATES)
+    visibles   por cada bit de la máscara: x, y, z, speed (float16, o float32 con FLAG_F32)
+    3D         si FLAG_3D: I máscara + x, y, z float32 por articulación
+    posición   si FLAG_POSITION: x, y float32
+
+Trama delta (FLAG_DELTA): misma cabecera (máscaras de visibles y en movimiento
+completas) seguida de Q seq de la trama base + I máscara de articulaciones que
+cambian; solo esas llevan x, y, z, speed. Las visibles que no cambian conservan
+los valores de la base (speed incluida); 3D y posición van completos. Una
+articulación "cambia" cuando su x, y o z se aleja más de `step` de lo que tiene
+el receptor: el error queda acotado por `step` y no se acumula. DeltaEncoder /
+DeltaDecoder llevan ese estado a cada lado y mandan un keyframe (trama normal)
+cada `keyframe_interval` tramas o cuando se pierde la base.
+
+Lote: b"PB", versión, H nº de tramas y cada trama precedida de su longitud (H).
+"""
+import math
+import struct
+
+CONTENT_TYPE = "application/x-pose-v1"
+VERSION = 2
+MAGIC = b"PS"
+BATCH_MAGIC = b"PB"
+
+# Orden fijo de las articulaciones (mismo orden que EXTREMITIES_IDX en main.py)
+JOINT_NAMES = [
+    "nose",
+    "left_shoulder", "right_shoulder",
+    "left_hip", "right_hip",
+    "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist",
+    "left_knee", "right_knee",
+    "left_ankle", "right_ankle",
+    "left_foot_index", "right_foot_index",
+]
+JOINT_INDEX = {name: i for i, name in enumerate(JOINT_NAMES)}
+
+# Estados de animación que entiende el navegador (gestures.py los calcula en el tracker).
+# Solo se añaden al final: el índice viaja en la trama
+STATES = ["normal", "waving", "walking", "jumping", "arms_up"]
+STATE_INDEX = {name: i for i, name in enumerate(STATES)}
+
+FLAG_F32 = 1  # Coordenadas en float32 (por defecto float16)
+FLAG_3D = 2  # Incluye extremities_3d
+FLAG_STEREO = 4  # camera_mode == "stereo"
+FLAG_POSITION = 8  # Incluye position {x, y}
+FLAG_DELTA = 16  # Solo las articulaciones que cambian respecto a la trama base
+
+DELTA_STEP = 0.002  # Lado de la rejilla de cambio (coordenadas normalizadas, ~1 px a 640)
+KEYFRAME_INTERVAL = 30  # Tramas entre keyframes (resincronización)
+
+_HEADER = struct.Struct("<2sBBdQIIB")
+_BATCH_HEADER = struct.Struct("<2sBH")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_POSITION = struct.Struct("<ff")
+_DELTA = struct.Struct("<QI")
+_structs = {}
+_F16_MAX = 65504.0
+
+
+def _values_struct(fmt, n):
+    """Struct precompilado para n valores del tipo fmt (se cachea por tamaño)."""
+    key = (fmt, n)
+    st = _structs.get(key)
+    if st is None:
+        st = _structs[key] = struct.Struct("<" + fmt * n)
+    return st
+
+
+def _finite(*values):
+    for v in values:
+        if v is None or isinstance(v, bool) or not math.isfinite(v): return False
+    return True
+
+
+def is_binary(content_type):
+    return bool(content_type) and content_type.split(";")[0].strip() == CONTENT_TYPE
+
+
+def accepts_binary(accept_header):
+    return bool(accept_header) and CONTENT_TYPE in accept_header
+
+
+def _changed(prev, j, step):
+    """¿Se ha movido la articulación más de `step` respecto a lo que tiene el receptor?"""
+    if not prev or not _finite(prev.get("x"), prev.get("y")): return True
+    z, pz = j.get("z", 0.0), prev.get("z", 0.0)
+    return (abs(j["x"] - prev["x"]) > step or abs(j["y"] - prev["y"]) > step
+            or (_finite(z, pz) and abs(z - pz) > step))
+
+
+def encode(pose, seq=0, use_f32=False, base=None, base_seq=0, step=DELTA_STEP):
+    """
+    Codifica un dict de pose (mismo formato que el JSON) en bytes.
+    Con base (la pose completa que tiene el receptor, con seq base_seq) genera una
+    trama delta con solo las articulaciones que se han movido más de `step`.
+    """
+    flags = FLAG_F32 if use_f32 else 0
+    fmt = "f" if use_f32 else "e"
+
+    visible = 0
+    moving = 0
+    changed = 0
+    values = []
+    extremities = pose.get("extremities") or {}
+    base_ext = (base.get("extremities") or {}) if base is not None else None
+    for i, name in enumerate(JOINT_NAMES):
+        j = extremities.get(name)
+        if not j: continue
+        x, y, z, speed = j.get("x"), j.get("y"), j.get("z", 0.0), j.get("speed", 0.0)
+        if not _finite(x, y): continue
+        visible |= 1 << i
+        if j.get("moving"): moving |= 1 << i
+        if base_ext is not None:
+            if not _changed(base_ext.get(name), j, step): continue
+            changed |= 1 << i
+        # La velocidad (px/frame) es lo único que podría salirse del rango de float16
+        values += (x, y, z if _finite(z) else 0.0, min(speed, _F16_MAX) if _finite(speed) else 0.0)
+
+    if pose.get("camera_mode") == "stereo": flags |= FLAG_STEREO
+    if base_ext is not None: flags |= FLAG_DELTA
+
+    tail = []
+    ext3d = pose.get("extremities_3d")
+    if ext3d:
+        mask3d = 0
+        pts = []
+        for i, name in enumerate(JOINT_NAMES):
+            p = ext3d.get(name)
+            if not p or not _finite(p.get("x"), p.get("y"), p.get("z")): continue
+            mask3d |= 1 << i
+            pts += (p["x"], p["y"], p["z"])
+        flags |= FLAG_3D
+        tail.append(_U32.pack(mask3d))
+        tail.append(_values_struct("f", len(pts)).pack(*pts))
+
+    position = pose.get("position")
+    if position:
+        flags |= FLAG_POSITION
+        tail.append(_POSITION.pack(float(position.get("x", 0) or 0), float(position.get("y", 0) or 0)))
+
+    state = STATE_INDEX.get(pose.get("state", "normal"), 0)
+    head = _HEADER.pack(MAGIC, VERSION, flags, float(pose.get("timestamp") or 0.0), seq,
+                        visible, moving, state)
+    if flags & FLAG_DELTA: head += _DELTA.pack(base_seq, changed)
+    return b"".join([head, _values_struct(fmt, len(values)).pack(*values)] + tail)
+
+
+def _iter_bits(mask):
+    i = 0
+    while mask:
+        if mask & 1: yield i
+        mask >>= 1
+        i += 1
+
+
+def decode(buf, offset=0):
+    """
+    Decodifica una trama y devuelve el dict de pose (formato JSON, sin pixel_x/pixel_y).
+    Una trama delta trae en "extremities" solo las articulaciones que cambian y una
+    clave "delta" {"base": seq, "moving": {nombre: bool de todas las visibles}}:
+    hay que aplicarla sobre su base con apply_delta.
+    """
+    magic, version, flags, timestamp, seq, visible, moving, state = _HEADER.unpack_from(buf, offset)
+    if magic != MAGIC: raise ValueError("No es una trama de pose")
+    if version != VERSION: raise ValueError(f"Versión de trama no soportada: {version}")
+    pos = offset + _HEADER.size
+
+    fmt = "f" if flags & FLAG_F32 else "e"
+    carried = visible
+    if flags & FLAG_DELTA:
+        base_seq, carried = _DELTA.unpack_from(buf, pos)
+        pos += _DELTA.size
+    idx = list(_iter_bits(carried))
+    st = _values_struct(fmt, 4 * len(idx))
+    vals = st.unpack_from(buf, pos)
+    pos += st.size
+
+    extremities = {}
+    for k, i in enumerate(idx):
+        x, y, z, speed = vals[4 * k:4 * k + 4]
+        extremities[JOINT_NAMES[i]] = {"x": x, "y": y, "z": z, "moving": bool(moving >> i & 1), "speed": speed}
+
+    pose = {
+        "timestamp": timestamp,
+        "seq": seq,
+        "camera_mode": "stereo" if flags & FLAG_STEREO else "single",
+        "extremities": extremities,
+        "state": STATES[state] if state < len(STATES) else "normal",
+    }
+    if flags & FLAG_DELTA:
+        pose["delta"] = {"base": base_seq,
+                         "moving": {JOINT_NAMES[i]: bool(moving >> i & 1) for i in _iter_bits(visible)}}
+
+    if flags & FLAG_3D:
+        (mask3d,) = _U32.unpack_from(buf, pos)
+        pos += _U32.size
+        idx3d = list(_iter_bits(mask3d))
+        st = _values_struct("f", 3 * len(idx3d))
+        pts = st.unpack_from(buf, pos)
+        pos += st.size
+        pose["extremities_3d"] = {
+            JOINT_NAMES[i]: {"x": pts[3 * k], "y": pts[3 * k + 1], "z": pts[3 * k + 2]}
+            for k, i in enumerate(idx3d)
+        }
+
+    if flags & FLAG_POSITION:
+        x, y = _POSITION.unpack_from(buf, pos)
+        pos += _POSITION.size
+        pose["position"] = {"x": x, "y": y}
+
+    return pose
+
+
+class NeedKeyframe(ValueError):
+    """La trama delta no se puede aplicar: el receptor no tiene su base."""
+
+
+def apply_delta(base, delta):
+    """Pose completa = base (dict completo con su "seq") + trama delta decodificada."""
+    info = delta.get("delta")
+    if info is None: return delta  # Ya era un keyframe
+    if base is None or base.get("seq") != info["base"]:
+        raise NeedKeyframe(f"Base {info['base']} no disponible")
+    base_ext = base.get("extremities") or {}
+    changed = delta["extremities"]
+    extremities = {}
+    for name, is_moving in info["moving"].items():
+        j = changed.get(name)
+        if j is None:
+            prev = base_ext.get(name)
+            if prev is None: raise NeedKeyframe(f"{name} no está en la base")
+            j = dict(prev)
+            j["moving"] = is_moving
+        extremities[name] = j
+    pose = {k: v for k, v in delta.items() if k != "delta"}
+    pose["extremities"] = extremities
+    return pose
+
+
+class DeltaEncoder:
+    """
+    Lado emisor de un flujo delta: lleva la pose que ha reconstruido el receptor y
+    decide entre keyframe y delta. reset() fuerza un keyframe (p. ej. si el receptor
+    pide resync). Un encoder por receptor.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, step=DELTA_STEP, use_f32=False):
+        self.keyframe_interval = keyframe_interval
+        self.step = step
+        self.use_f32 = use_f32
+        self._base = None
+        self._base_seq = 0
+        self._since_key = 0
+        self.keyframes = 0
+        self.deltas = 0
+
+    def encode(self, pose, seq):
+        if self._base is None or self._since_key >= self.keyframe_interval:
+            blob = encode(pose, seq=seq, use_f32=self.use_f32)
+            self._since_key = 0
+            self.keyframes += 1
+        else:
+            blob = encode(pose, seq=seq, use_f32=self.use_f32, base=self._base, base_seq=self._base_seq,
+                          step=self.step)
+            self.deltas += 1
+            pose = self._received(pose)
+        self._since_key += 1
+        self._base = pose
+        self._base_seq = seq
+        return blob
+
+    def _received(self, pose):
+        """Lo que queda en el receptor tras la delta: las que no cambian siguen con el valor viejo."""
+        base_ext = self._base.get("extremities") or {}
+        extremities = {}
+        for name, j in (pose.get("extremities") or {}).items():
+            if not j or not _finite(j.get("x"), j.get("y")): continue
+            prev = base_ext.get(name)
+            extremities[name] = j if _changed(prev, j, self.step) else prev
+        return {"extremities": extremities}
+
+    def reset(self):
+        self._base = None
+
+
+class DeltaDecoder:
+    """Lado receptor: reconstruye la pose completa. feed() lanza NeedKeyframe si falta la base."""
+
+    def __init__(self):
+        self.pose = None
+
+    def feed(self, buf):
+        """Trama o lote -> lista de poses completas, en orden."""
+        out = []
+        for frame in decode_any(buf):
+            try:
+                self.pose = apply_delta(self.pose, frame)
+            except NeedKeyframe:
+                self.pose = None
+                raise
+            out.append(self.pose)
+        return out
+
+
+def encode_batch(frames):
+    """Lote de tramas ya codificadas (bytes) en un solo cuerpo."""
+    parts = [_BATCH_HEADER.pack(BATCH_MAGIC, VERSION, len(frames))]
+    for f in frames:
+        parts.append(_U16.pack(len(f)))
+        parts.append(f)
+    return b"".join(parts)
+
+
+def decode_any(buf):
+    """Decodifica una trama o un lote. Devuelve siempre una lista de poses."""
+    buf = memoryview(buf)
+    if bytes(buf[:2]) == BATCH_MAGIC:
+        _, version, count = _BATCH_HEADER.unpack_from(buf, 0)
+        if version != VERSION: raise ValueError(f"Versión de lote no soportada: {version}")
+        pos = _BATCH_HEADER.size
+        out = []
+        for _ in range(count):
+            (n,) = _U16.unpack_from(buf, pos)
+            pos += _U16.size
+            out.append(decode(buf[pos:pos + n]))
+            pos += n
+        return out
+    return [decode(buf)]
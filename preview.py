@@ -0,0 +1,165 @@
+"""
+Preview MJPEG del tracker para depurar máquinas sin pantalla (modo headless).
+
+El bucle de cámara solo pregunta due() y, si toca, entrega una COPIA del frame con
+submit(): el dibujo (annotate) y la compresión JPEG se hacen en el hilo del preview,
+como mucho `fps` veces por segundo y solo mientras alguien esté mirando.
+
+    python main.py --headless --preview-port 8090
+    abrir http://127.0.0.1:8090/  (o /stream para el MJPEG, /snapshot.jpg para un frame)
+"""
+import time
+from threading import Thread, Condition, Event, Lock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+_BOUNDARY = "frame"
+_PAGE = (b"<!doctype html><title>Tracker preview</title>"
+         b"<body style='margin:0;background:#111'><img src='/stream' style='max-width:100%'></body>")
+_WANT_SECONDS = 2.0  # Tras la última petición seguimos generando frames este tiempo
+
+
+class MjpegPreview:
+    def __init__(self, port, fps=10.0, annotate=None, host="127.0.0.1", quality=70):
+        self.port = port
+        self.host = host
+        self.period = 1.0 / max(fps, 0.1)
+        self.annotate = annotate
+        self.quality = quality
+
+        self._cond = Condition()
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._pending = None
+        self._pending_lock = Lock()
+        self._event = Event()
+        self._running = False
+        self._last_submit = 0.0
+        self._wanted_until = 0.0
+        self._server = None
+        self._threads = []
+
+        # Métricas
+        self.clients = 0
+        self.frames = 0
+        self.encode_ms = 0.0
+
+    def start(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass  # Sin una línea en consola por petición
+
+            def do_GET(self):
+                preview._touch()
+                if self.path == "/":
+                    self._send(200, "text/html", _PAGE)
+                elif self.path == "/snapshot.jpg":
+                    jpeg = preview._wait_jpeg(0, timeout=2.0)[1]
+                    if jpeg is None: self._send(503, "text/plain", b"sin frames")
+                    else: self._send(200, "image/jpeg", jpeg)
+                elif self.path == "/stream":
+                    self._stream()
+                else:
+                    self._send(404, "text/plain", b"no encontrado")
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={_BOUNDARY}")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                with preview._cond:
+                    preview.clients += 1
+                seq = 0
+                try:
+                    while preview._running:
+                        preview._touch()
+                        seq, jpeg = preview._wait_jpeg(seq, timeout=1.0)
+                        if jpeg is None: continue
+                        self.wfile.write(f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode("ascii"))
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with preview._cond:
+                        preview.clients -= 1
+
+        self._running = True
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._threads = [
+            Thread(target=self._server.serve_forever, name="preview-http", daemon=True),
+            Thread(target=self._encoder, name="preview-encode", daemon=True),
+        ]
+        for t in self._threads: t.start()
+        print(f"Preview MJPEG en http://{self.host}:{self.port}/")
+        return self
+
+    def _touch(self):
+        self._wanted_until = time.time() + _WANT_SECONDS
+
+    def due(self):
+        """¿Merece la pena copiar este frame? (hay alguien mirando y ha pasado el periodo)"""
+        now = time.time()
+        return now < self._wanted_until and now - self._last_submit >= self.period
+
+    def submit(self, frame, *annotate_args):
+        """frame debe ser una copia: se dibuja encima en otro hilo."""
+        self._last_submit = time.time()
+        with self._pending_lock:
+            self._pending = (frame, annotate_args)
+        self._event.set()
+
+    def _encoder(self):
+        while self._running:
+            if not self._event.wait(0.5): continue
+            self._event.clear()
+            with self._pending_lock:
+                item, self._pending = self._pending, None
+            if item is None: continue
+            frame, args = item
+            t0 = time.time()
+            try:
+                if self.annotate is not None and args: self.annotate(frame, *args)
+                ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            except Exception:
+                continue
+            if not ok: continue
+            self.encode_ms = (time.time() - t0) * 1000.0
+            with self._cond:
+                self._jpeg = buf.tobytes()
+                self._jpeg_seq += 1
+                self.frames += 1
+                self._cond.notify_all()
+
+    def _wait_jpeg(self, last_seq, timeout):
+        """Espera un JPEG más nuevo que last_seq. Devuelve (seq, jpeg o None)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._jpeg_seq != last_seq or not self._running, timeout)
+            if self._jpeg_seq == last_seq: return last_seq, None
+            return self._jpeg_seq, self._jpeg
+
+    def stats(self):
+        return {"clients": self.clients, "frames": self.frames, "encode_ms": self.encode_ms}
+
+    def stop(self):
+        self._running = False
+        self._event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,234 @@
+"""
+Grabación y reproducción de poses para pruebas de carga sin cámaras.
+
+PoseRecorder guarda los landmarks que salen de detect_pose en una carpeta de solo
+añadir: un meta.json y trozos chunk_00000.npz, chunk_00001.npz... con columnas
+    t      float64 (N,)        instante de captura
+    lm     float32 (N, 33, 4)  landmarks normalizados (NaN si no hubo pose)
+    lm_r   float32 (N, 33, 4)  vista derecha (solo en estéreo)
+    size   int32   (N, 2)      ancho, alto del frame
+Cada trozo se comprime y escribe en un hilo aparte (el bucle de cámara solo copia).
+
+PoseReplayer lee la grabación trozo a trozo y replay() la manda a /api/update-pose/
+a 1x, 10x o lo más rápido posible (speed=0), como si fueran `players` jugadores a la
+vez: cada uno con su PoseSender y su canal (X-Pose-Channel), desfasados en el tiempo.
+
+    python main.py --record grabaciones/sesion1
+    python recording.py info grabaciones/sesion1
+    python recording.py replay grabaciones/sesion1 --players 50 --speed 10
+"""
+import os
+import json
+import time
+from queue import Queue
+from threading import Thread
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, EXTREMITIES_IDX, ExtremityState
+
+FORMAT_VERSION = 1
+
+
+class PoseRecorder:
+    """
+    Si la carpeta ya tiene una grabación se sigue añadiendo a ella: continúa su cuenta
+    de trozos y frames y usa su chunk_frames. ValueError si su formato o su modo
+    (estéreo o no) no coinciden con los de esta grabación.
+    """
+
+    def __init__(self, path, chunk_frames=300, stereo=False):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.stereo = stereo
+        self.frames = 0
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            found = (meta.get("version"), meta.get("landmarks"), bool(meta.get("stereo")))
+            if found != (FORMAT_VERSION, NUM_LANDMARKS, stereo):
+                raise ValueError(f"{path} tiene otra grabación (versión {found[0]}, {found[1]} landmarks, "
+                                 f"estéreo={found[2]}); no se puede añadir con estéreo={stereo}")
+            self.chunk_frames = chunk_frames = int(meta.get("chunk_frames", chunk_frames))
+            self.frames = int(meta.get("frames", 0))
+        self.chunks = len([f for f in os.listdir(path) if f.startswith("chunk_") and f.endswith(".npz")])
+        self._t = np.empty(chunk_frames, dtype=np.float64)
+        self._lm = np.empty((chunk_frames, NUM_LANDMARKS, 4), dtype=np.float32)
+        self._lm_r = np.empty((chunk_frames, NUM_LANDMARKS, 4), dtype=np.float32) if stereo else None
+        self._size = np.empty((chunk_frames, 2), dtype=np.int32)
+        self._n = 0
+        self._queue = Queue(maxsize=4)
+        self._thread = Thread(target=self._writer, name="pose-recorder", daemon=True)
+        self._thread.start()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {"version": FORMAT_VERSION, "landmarks": NUM_LANDMARKS, "stereo": self.stereo,
+                "chunk_frames": self.chunk_frames, "chunks": self.chunks, "frames": self.frames,
+                "extremities": EXTREMITIES_IDX}
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def add(self, timestamp, lm, width, height, lm_r=None):
+        """Copia un frame al trozo en curso (lm None = no hubo pose)."""
+        i = self._n
+        self._t[i] = timestamp
+        if lm is None:
+            self._lm[i] = np.nan
+        else:
+            self._lm[i] = lm
+        if self._lm_r is not None:
+            if lm_r is None:
+                self._lm_r[i] = np.nan
+            else:
+                self._lm_r[i] = lm_r
+        self._size[i] = (width, height)
+        self._n += 1
+        self.frames += 1
+        if self._n == self.chunk_frames: self._flush()
+
+    def _flush(self):
+        if not self._n: return
+        n = self._n
+        cols = {"t": self._t[:n].copy(), "lm": self._lm[:n].copy(), "size": self._size[:n].copy()}
+        if self._lm_r is not None: cols["lm_r"] = self._lm_r[:n].copy()
+        self._queue.put((self.chunks, cols))
+        self.chunks += 1
+        self._n = 0
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None: return
+            index, cols = item
+            name = os.path.join(self.path, f"chunk_{index:05d}.npz")
+            with open(name + ".tmp", "wb") as f:
+                np.savez_compressed(f, **cols)
+            os.replace(name + ".tmp", name)  # Un trozo aparece entero o no aparece
+            self._write_meta()
+
+    def close(self):
+        self._flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._write_meta()
+
+
+class PoseReplayer:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.chunk_files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                                  if f.startswith("chunk_") and f.endswith(".npz"))
+
+    def chunks(self):
+        for name in self.chunk_files:
+            with np.load(name) as data:
+                yield {k: data[k] for k in data.files}
+
+    def load(self):
+        """Toda la grabación en memoria (para reproducir en bucle con muchos jugadores)."""
+        parts = list(self.chunks())
+        if not parts: raise ValueError(f"{self.path} no tiene frames")
+        return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+    def replay(self, api_url, players=1, speed=1.0, loops=1, wire="json", channel_prefix="sim",
+               send_interval=0.1, duration=0.0):
+        """
+        Reproduce la grabación como `players` jugadores simultáneos.
+        speed: 1.0 = tiempo real, 10.0 = diez veces más rápido, 0 = lo más rápido posible.
+        send_interval: mismo límite de envío que el tracker (0.1 s) en tiempo de grabación.
+        """
+        from sender import PoseSender
+
+        data = self.load()
+        t, lm, size = data["t"], data["lm"], data["size"]
+        n = len(t)
+        states = [ExtremityState(self.meta.get("extremities", EXTREMITIES_IDX)) for _ in range(players)]
+        senders = [PoseSender(api_url, wire=wire, channel=f"{channel_prefix}{p}").start() for p in range(players)]
+        # Cada jugador empieza en un punto distinto de la grabación
+        offsets = [p * n // players for p in range(players)]
+        last_send = [-1e9] * players
+
+        t_start = time.time()
+        submitted = 0
+        total = n * loops
+        try:
+            for k in range(total):
+                rec_t = (t[k % n] - t[0]) + (k // n) * (t[-1] - t[0] + 1.0 / 30)
+                if speed > 0:
+                    delay = t_start + rec_t / speed - time.time()
+                    if delay > 0: time.sleep(delay)
+                elif any(s.pending() >= s.batch_size for s in senders):
+                    time.sleep(0.001)  # Lo más rápido posible, pero sin desbordar las colas
+                if duration and time.time() - t_start > duration: break
+
+                for p in range(players):
+                    i = (k + offsets[p]) % n
+                    frame = lm[i]
+                    if np.isnan(frame[0, 0]): continue
+                    w, h = int(size[i][0]), int(size[i][1])
+                    ext = states[p].update(frame, w, h, 3.0, rec_t)
+                    if rec_t - last_send[p] < send_interval and speed > 0: continue
+                    if not ext.visible.any(): continue
+                    senders[p].submit({
+                        "timestamp": time.time(),
+                        "camera_mode": "stereo" if self.meta.get("stereo") else "single",
+                        "extremities": states[p].to_dict(ext),
+                    })
+                    last_send[p] = rec_t
+                    submitted += 1
+        finally:
+            for s in senders:
+                s.stop()
+
+        elapsed = time.time() - t_start
+        sent = sum(s.sent_frames for s in senders)
+        return {
+            "players": players,
+            "speed": speed,
+            "elapsed": elapsed,
+            "submitted": submitted,
+            "sent_frames": sent,
+            "sent_requests": sum(s.sent_requests for s in senders),
+            "errors": sum(s.errors for s in senders),
+            "frames_per_s": sent / elapsed if elapsed > 0 else 0.0,
+            "latency_avg_ms": float(np.mean([s.latency.avg_ms for s in senders])),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_info = sub.add_parser("info", help="Resumen de una grabación")
+    p_info.add_argument("path")
+    p_rep = sub.add_parser("replay", help="Reproducir contra la API")
+    p_rep.add_argument("path")
+    p_rep.add_argument("--api", default="http://127.0.0.1:8000/api/update-pose/", help="Endpoint API")
+    p_rep.add_argument("--players", type=int, default=1, help="Jugadores simulados a la vez")
+    p_rep.add_argument("--speed", type=float, default=1.0, help="1 = tiempo real, 10 = x10, 0 = máximo")
+    p_rep.add_argument("--loops", type=int, default=1)
+    p_rep.add_argument("--duration", type=float, default=0.0, help="Cortar a los N segundos (0 = no)")
+    p_rep.add_argument("--wire", choices=["json", "binary"], default="json")
+    p_rep.add_argument("--channel-prefix", default="sim")
+    args = parser.parse_args()
+
+    rep = PoseReplayer(args.path)
+    if args.cmd == "info":
+        data = rep.load()
+        valid = ~np.isnan(data["lm"][:, 0, 0])
+        span = data["t"][-1] - data["t"][0]
+        print(json.dumps({**rep.meta, "frames": len(data["t"]), "with_pose": int(valid.sum()),
+                          "seconds": round(float(span), 2),
+                          "fps": round(float((len(data["t"]) - 1) / span), 1) if span > 0 else 0.0}, indent=2))
+    else:
+        result = rep.replay(args.api, players=args.players, speed=args.speed, loops=args.loops,
+                            wire=args.wire, channel_prefix=args.channel_prefix, duration=args.duration)
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,138 @@
+"""
+Recorte adaptativo antes de la inferencia de pose.
+
+Con cámaras de 1080p el jugador ocupa una parte pequeña de la imagen: en vez de
+pasarle a MediaPipe el frame entero, RoiCropper recorta una caja con margen alrededor
+de los últimos landmarks y la reduce para que su lado largo no pase de `target`.
+Si se pierde el tracking `lost_after` frames seguidos se vuelve al frame completo
+(también reducido). to_full() devuelve los landmarks a coordenadas normalizadas del
+frame completo, así process_extremities y el payload de la API no cambian.
+
+La caja solo se mueve cuando el cuerpo se sale de ella o se ha quedado muy grande
+(histéresis): un recorte estable le sienta mejor al tracking interno de MediaPipe.
+"""
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from capture import StageStats
+
+# Recorte usado en un frame, en fracciones del frame completo (full=True: sin recorte)
+RoiTransform = namedtuple("RoiTransform", ["x0", "y0", "sx", "sy", "full"])
+
+FULL = RoiTransform(0.0, 0.0, 1.0, 1.0, True)
+
+
+class RoiCropper:
+    def __init__(self, target=640, pad=0.3, min_visibility=0.5, lost_after=2, min_frac=0.2, min_points=4):
+        self.target = int(target)
+        self.pad = pad
+        self.min_visibility = min_visibility
+        self.lost_after = lost_after
+        self.min_frac = min_frac  # Lado mínimo de la caja (fracción del frame)
+        self.min_points = min_points
+        self.box = None  # (x0, y0, x1, y1) normalizados o None = frame completo
+        self._misses = 0
+
+        # Métricas
+        self.frames_full = 0
+        self.frames_roi = 0
+        self.pixel_frac = 0.0  # Fracción de píxeles que llegan al modelo (media móvil)
+        self.prepare_stats = StageStats()
+        self.infer_full = StageStats()
+        self.infer_roi = StageStats()
+
+    @property
+    def max_bytes(self):
+        """Tamaño máximo de lo que devuelve prepare() (para reservar slots del pool)."""
+        return self.target * self.target * 3
+
+    def prepare(self, frame):
+        """Devuelve (imagen para el modelo, RoiTransform)."""
+        t0 = time.time()
+        h, w = frame.shape[:2]
+        if self.box is None:
+            x0, y0, x1, y1 = 0, 0, w, h
+            tf = FULL
+        else:
+            bx0, by0, bx1, by1 = self.box
+            x0, y0 = int(bx0 * w), int(by0 * h)
+            x1, y1 = max(x0 + 2, int(np.ceil(bx1 * w))), max(y0 + 2, int(np.ceil(by1 * h)))
+            tf = RoiTransform(x0 / w, y0 / h, (x1 - x0) / w, (y1 - y0) / h, False)
+
+        crop = frame[y0:y1, x0:x1]
+        cw, ch = x1 - x0, y1 - y0
+        scale = min(1.0, self.target / max(cw, ch))
+        if scale < 1.0:
+            crop = cv2.resize(crop, (max(1, round(cw * scale)), max(1, round(ch * scale))),
+                              interpolation=cv2.INTER_AREA)
+        elif not tf.full:
+            crop = np.ascontiguousarray(crop)
+
+        if tf.full: self.frames_full += 1
+        else: self.frames_roi += 1
+        frac = crop.shape[0] * crop.shape[1] / float(w * h)
+        self.pixel_frac = frac if self.frames_full + self.frames_roi == 1 else self.pixel_frac + 0.1 * (frac - self.pixel_frac)
+        self.prepare_stats.add(time.time() - t0)
+        return crop, tf
+
+    @staticmethod
+    def to_full(lm, tf):
+        """Landmarks (33, 4) del recorte -> coordenadas normalizadas del frame completo (in place)."""
+        if lm is None or tf.full: return lm
+        lm[:, 0] = tf.x0 + lm[:, 0] * tf.sx
+        lm[:, 1] = tf.y0 + lm[:, 1] * tf.sy
+        lm[:, 2] *= tf.sx  # z de MediaPipe va en la escala del ancho de la imagen
+        return lm
+
+    def record_inference(self, tf, seconds):
+        (self.infer_full if tf.full else self.infer_roi).add(seconds)
+
+    def update(self, lm):
+        """Con los landmarks ya en coordenadas del frame completo decide el recorte del siguiente frame."""
+        if lm is not None:
+            pts = lm[lm[:, 3] >= self.min_visibility, :2]
+            pts = pts[np.isfinite(pts).all(axis=1)]
+        if lm is None or len(pts) < self.min_points:
+            self._misses += 1
+            if self._misses >= self.lost_after: self.box = None  # Tracking perdido: frame completo
+            return
+        self._misses = 0
+
+        (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        bw = max((x1 - x0) * (1 + 2 * self.pad), self.min_frac)
+        bh = max((y1 - y0) * (1 + 2 * self.pad), self.min_frac)
+        cx, cy, bw, bh = float(cx), float(cy), float(bw), float(bh)
+        new = (max(0.0, cx - bw / 2), max(0.0, cy - bh / 2), min(1.0, cx + bw / 2), min(1.0, cy + bh / 2))
+
+        if self.box is not None:
+            # Histéresis: mientras el cuerpo quepa y la caja no sea mucho mayor, no se mueve
+            ox0, oy0, ox1, oy1 = self.box
+            inside = ox0 <= x0 and oy0 <= y0 and ox1 >= x1 and oy1 >= y1
+            old_area = (ox1 - ox0) * (oy1 - oy0)
+            new_area = (new[2] - new[0]) * (new[3] - new[1])
+            if inside and old_area <= 2.25 * new_area: return
+        # Si casi ocupa todo el frame no compensa recortar
+        self.box = None if (new[2] - new[0]) * (new[3] - new[1]) > 0.8 else new
+
+    def reset(self):
+        self.box = None
+        self._misses = 0
+
+    def stats(self):
+        full = self.infer_full.snapshot()
+        roi = self.infer_roi.snapshot()
+        speedup = full["avg_ms"] / roi["avg_ms"] if full["count"] and roi["count"] and roi["avg_ms"] > 0 else None
+        return {
+            "frames_full": self.frames_full,
+            "frames_roi": self.frames_roi,
+            "pixel_frac": self.pixel_frac,
+            "prepare": self.prepare_stats.snapshot(),
+            "infer_full": full,
+            "infer_roi": roi,
+            "speedup": speedup,
+            "box": self.box,
+        }
@@ -0,0 +1,196 @@
+import json
+import time
+from collections import deque
+from threading import Thread, Condition
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from capture import StageStats
+from posecommon import pose_codec
+
+
+class PoseSender:
+    """
+    Emisor HTTP único y de larga vida hacia la API de Django.
+
+    - Una sola requests.Session con conexiones keep-alive (nada de un hilo + TCP por envío).
+    - Cola acotada: si el servidor va lento se descartan las poses más viejas.
+    - Si se queda atrás, manda solo la pose más nueva (coalescing), o bien un
+      micro-lote {"frames": [...]} con varias poses con timestamp si el backend
+      ha dicho que los acepta ("accepts_batch": true en la respuesta).
+    - wire="binary" manda el formato compacto de pose_codec; si el servidor responde
+      415 (no lo entiende) se vuelve a JSON. Cualquier otro error solo fuerza un keyframe.
+    - Con JSON, sanitize(payload) se aplica aquí (NaN -> None, numpy -> float): el bucle
+      de cámara encola siempre la pose tal cual, sin mirar en qué formato saldrá.
+    - Con wire="binary" y delta=True, en cuanto el servidor anuncia "accepts_delta"
+      se mandan tramas delta (solo las articulaciones que cambian) con un keyframe
+      cada keyframe_interval; tras un error o un 409 "need_keyframe" va un keyframe.
+    - channel identifica al jugador/cabina (cabecera X-Pose-Channel) cuando varios
+      trackers escriben en el mismo servidor.
+    """
+
+    def __init__(self, api_url, max_queue=8, batch_size=4, timeout=1.0, allow_batch=True, wire="json",
+                 channel=None, delta=True, keyframe_interval=pose_codec.KEYFRAME_INTERVAL, sanitize=None):
+        self.api_url = api_url
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.allow_batch = allow_batch
+        self.batch_supported = False  # Se activa cuando el servidor lo anuncia
+        self.wire = wire
+        self._seq = 0
+        self.delta = delta
+        self.delta_supported = False
+        self._delta = pose_codec.DeltaEncoder(keyframe_interval)
+        self.channel = channel
+        self.sanitize = sanitize
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if channel:
+            self.session.headers["X-Pose-Channel"] = channel
+
+        self._queue = deque()
+        self._cond = Condition()
+        self._running = False
+        self._thread = None
+
+        # Métricas
+        self.sent_requests = 0
+        self.sent_frames = 0
+        self.dropped = 0  # Expulsadas por cola llena
+        self.coalesced = 0  # Saltadas para mandar solo la más nueva
+        self.errors = 0
+        self.bytes_sent = 0
+        self.latency = StageStats()
+        self.encode_time = StageStats()
+        self._last_error_print = 0.0
+
+    def start(self):
+        if self._thread is not None: return self
+        self._running = True
+        self._thread = Thread(target=self._loop, name="pose-sender", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, payload):
+        """Encola una pose (no bloquea nunca)."""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(payload)
+            self._cond.notify()
+
+    def pending(self):
+        """Poses en cola sin enviar todavía."""
+        with self._cond:
+            return len(self._queue)
+
+    def _take(self):
+        """Saca lo que toca enviar: un lote o solo la pose más nueva."""
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait(0.5)
+            if not self._queue: return None
+            if self.allow_batch and self.batch_supported:
+                n = min(len(self._queue), self.batch_size)
+                # Las más viejas que no caben en el lote se descartan
+                self.coalesced += len(self._queue) - n
+                items = list(self._queue)[-n:]
+                self._queue.clear()
+                return {"frames": items} if n > 1 else items[0]
+            newest = self._queue.pop()
+            self.coalesced += len(self._queue)
+            self._queue.clear()
+            return newest
+
+    def _encode(self, body):
+        """Serializa en el hilo del sender (fuera del bucle de cámara)."""
+        if self.wire == "binary":
+            frames = body["frames"] if "frames" in body else [body]
+            encoded = []
+            use_delta = self.delta and self.delta_supported
+            for f in frames:
+                self._seq += 1
+                encoded.append(self._delta.encode(f, self._seq) if use_delta else pose_codec.encode(f, seq=self._seq))
+            data = encoded[0] if "frames" not in body else pose_codec.encode_batch(encoded)
+            return data, pose_codec.CONTENT_TYPE
+        if self.sanitize is not None: body = self.sanitize(body)
+        return json.dumps(body, allow_nan=False).encode("utf-8"), "application/json"
+
+    def _loop(self):
+        while self._running:
+            body = self._take()
+            if body is None: continue
+            n_frames = len(body["frames"]) if "frames" in body else 1
+            t0 = time.time()
+            try:
+                data, content_type = self._encode(body)
+                self.encode_time.add(time.time() - t0)
+                self.bytes_sent += len(data)
+                r = self.session.post(self.api_url, data=data, headers={"Content-Type": content_type},
+                                      timeout=self.timeout)
+                self.latency.add(time.time() - t0)
+                self.sent_requests += 1
+                self.sent_frames += n_frames
+                if not r.ok: self._delta.reset()  # El servidor puede no tener la base: keyframe
+                if r.ok and not (self.batch_supported and self.delta_supported):
+                    try:
+                        info = r.json()
+                        self.batch_supported = bool(info.get("accepts_batch"))
+                        self.delta_supported = bool(info.get("accepts_delta"))
+                    except ValueError:
+                        pass
+                elif r.status_code == 409:
+                    pass  # need_keyframe: el siguiente envío ya es un keyframe
+                elif r.status_code == 415 and self.wire == "binary":
+                    self.wire = "json"
+                    self._error("El servidor no acepta el formato binario (415), volviendo a JSON.")
+                elif not r.ok:
+                    self._error(f"API Respondió: {r.status_code}")
+            except requests.exceptions.ConnectionError:
+                self._delta.reset()
+                self._error(f"ERROR: No se pudo conectar a {self.api_url}. ¿Está encendido el servidor?")
+            except Exception as e:
+                self._delta.reset()
+                self._error(f"ERROR API: {e}")
+
+    def _error(self, msg):
+        self.errors += 1
+        # Como mucho un aviso cada 5 segundos para no ensuciar la consola
+        now = time.time()
+        if now - self._last_error_print > 5.0:
+            self._last_error_print = now
+            print(msg)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.session.close()
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._queue)
+        return {
+            "queue_depth": depth,
+            "sent_requests": self.sent_requests,
+            "sent_frames": self.sent_frames,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "batch": self.batch_supported,
+            "wire": self.wire,
+            "bytes_sent": self.bytes_sent,
+            "keyframes": self._delta.keyframes,
+            "deltas": self._delta.deltas,
+            "channel": self.channel,
+            "latency": self.latency.snapshot(),
+        }
@@ -0,0 +1,215 @@
+"""
+Snapshot local de la última pose para otros procesos de la misma máquina.
+
+SnapshotWriter escribe en un fichero mapeado en memoria de tamaño fijo (nada de
+abrir/truncar coords.json en cada frame). La cabecera lleva un contador seqlock:
+impar mientras se escribe y par al terminar, así SnapshotReader reintenta si pilla
+una escritura a medias y nunca ve una pose rota. Los landmarks van en float32 tal
+cual salen de MediaPipe: el lector los tiene sin parsear nada.
+
+Fichero (little endian):
+    cabecera     8s magic b"PSNAP001" | Q seqlock | Q frame | d timestamp
+                 I ancho | I alto | I bytes de calibración | B hay pose
+    landmarks    float32 (33, 4): x, y, z, visibility normalizados
+    calibración  JSON utf-8 (hasta calib_bytes; solo se reescribe cuando cambia)
+
+JsonExporter mantiene el coords.json legible de siempre, pero desde un hilo aparte,
+a pocos Hz y con escritura atómica (fichero temporal + os.replace).
+"""
+import os
+import json
+import mmap
+import time
+import struct
+from collections import namedtuple
+from threading import Thread, Event, Lock
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, landmarks_payload
+
+MAGIC = b"PSNAP001"
+_HEADER = struct.Struct("<8sQQdIIIB")
+_U64 = struct.Struct("<Q")
+_LM_BYTES = NUM_LANDMARKS * 4 * 4
+
+Snapshot = namedtuple("Snapshot", "frame timestamp width height landmarks calibration")
+
+
+def _json_default(obj):
+    # Calibraciones con tipos de numpy
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    if isinstance(obj, np.generic): return obj.item()
+    raise TypeError(f"{type(obj).__name__} no es serializable")
+
+
+def _file_size(calib_bytes):
+    return _HEADER.size + _LM_BYTES + calib_bytes
+
+
+class SnapshotWriter:
+    """Un único escritor (el bucle de cámara); write() cuesta unos microsegundos."""
+
+    def __init__(self, path, calib_bytes=4096):
+        self.path = path
+        self.calib_bytes = calib_bytes
+        size = _file_size(calib_bytes)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        self._lm = np.frombuffer(self._mm, dtype=np.float32, count=NUM_LANDMARKS * 4,
+                                 offset=_HEADER.size).reshape(NUM_LANDMARKS, 4)
+        self._counter = 0
+        self._frame = 0
+        self._calib_obj = None
+        self._calib_len = 0
+        _HEADER.pack_into(self._mm, 0, MAGIC, 0, 0, 0.0, 0, 0, 0, 0)
+
+    def write(self, lm, width, height, calibration=None, timestamp=None):
+        """lm: array (33, 4) o None si no hay pose en este frame."""
+        self._frame += 1
+        calib_raw = None
+        if calibration is not self._calib_obj:
+            # La calibración cambia muy de vez en cuando: solo entonces se serializa
+            self._calib_obj = calibration
+            calib_raw = b"" if calibration is None else json.dumps(calibration, default=_json_default).encode("utf-8")
+            if len(calib_raw) > self.calib_bytes: calib_raw = b""
+
+        self._counter += 1  # Impar: escritura en curso
+        self._set_counter(self._counter)
+        if lm is not None: self._lm[:] = lm
+        if calib_raw is not None:
+            off = _HEADER.size + _LM_BYTES
+            self._mm[off:off + len(calib_raw)] = calib_raw
+            self._calib_len = len(calib_raw)
+        _HEADER.pack_into(self._mm, 0, MAGIC, self._counter, self._frame,
+                          time.time() if timestamp is None else timestamp,
+                          width, height, self._calib_len, lm is not None)
+        self._counter += 1  # Par: listo
+        self._set_counter(self._counter)
+
+    def _set_counter(self, value):
+        _U64.pack_into(self._mm, 8, value)
+
+    def close(self):
+        self._lm = None
+        self._mm.close()
+        os.close(self._fd)
+
+
+class SnapshotReader:
+    """
+    Lector sin bloqueo para otros procesos. read() reutiliza dos arrays de landmarks
+    entre llamadas (cópialo si lo vas a guardar).
+    Si el contador se queda impar (el tracker murió a mitad de escritura) read() deja
+    de reintentar a los `timeout` segundos y devuelve el último snapshot bueno.
+    """
+
+    READ_TIMEOUT = 0.05
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDONLY)
+        self._mm = mmap.mmap(self._fd, os.fstat(self._fd).st_size, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC: raise ValueError(f"{path} no es un snapshot de pose")
+        self._lm = np.frombuffer(self._mm, dtype=np.float32, count=NUM_LANDMARKS * 4,
+                                 offset=_HEADER.size).reshape(NUM_LANDMARKS, 4)
+        self._out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._scratch = np.empty_like(self._out)  # Copia en curso: no pisa la del último bueno
+        self._calib_len = -1
+        self._calib = None
+        self._last = None
+
+    def read(self, timeout=None):
+        """
+        Último Snapshot completo (frame == 0 si el tracker aún no ha escrito nada).
+        TimeoutError si no hay lectura coherente en `timeout` y nunca la hubo.
+        """
+        deadline = time.monotonic() + (self.READ_TIMEOUT if timeout is None else timeout)
+        while True:
+            if time.monotonic() > deadline:
+                if self._last is None: raise TimeoutError("El snapshot sigue a medio escribir")
+                return self._last
+            _, counter, frame, ts, w, h, calib_len, has_pose = _HEADER.unpack_from(self._mm, 0)
+            if counter & 1:
+                time.sleep(0)  # Escritor a mitad: cedemos la CPU y reintentamos
+                continue
+            np.copyto(self._scratch, self._lm)
+            calib_raw = None
+            if calib_len != self._calib_len:
+                off = _HEADER.size + _LM_BYTES
+                calib_raw = self._mm[off:off + calib_len]
+            if _U64.unpack_from(self._mm, 8)[0] != counter: continue
+            if calib_raw is not None:
+                self._calib_len = calib_len
+                self._calib = json.loads(calib_raw) if calib_raw else None
+            self._out, self._scratch = self._scratch, self._out
+            self._last = Snapshot(frame, ts, w, h, self._out if has_pose else None, self._calib)
+            return self._last
+
+    def close(self):
+        self._lm = None
+        self._mm.close()
+        os.close(self._fd)
+
+
+class JsonExporter:
+    """
+    Exporta {"pose": ..., "calibration": ...} a un JSON legible como mucho `rate`
+    veces por segundo desde su propio hilo. submit() solo guarda la referencia.
+    """
+
+    def __init__(self, path, rate=2.0, sanitize=None):
+        self.path = path
+        self.period = 1.0 / rate if rate > 0 else 0.0
+        self.sanitize = sanitize or (lambda obj: obj)
+        self._lock = Lock()
+        self._pending = None
+        self._event = Event()
+        self._running = False
+        self._thread = None
+        self.written = 0
+
+    def start(self):
+        if self._thread is not None or not self.period: return self
+        self._running = True
+        self._thread = Thread(target=self._loop, name="json-export", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, lm, width, height, calibration=None):
+        if self._thread is None: return
+        with self._lock:
+            self._pending = (None if lm is None else lm.copy(), width, height, calibration)
+        self._event.set()
+
+    def _loop(self):
+        while self._running:
+            self._event.wait(1.0)
+            self._event.clear()
+            if self._flush(): time.sleep(self.period)
+        self._flush()  # Lo último que llegó antes de parar
+
+    def _flush(self):
+        with self._lock:
+            item, self._pending = self._pending, None
+        if item is None: return False
+        lm, w, h, calibration = item
+        try:
+            self._write({"pose": landmarks_payload(lm, w, h), "calibration": calibration})
+            self.written += 1
+        except Exception:
+            pass
+        return True
+
+    def _write(self, data):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.sanitize(data), f, ensure_ascii=False, default=_json_default)
+        os.replace(tmp, self.path)  # Los lectores ven el fichero viejo o el nuevo, nunca uno a medias
+
+    def stop(self):
+        self._running = False
+        self._event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
@@ -0,0 +1,167 @@
+"""
+Métricas del tracker en texto de Prometheus y perfilador por muestreo a demanda.
+
+Con --metrics-port N el tracker abre un servidor HTTP local (hilo aparte, nada en el
+bucle de cámara) con:
+
+    GET  /metrics           histogramas por etapa del pipeline (capture.PipelineStats),
+                            frames capturados/descartados, emisor (peticiones, bytes,
+                            descartes, latencia), pool, ROI y gestos
+    GET  /debug/profile     pilas del perfilador por muestreo (formato collapsed)
+    POST /debug/profile     cuerpo start | stop | reset | toggle
+
+Los valores se leen al pedir /metrics de los contadores que ya llevan las piezas del
+tracker: el bucle no paga nada extra por tener el endpoint abierto.
+
+kill -USR1 <pid> también enciende/apaga el perfilador; al apagarlo se escriben las
+pilas en profile_<pid>.txt (flamegraph.pl / speedscope).
+"""
+import os
+import json
+import signal
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from posecommon.metrics import REGISTRY, PROFILER, CONTENT_TYPE
+
+
+def _counter(name, help_text, value, **labels):
+    return (name, "counter", help_text, labels, value)
+
+
+def _gauge(name, help_text, value, **labels):
+    return (name, "gauge", help_text, labels, value)
+
+
+def tracker_collector(tracker):
+    """Colector para REGISTRY.add_collector: lee el estado del tracker al renderizar."""
+
+    def collect():
+        out = []
+        for stage, st in tracker.stats.items():
+            out.append(("tracker_stage_seconds", "histogram", "Duración de cada etapa del bucle de tracking",
+                        {"stage": stage}, st.hist))
+        out.append(_counter("tracker_frames_total", "Frames procesados por resultado de la pose",
+                            tracker.frames_pose, result="pose"))
+        out.append(_counter("tracker_frames_total", "Frames procesados por resultado de la pose",
+                            tracker.frames_no_pose, result="no_pose"))
+        for view in tracker.views:
+            g = view.grabber
+            if g is None: continue
+            out.append(_counter("tracker_camera_frames_total", "Frames leídos de la cámara", g.frames_captured, camera=g.name))
+            out.append(_counter("tracker_camera_dropped_total", "Frames sobrescritos sin procesar", g.frames_dropped, camera=g.name))
+            out.append(("tracker_camera_read_seconds", "histogram", "Duración de cap.read() (con decodificación) o de recibir un JPEG", {"camera": g.name}, g.read_stats.hist))
+            out.append(_gauge("tracker_camera_connected", "Cámara conectada", view.connected, camera=g.name))
+            out.append(_counter("tracker_camera_disconnects_total", "Caídas de la cámara", g.disconnects, camera=g.name))
+            out.append(_counter("tracker_camera_reconnects_total", "Reconexiones después de una caída", g.reconnects, camera=g.name))
+            if hasattr(g, "decode_stats"):
+                # Lector MJPEG: read mide la recepción de cada JPEG y la decodificación va aparte
+                out.append(("tracker_camera_decode_seconds", "histogram", "Duración de cv2.imdecode",
+                            {"camera": g.name}, g.decode_stats.hist))
+                out.append(_counter("tracker_camera_undecoded_total", "JPEG descartados sin decodificar",
+                                    g.frames_undecoded, camera=g.name))
+                out.append(_counter("tracker_camera_decode_errors_total", "JPEG corruptos", g.decode_errors, camera=g.name))
+                out.append(_counter("tracker_camera_bytes_total", "Bytes recibidos de la cámara", g.bytes_received, camera=g.name))
+        out.append(_gauge("tracker_primary_view_info", "Vista que marca el ritmo", 1, camera=tracker.primary.name))
+
+        snd = tracker.sender
+        out += [
+            _counter("tracker_sender_requests_total", "Peticiones enviadas a la API", snd.sent_requests),
+            _counter("tracker_sender_frames_total", "Poses enviadas a la API", snd.sent_frames),
+            _counter("tracker_sender_discarded_total", "Poses descartadas antes de enviarse", snd.dropped, reason="queue_full"),
+            _counter("tracker_sender_discarded_total", "Poses descartadas antes de enviarse", snd.coalesced, reason="coalesced"),
+            _counter("tracker_sender_errors_total", "Errores de envío", snd.errors),
+            _counter("tracker_sender_bytes_total", "Bytes de cuerpo enviados", snd.bytes_sent),
+            _counter("tracker_sender_keyframes_total", "Tramas binarias completas", snd._delta.keyframes),
+            _counter("tracker_sender_deltas_total", "Tramas binarias delta", snd._delta.deltas),
+            _gauge("tracker_sender_queue_depth", "Poses en cola", snd.pending()),
+            ("tracker_sender_request_seconds", "histogram", "Duración de cada POST a la API", {}, snd.latency.hist),
+            ("tracker_sender_encode_seconds", "histogram", "Serialización de cada envío", {}, snd.encode_time.hist),
+        ]
+        if tracker.pool is not None:
+            for key, value in tracker.pool.stats().items():
+                if isinstance(value, (int, float)): out.append(_gauge(f"tracker_pool_{key}", f"Pool de inferencia: {key}", value))
+        for view in tracker.views:
+            roi = view.roi
+            if roi is None: continue
+            out.append(_counter("tracker_roi_frames_total", "Inferencias por tipo de imagen", roi.frames_roi, camera=view.name, kind="roi"))
+            out.append(_counter("tracker_roi_frames_total", "Inferencias por tipo de imagen", roi.frames_full, camera=view.name, kind="full"))
+            out.append(_gauge("tracker_roi_pixel_fraction", "Fracción de píxeles que llega al modelo", roi.pixel_frac, camera=view.name))
+        out.append(_counter("tracker_gesture_transitions_total", "Cambios de estado publicados", tracker.gestures.transitions))
+        out.append(_gauge("tracker_gesture_state", "Estado actual", 1, state=tracker.gestures.state))
+        out.append(_gauge("profiler_running", "Perfilador por muestreo activo", PROFILER.running))
+        return out
+
+    return collect
+
+
+class MetricsServer:
+    def __init__(self, port, host="127.0.0.1"):
+        self.port = port
+        self.host = host
+        self._server = None
+
+    def start(self):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass  # Sin una línea en consola por petición
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    self._send(200, CONTENT_TYPE, REGISTRY.render().encode("utf-8"))
+                elif self.path.rstrip("/") == "/debug/profile":
+                    self._send(200, "text/plain; charset=utf-8", PROFILER.collapsed().encode("utf-8"))
+                else:
+                    self._send(404, "text/plain", b"no encontrado")
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/debug/profile":
+                    self._send(404, "text/plain", b"no encontrado")
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                action = self.rfile.read(min(length, 64)).decode("utf-8", "replace").strip() or "toggle"
+                actions = {"start": PROFILER.start, "stop": PROFILER.stop, "reset": PROFILER.reset, "toggle": PROFILER.toggle}
+                if action not in actions:
+                    self._send(400, "text/plain", b"start, stop, reset o toggle")
+                    return
+                actions[action]()
+                self._send(200, "application/json", json.dumps(PROFILER.status()).encode("utf-8"))
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Métricas en http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def install_profiler_signal(path=None):
+    """SIGUSR1 enciende/apaga el perfilador; al apagarlo vuelca las pilas a `path`."""
+    if not hasattr(signal, "SIGUSR1"): return  # Windows
+    path = path or f"profile_{os.getpid()}.txt"
+
+    def toggle(*_):
+        if not PROFILER.running:
+            PROFILER.reset()
+            PROFILER.start()
+            print("[profile] perfilador encendido (SIGUSR1 otra vez para guardar)")
+            return
+        PROFILER.stop()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(PROFILER.collapsed())
+        print(f"[profile] {PROFILER.samples} muestras en {path}")
+
+    signal.signal(signal.SIGUSR1, toggle)